@@ -3,8 +3,12 @@
 from __future__ import absolute_import
 from __future__ import print_function
 from . import maximum_weight_interval_set as mwis
+from . import annotator_registry
+from . import tier_cache
+from . import serialization
 import six
 import re
+import datetime
 from .annospan import AnnoSpan, SpanGroup
 from .annotier import AnnoTier
 
@@ -31,6 +35,9 @@ class AnnoDoc(object):
         return self.add_tiers(annotator, **kwargs)
 
     def add_tiers(self, annotator, **kwargs):
+        cache = tier_cache.get_tier_cache()
+        if cache is not None:
+            return cache.add_tiers(self, annotator, **kwargs)
         result = annotator.annotate(self, **kwargs)
         if isinstance(result, dict):
             self.tiers.update(result)
@@ -39,6 +46,9 @@ class AnnoDoc(object):
     def require_tiers(self, *tier_names, **kwargs):
         """
         Return the specified tiers or add them using the via annotator.
+        The via annotator class is instantiated through the default annotator
+        registry, so by default a single instance of it is shared by all
+        the documents annotated in the process.
         """
         assert len(set(kwargs.keys()) | set(['via'])) == 1
         assert len(tier_names) > 0
@@ -50,7 +60,7 @@ class AnnoDoc(object):
             return tiers
         else:
             if via_annotator:
-                self.add_tiers(via_annotator())
+                self.add_tiers(annotator_registry.get_annotator(via_annotator))
                 return self.require_tiers(*tier_names)
             else:
                 raise Exception("Tier could not be found. Available tiers: " + str(self.tiers.keys()))
@@ -73,7 +83,7 @@ class AnnoDoc(object):
         """
         Convert the document into a json serializable dictionary.
         This does not store all the document's data. For a complete
-        serialization use pickle.
+        serialization use AnnoDoc.dumps.
 
         >>> from .annospan import AnnoSpan
         >>> from .annotier import AnnoTier
@@ -102,6 +112,63 @@ class AnnoDoc(object):
                 span.to_dict() for span in tier]
         return json_obj
 
+    @staticmethod
+    def from_dict(json_obj):
+        """
+        Create a document from a dict created by serialization.doc_to_dict,
+        or from one created by AnnoDoc.to_dict. Since to_dict does not
+        store all the document's data, its spans are loaded as AnnoSpans
+        or SpanGroups for spans with multiple text offsets, and the other
+        values in their dicts are stored in their metadata.
+
+        >>> doc = AnnoDoc.from_dict({
+        ...     'text': 'one two three',
+        ...     'date': '2011-11-11T00:00:00Z',
+        ...     'tiers': {'test': [{'label': 'odd', 'textOffsets': [[0, 3], [8, 13]], 'value': 1}]}})
+        >>> doc.date
+        datetime.datetime(2011, 11, 11, 0, 0)
+        >>> doc.tiers['test']
+        AnnoTier([SpanGroup(text=one two three, label=odd, AnnoSpan(0-3, one), AnnoSpan(8-13, three))])
+        >>> doc.tiers['test'].spans[0].metadata
+        {'value': 1}
+        """
+        if 'format' in json_obj:
+            return serialization.doc_from_dict(json_obj)
+        date = json_obj.get('date')
+        if date:
+            date = datetime.datetime.strptime(date, "%Y-%m-%dT%H:%M:%SZ")
+        doc = AnnoDoc(json_obj['text'], date)
+        for name, span_dicts in json_obj['tiers'].items():
+            spans = []
+            for span_dict in span_dicts:
+                metadata = {
+                    key: value for key, value in span_dict.items()
+                    if key not in ['label', 'textOffsets']}
+                offsets = span_dict['textOffsets']
+                if len(offsets) == 1:
+                    spans.append(AnnoSpan(offsets[0][0], offsets[0][1], doc,
+                                          span_dict.get('label'), metadata or None))
+                else:
+                    spans.append(SpanGroup([AnnoSpan(start, end, doc) for start, end in offsets],
+                                           span_dict.get('label'), metadata or None))
+            doc.tiers[name] = AnnoTier(spans, presorted=True)
+        return doc
+
+    def dumps(self, tier_names=None):
+        """
+        Serialize the document and the given tiers, or all its tiers, into
+        a compact json string that can be loaded with AnnoDoc.loads.
+        See the serialization module for details.
+        """
+        return serialization.dumps(self, tier_names)
+
+    @staticmethod
+    def loads(serialized):
+        """
+        Create a document from a json string created by AnnoDoc.dumps.
+        """
+        return serialization.loads(serialized)
+
     def filter_overlapping_spans(self, tiers=None, tier_names=None, score_func=None):
         """Remove the smaller of any overlapping spans."""
         if not tiers:
@@ -109,6 +176,7 @@ class AnnoDoc(object):
         if not tiers:
             tiers = list(self.tiers.keys())
         intervals = []
+        filtered_tiers = []
         for tier in tiers:
             if isinstance(tier, six.string_types):
                 tier_name = tier
@@ -126,8 +194,13 @@ class AnnoDoc(object):
                 )
                 for span in tier.spans
             ])
-            tier.spans = []
+            filtered_tiers.append((tier, []))
         my_mwis = mwis.find_maximum_weight_interval_set(intervals)
+        tier_spans = dict((id(tier), spans) for tier, spans in filtered_tiers)
         for interval in my_mwis:
             tier, span = interval.corresponding_object
-            tier.spans.append(span)
+            tier_spans[id(tier)].append(span)
+        # The spans lists are reassigned rather than modified in place
+        # so the tiers' indices are rebuilt.
+        for tier, spans in filtered_tiers:
+            tier.spans = spans
@@ -9,8 +9,32 @@ from .annotier import AnnoTier  # noqa: F401
 
 
 class Annotator(object):
+    """
+    The base class of annotators, which add tiers to AnnoDocs.
+
+    Annotators are reentrant: annotate keeps the state for a document in
+    local variables and the tiers it returns, never on the annotator,
+    so one instance can annotate documents in multiple threads at once.
+    Subclasses must not store per-document state on self, and the caches and
+    resources they share between documents must be safe to use from
+    multiple threads.
+    """
+    # Whether the tiers the annotator creates can be stored in a TierCache.
+    cacheable = True
 
     def annotate(self, doc):
         """Take an AnnoDoc and produce a new annotation tier"""
         raise NotImplementedError(
             "annotate method must be implemented in child")
+
+    def annotate_many(self, docs):
+        """
+        Add the tiers this annotator produces to all the given AnnoDocs
+        and return them in a list.
+        Annotators that can process documents more efficiently together
+        override this.
+        """
+        docs = list(docs)
+        for doc in docs:
+            doc.add_tiers(self)
+        return docs
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+A process-level registry of annotator instances.
+
+AnnoDoc.require_tiers resolves the annotators it is given through this registry,
+so annotators that are expensive to create, like the GeonameAnnotator which
+opens a database connection and loads a classifier, are created once and
+reused for every document annotated by the process.
+Registries can be used from multiple threads, and since annotators are
+reentrant, the threads share the same instances.
+"""
+from __future__ import absolute_import
+import threading
+
+
+class AnnotatorRegistry(object):
+    """
+    Creates and caches annotator instances keyed by the class
+    (or factory function) used to create them.
+
+    Args:
+        shared (bool): Whether annotator instances are reused by default.
+            If False, a new instance is created every time one is requested.
+        max_uses (int): The number of times a shared instance is handed out
+            before it is replaced by a new one. If None, shared instances
+            live until they are removed from the registry.
+    """
+    def __init__(self, shared=True, max_uses=None):
+        self.shared = shared
+        self.max_uses = max_uses
+        self._options = {}
+        self._instances = {}
+        self._uses = {}
+        # Reentrant so factories can request other annotators
+        # from the registry while it is held.
+        self._lock = threading.RLock()
+
+    def configure(self, factory, shared=None, max_uses=None):
+        """
+        Override the sharing and lifetime options for annotators
+        created by the given class or factory.
+        Options that are None fall back to the registry's defaults.
+        """
+        with self._lock:
+            self._options[factory] = dict(shared=shared, max_uses=max_uses)
+            self.remove(factory)
+
+    def register(self, factory, annotator):
+        """
+        Use an existing annotator instance whenever one created by
+        the given class or factory is requested.
+        """
+        with self._lock:
+            self._options[factory] = dict(shared=True, max_uses=None)
+            self._instances[factory] = annotator
+            self._uses[factory] = 0
+
+    def get(self, factory):
+        """
+        Return an annotator created by the given class or factory.
+
+        >>> registry = AnnotatorRegistry(max_uses=2)
+        >>> annotator = registry.get(dict)
+        >>> registry.get(dict) is annotator
+        True
+        >>> registry.get(dict) is annotator
+        False
+        >>> registry.configure(dict, shared=False)
+        >>> registry.get(dict) is registry.get(dict)
+        False
+        """
+        with self._lock:
+            options = self._options.get(factory, {})
+        shared = options.get('shared')
+        if shared is None:
+            shared = self.shared
+        if not shared:
+            return factory()
+        max_uses = options.get('max_uses')
+        if max_uses is None:
+            max_uses = self.max_uses
+        # The lock is held while the annotator is created so threads that
+        # request it at the same time do not each create an instance.
+        with self._lock:
+            annotator = self._instances.get(factory)
+            if annotator is None or (
+                    max_uses is not None and self._uses[factory] >= max_uses):
+                annotator = factory()
+                self._instances[factory] = annotator
+                self._uses[factory] = 0
+            self._uses[factory] += 1
+            return annotator
+
+    def remove(self, factory):
+        """
+        Discard the instance created by the given class or factory
+        so a new one is created when it is next requested.
+        """
+        with self._lock:
+            self._instances.pop(factory, None)
+            self._uses.pop(factory, None)
+
+    def clear(self):
+        """
+        Discard all the annotator instances held by the registry.
+        """
+        with self._lock:
+            self._instances = {}
+            self._uses = {}
+
+    def instances(self):
+        """
+        Return a list of the annotator instances held by the registry.
+        """
+        with self._lock:
+            return list(self._instances.values())
+
+    def __contains__(self, factory):
+        return factory in self._instances
+
+
+default_registry = AnnotatorRegistry()
+
+
+def get_default_registry():
+    return default_registry
+
+
+def set_default_registry(registry):
+    """
+    Replace the registry AnnoDoc.require_tiers uses to resolve annotators.
+    """
+    global default_registry
+    default_registry = registry
+
+
+def get_annotator(factory):
+    """
+    Return an annotator created by the given class or factory from the
+    default registry.
+    """
+    return default_registry.get(factory)
@@ -2,10 +2,38 @@
 # coding=utf8
 from __future__ import absolute_import
 import re
+from bisect import bisect_left, bisect_right
 from .annospan import SpanGroup, AnnoSpan
 from . import maximum_weight_interval_set as mwis
 
 
+class SpanIndex(object):
+    """
+    An index of the offsets of a list of spans used to answer point,
+    containment and nearest span queries with binary searches.
+    max_ends[i] is the largest end offset of the spans up to index i,
+    so it is nondecreasing even when the ends of the spans are not.
+    """
+    def __init__(self, spans):
+        self.starts = [span.start for span in spans]
+        self.ends = [span.end for span in spans]
+        self.max_starts = []
+        self.max_ends = []
+        max_start = max_end = None
+        # The index of the first span that ends before the span preceding it.
+        self.first_end_decrease = len(spans)
+        for idx, (start, end) in enumerate(zip(self.starts, self.ends)):
+            if max_start is None or start > max_start:
+                max_start = start
+            if max_end is None or end > max_end:
+                max_end = end
+            elif end < self.ends[idx - 1] and self.first_end_decrease == len(spans):
+                self.first_end_decrease = idx
+            self.max_starts.append(max_start)
+            self.max_ends.append(max_end)
+        self.starts_sorted = self.max_starts == self.starts
+
+
 class AnnoTier(object):
     """
     A group of AnnoSpans stored sorted by start offset.
@@ -21,6 +49,25 @@ class AnnoTier(object):
             else:
                 self.spans = sorted(spans)
 
+    @property
+    def spans(self):
+        return self._spans
+
+    @spans.setter
+    def spans(self, spans):
+        self._spans = spans
+        self._index = None
+
+    @property
+    def index(self):
+        """
+        A SpanIndex of this tier's spans. It is created when first used and
+        recreated if the spans list is reassigned or its length changes.
+        """
+        if self._index is None or len(self._index.starts) != len(self._spans):
+            self._index = SpanIndex(self._spans)
+        return self._index
+
     def __repr__(self):
         return ('AnnoTier([' +
                 ', '.join([span.__repr__() for span in self.spans]) +
@@ -146,9 +193,14 @@ class AnnoTier(object):
         >>> tier1.spans_contained_by_span(span1)
         AnnoTier([AnnoSpan(4-7, two)])
         """
-        return(
-            AnnoTier([span for span in self if selector_span.contains(span)])
-        )
+        index = self.index
+        if not index.starts_sorted:
+            return AnnoTier([span for span in self if selector_span.contains(span)])
+        lower_bound = bisect_left(index.starts, selector_span.start)
+        upper_bound = bisect_right(index.starts, selector_span.end)
+        return AnnoTier([
+            span for span in self.spans[lower_bound:upper_bound]
+            if span.end <= selector_span.end])
 
     def spans_overlapped_by_span(self, selector_span):
         """
@@ -163,9 +215,21 @@ class AnnoTier(object):
         >>> tier1.spans_overlapped_by_span(span1)
         AnnoTier([AnnoSpan(0-3, one)])
         """
-        return(
-            AnnoTier([span for span in self if selector_span.overlaps(span)])
-        )
+        index = self.index
+        if not index.starts_sorted:
+            return AnnoTier([span for span in self if selector_span.overlaps(span)])
+        # Spans that start before the selector span overlap it if they end
+        # after it starts, so the search can begin at the first span
+        # that does.
+        lower_bound = min(
+            bisect_right(index.max_ends, selector_span.start),
+            bisect_left(index.starts, selector_span.start))
+        upper_bound = max(
+            bisect_right(index.starts, selector_span.start),
+            bisect_left(index.starts, selector_span.end))
+        return AnnoTier([
+            span for span in self.spans[lower_bound:upper_bound]
+            if selector_span.overlaps(span)])
 
     def with_label(self, label):
         """
@@ -203,14 +267,18 @@ class AnnoTier(object):
         AnnoTier([AnnoSpan(0-3, odd), AnnoSpan(3-13, long_span)])
         """
         all_spans = self.spans
+        first_indices = {}
 
         def first(x):
             """
             Perfers the matches that appear first in the first result list.
             """
+            if not first_indices:
+                for idx, span in enumerate(all_spans):
+                    first_indices.setdefault(id(span), idx)
             # Using an exponent makes it so that a first match will be prefered
             # over multiple non-overlapping later matches.
-            return 2 ** (len(all_spans) - all_spans.index(x))
+            return 2 ** (len(all_spans) - first_indices[id(x)])
 
         def text_length(x):
             """
@@ -255,19 +323,11 @@ class AnnoTier(object):
             prefunc = num_spans_and_no_linebreaks
         else:
             prefunc = prefer
-        my_mwis = mwis.find_maximum_weight_interval_set([
-            mwis.Interval(
-                start=match.start,
-                end=match.end,
-                weight=prefunc(match),
-                corresponding_object=match
-            )
-            for match in all_spans
-        ])
-        return AnnoTier([
-            interval.corresponding_object
-            for interval in my_mwis
-        ])
+        mwis_indices = mwis.maximum_weight_interval_indices(
+            [match.start for match in all_spans],
+            [match.end for match in all_spans],
+            [prefunc(match) for match in all_spans])
+        return AnnoTier([all_spans[idx] for idx in mwis_indices])
 
     def without_overlaps(self, other_tier):
         """
@@ -304,6 +364,57 @@ class AnnoTier(object):
             self.with_following_spans_from(other_tier, max_dist=max_dist, allow_overlap=True) +
             other_tier.with_following_spans_from(self, max_dist=max_dist, allow_overlap=True))
 
+    def with_nearby_spans_from_tiers(self, other_tiers, max_dist=100):
+        """
+        Create a new tier from the spans in this tier and the groups formed by
+        pairing them with nearby spans from each of the other tiers in turn.
+        The spans and their order are the same as the result of
+
+            for other_tier in other_tiers:
+                tier += tier.with_nearby_spans_from(other_tier, max_dist)
+
+        when the spans in the other tiers do not overlap, but the pairs are
+        found by bisecting the spans' start offsets, so the time each
+        other tier takes is proportional to the number of pairs rather than
+        the number of spans in the growing tier times the number in the other.
+        A span is near one that starts after it if the other span starts
+        within max_dist characters of its end.
+
+        >>> from .annospan import AnnoSpan
+        >>> from .annodoc import AnnoDoc
+        >>> doc = AnnoDoc('1 new case in total')
+        >>> counts = AnnoTier([AnnoSpan(0, 1, doc, 'count')])
+        >>> tier = counts.with_nearby_spans_from_tiers([
+        ...     AnnoTier([AnnoSpan(2, 5, doc, 'new')]),
+        ...     AnnoTier([AnnoSpan(14, 19, doc, 'total')])], max_dist=10)
+        >>> for span in tier:
+        ...     print(span.text)
+        1
+        1 new
+        1 new case in total
+        """
+        def position(span):
+            return span.start, span.end
+        spans = list(self.spans)
+        for other_tier in other_tiers:
+            other_spans = other_tier.spans
+            other_starts = [span.start for span in other_spans]
+            starts = [span.start for span in spans]
+            new_spans = []
+            for span in spans:
+                for other_span in other_spans[
+                        bisect_right(other_starts, span.start):
+                        bisect_left(other_starts, span.end + max_dist + 1)]:
+                    new_spans.append(SpanGroup([span, other_span]))
+            for other_span in other_spans:
+                for span in spans[
+                        bisect_right(starts, other_span.start):
+                        bisect_left(starts, other_span.end + max_dist + 1)]:
+                    new_spans.append(SpanGroup([other_span, span]))
+            new_spans.sort(key=position)
+            spans = sorted(spans + new_spans, key=position)
+        return AnnoTier(spans, presorted=True)
+
     def with_following_spans_from(self, other_tier, max_dist=1, allow_overlap=False):
         """
         Create a new tier from pairs of spans where the one in the other tier follows a span from this tier.
@@ -401,29 +512,52 @@ class AnnoTier(object):
         >>> tier.span_before(AnnoSpan(4, 7, doc))
         AnnoSpan(0-3, one)
         """
-        closest_span = None
-        for span in self:
-            if span.start >= target_span.start:
-                break
-            if not allow_overlap and span.end > target_span.start:
-                break
-            closest_span = span
-        return closest_span
+        index = self.index
+        # The position of the first span that starts at or after the target.
+        idx = bisect_left(index.max_starts, target_span.start)
+        if not allow_overlap:
+            idx = min(idx, bisect_right(index.max_ends, target_span.start))
+        if idx == 0:
+            return None
+        return self.spans[idx - 1]
 
     def span_after(self, target_span):
         """
         Find the nearest span that comes after the target span.
+        If no span comes after it the last span is returned.
+
+        >>> from .annospan import AnnoSpan
+        >>> from .annodoc import AnnoDoc
+        >>> doc = AnnoDoc('one two three four')
+        >>> tier = AnnoTier([AnnoSpan(0, 3, doc),
+        ...                  AnnoSpan(8, 13, doc),
+        ...                  AnnoSpan(14, 18, doc)])
+        >>> tier.span_after(AnnoSpan(4, 7, doc))
+        AnnoSpan(8-13, three)
         """
-        span = None
-        for span in self:
-            if span.start >= target_span.end:
-                break
-        return span
+        if len(self.spans) == 0:
+            return None
+        idx = bisect_left(self.index.max_starts, target_span.end)
+        return self.spans[min(idx, len(self.spans) - 1)]
 
     def nearest_to(self, target_span):
         """
         Find the nearest span to the target span.
+
+        >>> from .annospan import AnnoSpan
+        >>> from .annodoc import AnnoDoc
+        >>> doc = AnnoDoc('one two three four')
+        >>> tier = AnnoTier([AnnoSpan(0, 3, doc),
+        ...                  AnnoSpan(8, 13, doc),
+        ...                  AnnoSpan(14, 18, doc)])
+        >>> tier.nearest_to(AnnoSpan(4, 7, doc))
+        AnnoSpan(8-13, three)
+        >>> tier.spans = tier.spans[:1]
+        >>> tier.nearest_to(AnnoSpan(4, 7, doc))
+        AnnoSpan(0-3, one)
         """
+        if self.index.starts_sorted:
+            return self._nearest_to_sorted(target_span)
         closest_span = None
         min_distance = None
         for span in self:
@@ -437,6 +571,27 @@ class AnnoTier(object):
                 break
         return closest_span
 
+    def _nearest_to_sorted(self, target_span):
+        # The spans are ordered by their start offsets, so the distance of the
+        # spans that start at or after the target only increases.
+        # Before the target the distance increases where a span ends before
+        # the span preceding it.
+        # The result is the last span before the first increase,
+        # which is what the linear scan in nearest_to finds.
+        index = self.index
+        if len(self.spans) == 0:
+            return None
+        idx = bisect_left(index.starts, target_span.start)
+        if index.first_end_decrease < idx:
+            return self.spans[index.first_end_decrease - 1]
+        if idx == len(self.spans):
+            return self.spans[-1]
+        if idx > 0 and (
+                self.spans[idx].distance(target_span) >
+                self.spans[idx - 1].distance(target_span)):
+            return self.spans[idx - 1]
+        return self.spans[bisect_right(index.starts, index.starts[idx]) - 1]
+
     def label_spans(self, label):
         """
         Create a new tier based on this one
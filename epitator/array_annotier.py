@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# coding=utf8
+from __future__ import absolute_import
+import numpy as np
+from .annospan import SpanGroup
+from .annotier import AnnoTier
+
+
+def span_arrays(spans):
+    """
+    Return parallel arrays of the start offsets, end offsets and spans
+    in the given list of spans.
+    """
+    starts = np.fromiter((span.start for span in spans), dtype=np.int64, count=len(spans))
+    ends = np.fromiter((span.end for span in spans), dtype=np.int64, count=len(spans))
+    span_array = np.empty(len(spans), dtype=object)
+    for idx, span in enumerate(spans):
+        span_array[idx] = span
+    return starts, ends, span_array
+
+
+def is_sorted(starts, ends):
+    """
+    Return True if the offsets are in the order AnnoTier sorts spans in.
+    """
+    next_starts = starts[1:]
+    prev_starts = starts[:-1]
+    return bool(np.all(
+        (next_starts > prev_starts) |
+        ((next_starts == prev_starts) & (ends[1:] >= ends[:-1]))))
+
+
+def pair_indices(lower_bounds, upper_bounds):
+    """
+    Expand the index ranges [lower_bound, upper_bound) into
+    a pair of flat arrays. The first contains the position of the range
+    the index came from and the second contains the index.
+
+    >>> outer, inner = pair_indices(np.array([0, 2, 3]), np.array([2, 2, 5]))
+    >>> outer.tolist(), inner.tolist()
+    ([0, 0, 2, 2], [0, 1, 3, 4])
+    """
+    counts = np.maximum(upper_bounds - lower_bounds, 0)
+    outer = np.repeat(np.arange(len(counts)), counts)
+    range_starts = np.cumsum(counts) - counts
+    inner = np.arange(counts.sum()) - np.repeat(range_starts - lower_bounds, counts)
+    return outer, inner
+
+
+class ArrayAnnoTier(AnnoTier):
+    """
+    An AnnoTier that also stores the offsets of its spans in parallel NumPy
+    arrays so joins with other tiers can be computed with vectorized
+    searches instead of interpreted loops.
+    The joins return the same results as the AnnoTier methods they override.
+    If either tier is not sorted the AnnoTier implementation is used.
+    """
+    def __init__(self, spans=None, presorted=False):
+        super(ArrayAnnoTier, self).__init__(spans, presorted)
+        self._arrays = None
+        self._arrays_key = None
+
+    def __repr__(self):
+        return ('ArrayAnnoTier([' +
+                ', '.join([span.__repr__() for span in self.spans]) +
+                '])')
+
+    def __add__(self, other_tier):
+        return ArrayAnnoTier(self.spans + other_tier.spans)
+
+    @property
+    def arrays(self):
+        """
+        A tuple with the start offset array, end offset array and span array
+        of this tier. The arrays are rebuilt if the spans list is replaced
+        or its length changes.
+        """
+        arrays_key = (id(self.spans), len(self.spans))
+        if self._arrays_key != arrays_key:
+            starts, ends, span_array = span_arrays(self.spans)
+            self._arrays = (starts, ends, span_array, is_sorted(starts, ends))
+            self._arrays_key = arrays_key
+        return self._arrays[:3]
+
+    @property
+    def is_sorted(self):
+        self.arrays
+        return self._arrays[3]
+
+    def _other_arrays(self, other_tier):
+        if isinstance(other_tier, ArrayAnnoTier):
+            return other_tier.spans, other_tier.arrays, other_tier.is_sorted
+        elif isinstance(other_tier, AnnoTier):
+            other_spans = other_tier.spans
+        else:
+            other_spans = sorted(other_tier)
+        starts, ends, span_array = span_arrays(other_spans)
+        return other_spans, (starts, ends, span_array), is_sorted(starts, ends)
+
+    def _fallback_tier(self, other_tier, other_spans):
+        # The other tier may have been a generator that was consumed
+        # when its arrays were created.
+        return other_tier if isinstance(other_tier, AnnoTier) else other_spans
+
+    def _partial_containment_lower_bounds(self, starts, other_ends):
+        # The first span in the other tier that ends after each span starts.
+        return np.searchsorted(np.maximum.accumulate(other_ends), starts, side='right')
+
+    def group_spans_by_containing_span(self,
+                                       other_tier,
+                                       allow_partial_containment=False):
+        """
+        Group spans in other_tier by the spans that contain them in this one.
+
+        >>> from .annospan import AnnoSpan
+        >>> from .annodoc import AnnoDoc
+        >>> doc = AnnoDoc('one two three')
+        >>> tier_a = ArrayAnnoTier([AnnoSpan(0, 3, doc), AnnoSpan(4, 7, doc)])
+        >>> tier_b = AnnoTier([AnnoSpan(0, 1, doc), AnnoSpan(2, 5, doc)])
+        >>> list(tier_a.group_spans_by_containing_span(tier_b))
+        [(AnnoSpan(0-3, one), [AnnoSpan(0-1, o)]), (AnnoSpan(4-7, two), [])]
+        >>> list(tier_a.group_spans_by_containing_span(tier_b, allow_partial_containment=True))
+        [(AnnoSpan(0-3, one), [AnnoSpan(0-1, o), AnnoSpan(2-5, e t)]), (AnnoSpan(4-7, two), [AnnoSpan(2-5, e t)])]
+        """
+        other_spans, (other_starts, other_ends, other_span_array), other_sorted =\
+            self._other_arrays(other_tier)
+        if not (self.is_sorted and other_sorted):
+            return super(ArrayAnnoTier, self).group_spans_by_containing_span(
+                self._fallback_tier(other_tier, other_spans), allow_partial_containment=allow_partial_containment)
+        starts, ends, span_array = self.arrays
+        if allow_partial_containment:
+            lower_bounds = self._partial_containment_lower_bounds(starts, other_ends)
+        else:
+            lower_bounds = np.searchsorted(other_starts, starts, side='left')
+        upper_bounds = np.searchsorted(other_starts, ends, side='left')
+        outer, inner = pair_indices(lower_bounds, upper_bounds)
+        if not allow_partial_containment:
+            # Remove the spans that extend beyond the containing span.
+            contained = other_ends[inner] <= ends[outer]
+            outer = outer[contained]
+            inner = inner[contained]
+        group_offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(outer, minlength=len(starts)), out=group_offsets[1:])
+        grouped_spans = other_span_array[inner].tolist()
+        group_offsets = group_offsets.tolist()
+        return (
+            (span, grouped_spans[group_offsets[idx]:group_offsets[idx + 1]])
+            for idx, span in enumerate(self.spans))
+
+    def without_overlaps(self, other_tier):
+        """
+        Create a copy of this tier without spans that overlap a span in the
+        other tier.
+
+        >>> from .annospan import AnnoSpan
+        >>> from .annodoc import AnnoDoc
+        >>> doc = AnnoDoc('one two three')
+        >>> tier_a = ArrayAnnoTier([AnnoSpan(0, 3, doc), AnnoSpan(4, 7, doc)])
+        >>> tier_b = AnnoTier([AnnoSpan(5, 9, doc)])
+        >>> tier_a.without_overlaps(tier_b)
+        ArrayAnnoTier([AnnoSpan(0-3, one)])
+        """
+        other_spans, (other_starts, other_ends, other_span_array), other_sorted =\
+            self._other_arrays(other_tier)
+        if not (self.is_sorted and other_sorted):
+            return ArrayAnnoTier(super(ArrayAnnoTier, self).without_overlaps(
+                self._fallback_tier(other_tier, other_spans)))
+        starts, ends, span_array = self.arrays
+        lower_bounds = self._partial_containment_lower_bounds(starts, other_ends)
+        upper_bounds = np.searchsorted(other_starts, ends, side='left')
+        return ArrayAnnoTier(
+            span_array[upper_bounds <= lower_bounds].tolist(), presorted=True)
+
+    def with_following_spans_from(self, other_tier, max_dist=1, allow_overlap=False):
+        """
+        Create a new tier from pairs of spans where the one in the other tier follows a span from this tier.
+
+        >>> from .annospan import AnnoSpan
+        >>> from .annodoc import AnnoDoc
+        >>> doc = AnnoDoc('one two three four')
+        >>> tier1 = ArrayAnnoTier([AnnoSpan(0, 3, doc),
+        ...                        AnnoSpan(8, 13, doc)])
+        >>> tier2 = AnnoTier([AnnoSpan(14, 18, doc)])
+        >>> tier1.with_following_spans_from(tier2)
+        ArrayAnnoTier([SpanGroup(text=three four, label=None, AnnoSpan(8-13, three), AnnoSpan(14-18, four))])
+        """
+        other_spans, (other_starts, other_ends, other_span_array), other_sorted =\
+            self._other_arrays(other_tier)
+        if not (self.is_sorted and other_sorted):
+            return ArrayAnnoTier(super(ArrayAnnoTier, self).with_following_spans_from(
+                self._fallback_tier(other_tier, other_spans), max_dist=max_dist, allow_overlap=allow_overlap))
+        starts, ends, span_array = self.arrays
+        lower_bounds = self._partial_containment_lower_bounds(starts, other_ends)
+        # Skip the spans that do not start after this tier's spans.
+        if allow_overlap:
+            following_bounds = np.searchsorted(other_starts, starts, side='right')
+        else:
+            following_bounds = np.searchsorted(other_starts, ends, side='left')
+        lower_bounds = np.maximum(lower_bounds, following_bounds)
+        upper_bounds = np.searchsorted(other_starts, ends + (max_dist + 1), side='left')
+        outer, inner = pair_indices(lower_bounds, upper_bounds)
+        return ArrayAnnoTier([
+            SpanGroup([span, other_span])
+            for span, other_span in zip(span_array[outer].tolist(),
+                                        other_span_array[inner].tolist())])
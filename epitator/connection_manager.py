@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Read-only connections to the EpiTator database for annotators.
+
+The database is opened read-only through a URI with a large memory map,
+so the gazetteer's pages are served from the operating system's page cache
+and shared by every process that uses it. Each thread of each process gets
+its own connection, so annotators can be used after forking and from
+multiple threads without sharing a connection.
+
+Example::
+
+    from epitator.connection_manager import ConnectionManager, set_connection_manager
+    set_connection_manager(ConnectionManager(immutable=True))
+    # Annotators created from now on use the new manager.
+"""
+from __future__ import absolute_import
+import collections
+import os
+import sqlite3
+import threading
+import time
+import six
+from six.moves.urllib.request import pathname2url
+from .get_database_connection import get_database_connection, ANNOTATOR_DB_PATH
+
+
+# SQLite limits the memory map to a size set when it is compiled,
+# so this is reduced to that size on most platforms.
+DEFAULT_MMAP_SIZE = 16 * 1024 ** 3
+# Negative cache sizes are in KiB.
+DEFAULT_CACHE_SIZE = -64 * 1024
+# The number of prepared statements each connection keeps.
+DEFAULT_CACHED_STATEMENTS = 256
+
+
+class QueryTiming(collections.namedtuple('QueryTiming', ['calls', 'seconds'])):
+    """
+    The number of times a query was executed and the total number of seconds
+    spent executing it and fetching its results.
+    """
+    __slots__ = ()
+
+
+class ConnectionManager(object):
+    """
+    Hands out read-only connections to the EpiTator database,
+    one for each thread in each process.
+
+    Args:
+        db_path (str): The path to the database. Defaults to ANNOTATOR_DB_PATH.
+        immutable (bool): Whether to open the database as immutable, which
+            skips all locking. Only use this when nothing will write to
+            the database while it is open.
+        mmap_size (int): The number of bytes of the database to memory map.
+        cache_size (int): SQLite's page cache size for each connection.
+        cached_statements (int): The number of prepared statements
+            each connection keeps.
+    """
+    def __init__(self, db_path=None, immutable=False, mmap_size=DEFAULT_MMAP_SIZE,
+                 cache_size=DEFAULT_CACHE_SIZE, cached_statements=DEFAULT_CACHED_STATEMENTS):
+        self.db_path = db_path or ANNOTATOR_DB_PATH
+        self.immutable = immutable
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.cached_statements = cached_statements
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        # The connections opened in this process,
+        # and the process they were opened in.
+        self.connections = []
+        self.connections_pid = os.getpid()
+        self.database_checked = False
+        self.timings = {}
+
+    def check_database(self):
+        """
+        Check that the database exists and has the version this version of
+        EpiTator uses, updating it if it was created by an earlier version.
+        This requires write access, so it is done once with a regular connection.
+        """
+        if not self.database_checked:
+            with self.lock:
+                if not self.database_checked:
+                    get_database_connection(db_path=self.db_path).close()
+                    self.database_checked = True
+
+    def open_connection(self):
+        self.check_database()
+        # Connections are only used by the thread that opened them, but they
+        # may be closed by another thread.
+        if six.PY2:
+            connection = sqlite3.connect(
+                self.db_path, check_same_thread=False,
+                cached_statements=self.cached_statements)
+        else:
+            uri = 'file:' + pathname2url(os.path.abspath(self.db_path)) + '?mode=ro'
+            if self.immutable:
+                uri += '&immutable=1'
+            connection = sqlite3.connect(
+                uri, uri=True, check_same_thread=False,
+                cached_statements=self.cached_statements)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA mmap_size = %d" % self.mmap_size)
+        connection.execute("PRAGMA cache_size = %d" % self.cache_size)
+        connection.execute("PRAGMA query_only = 1")
+        return connection
+
+    def connection(self):
+        """
+        Return the connection for the current thread, opening it
+        if the thread does not have one in this process.
+        """
+        pid = os.getpid()
+        if getattr(self.local, 'pid', None) != pid:
+            connection = self.open_connection()
+            with self.lock:
+                if self.connections_pid != pid:
+                    # Connections inherited from the parent process are
+                    # dropped rather than closed, since closing them could
+                    # interfere with the parent's use of them.
+                    self.connections = []
+                    self.connections_pid = pid
+                    self.timings = {}
+                self.connections.append(connection)
+            self.local.connection = connection
+            self.local.pid = pid
+        return self.local.connection
+
+    def execute(self, query, parameters=()):
+        """
+        Execute the query on the current thread's connection and
+        return a list of the resulting rows. The time spent is added to
+        the query's timing.
+        """
+        start = time.time()
+        result = self.connection().execute(query, parameters).fetchall()
+        elapsed = time.time() - start
+        with self.lock:
+            calls, seconds = self.timings.get(query, (0, 0.0))
+            self.timings[query] = QueryTiming(calls + 1, seconds + elapsed)
+        return result
+
+    def query_timings(self):
+        """
+        Return a dict of the queries executed with this manager in this
+        process to their QueryTiming.
+        """
+        with self.lock:
+            return dict(self.timings)
+
+    def reset_timings(self):
+        with self.lock:
+            self.timings = {}
+
+    def close(self):
+        """
+        Close the connections this manager opened in this process.
+        Threads that use the manager afterwards open new ones.
+        """
+        with self.lock:
+            if self.connections_pid == os.getpid():
+                for connection in self.connections:
+                    connection.close()
+            self.connections = []
+            self.connections_pid = os.getpid()
+        self.local = threading.local()
+
+
+connection_manager = None
+connection_manager_lock = threading.Lock()
+
+
+def get_connection_manager():
+    """
+    Return the ConnectionManager database-backed annotators use,
+    creating one for ANNOTATOR_DB_PATH if none has been set.
+    """
+    global connection_manager
+    if connection_manager is None:
+        with connection_manager_lock:
+            if connection_manager is None:
+                connection_manager = ConnectionManager()
+    return connection_manager
+
+
+def set_connection_manager(manager):
+    global connection_manager
+    connection_manager = manager
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+"""
+Annotate a corpus of documents with a pool of worker processes.
+
+The spaCy model and annotators are created in the parent process before the
+workers are forked, so the workers start warm and share the parent's memory
+copy-on-write. Annotators get their database connections from the connection
+manager, which opens new ones in each worker.
+Workers are sent chunks of documents and report back as they start and
+finish each one. If a worker crashes or takes longer than the timeout on
+a document, that document's result records the error, the worker is
+replaced and the rest of its chunk is dispatched again.
+
+Workers are started with fork, so the runner is only supported on platforms
+where it is available.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+import collections
+import importlib
+import multiprocessing
+import time
+import traceback
+import six
+from .annodoc import AnnoDoc
+try:
+    from multiprocessing.connection import wait as wait_for_connections
+except ImportError:
+    wait_for_connections = None
+
+
+# The annotator that creates each tier, as module and class names so
+# the annotators are only imported when they are used.
+TIER_ANNOTATORS = {
+    'spacy.tokens': ('epitator.spacy_annotator', 'SpacyAnnotator'),
+    'spacy.nes': ('epitator.spacy_annotator', 'SpacyAnnotator'),
+    'spacy.noun_chunks': ('epitator.spacy_annotator', 'SpacyAnnotator'),
+    'spacy.sentences': ('epitator.spacy_annotator', 'SpacyAnnotator'),
+    'tokens': ('epitator.token_annotator', 'TokenAnnotator'),
+    'nes': ('epitator.ne_annotator', 'NEAnnotator'),
+    'pos': ('epitator.pos_annotator', 'POSAnnotator'),
+    'ngrams': ('epitator.ngram_annotator', 'NgramAnnotator'),
+    'raw_numbers': ('epitator.raw_number_annotator', 'RawNumberAnnotator'),
+    'dates': ('epitator.date_annotator', 'DateAnnotator'),
+    'dates.all': ('epitator.date_annotator', 'DateAnnotator'),
+    'counts': ('epitator.count_annotator', 'CountAnnotator'),
+    'infections': ('epitator.infection_annotator', 'InfectionAnnotator'),
+    'geonames': ('epitator.geoname_annotator', 'GeonameAnnotator'),
+    'resolved_keywords': ('epitator.resolved_keyword_annotator', 'ResolvedKeywordAnnotator'),
+    'diseases': ('epitator.disease_annotator', 'DiseaseAnnotator'),
+    'species': ('epitator.species_annotator', 'SpeciesAnnotator'),
+    'structured_data': ('epitator.structured_data_annotator', 'StructuredDataAnnotator'),
+    'structured_data.values': ('epitator.structured_data_annotator', 'StructuredDataAnnotator'),
+    'incidents': ('epitator.incident_annotator', 'IncidentAnnotator'),
+    'structured_incidents': ('epitator.structured_incident_annotator', 'StructuredIncidentAnnotator'),
+}
+
+WARM_UP_TEXT = u"""
+Since 1 Jan 2018, 12 new cases of Lassa fever have been reported in Ondo State, Nigeria.
+
+Location | Cases
+Ondo | 12
+"""
+
+
+class AnnotationResult(collections.namedtuple('AnnotationResult', ['index', 'value', 'error'])):
+    """
+    The result of annotating the document at the given index of the corpus.
+    value is None and error is a string describing what went wrong
+    if the document could not be annotated.
+    """
+    __slots__ = ()
+
+
+def annotator_for_tier(tier_name, annotators=None):
+    """
+    Return the annotator class that creates the given tier.
+    """
+    if annotators and tier_name in annotators:
+        return annotators[tier_name]
+    if tier_name not in TIER_ANNOTATORS:
+        raise Exception("There is no known annotator for the tier: " + tier_name)
+    module_name, class_name = TIER_ANNOTATORS[tier_name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def tiers_to_dicts(doc, tier_names):
+    """
+    The default result for an annotated document, a dict of the
+    json serializable dicts of the spans in each tier.
+    """
+    return {
+        tier_name: [span.to_dict() for span in doc.tiers[tier_name]]
+        for tier_name in tier_names}
+
+
+def annotate_document(text, date, tier_names, annotators=None, serialize=tiers_to_dicts):
+    doc = AnnoDoc(text, date)
+    for tier_name in tier_names:
+        doc.require_tiers(tier_name, via=annotator_for_tier(tier_name, annotators))
+    return serialize(doc, tier_names)
+
+
+def worker_main(task_connection, result_connection, tier_names, annotators, serialize):
+    while True:
+        chunk = task_connection.recv()
+        if chunk is None:
+            break
+        for idx, text, date in chunk:
+            result_connection.send(('started', idx))
+            try:
+                value = annotate_document(text, date, tier_names, annotators, serialize)
+                result_connection.send(('finished', AnnotationResult(idx, value, None)))
+            except Exception:
+                result_connection.send(('finished', AnnotationResult(idx, None, traceback.format_exc())))
+        result_connection.send(('ready', None))
+
+
+class Worker(object):
+    def __init__(self, context, runner):
+        task_reader, task_writer = context.Pipe(duplex=False)
+        result_reader, result_writer = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=worker_main,
+            args=(task_reader, result_writer,
+                  runner.tier_names, runner.annotators, runner.serialize))
+        self.process.daemon = True
+        self.process.start()
+        task_reader.close()
+        result_writer.close()
+        self.task_connection = task_writer
+        self.result_connection = result_reader
+        # The documents in the chunk the worker has not started yet.
+        self.pending = collections.deque()
+        # The index of the document the worker is annotating and
+        # when it started.
+        self.current = None
+        self.started_at = None
+        self.idle = True
+
+    def send_chunk(self, chunk):
+        self.pending.extend(chunk)
+        self.idle = False
+        self.task_connection.send(chunk)
+
+    def stop(self, terminate=False):
+        if terminate:
+            self.process.terminate()
+        else:
+            try:
+                self.task_connection.send(None)
+            except (IOError, OSError):
+                pass
+        self.process.join()
+        self.task_connection.close()
+        self.result_connection.close()
+
+
+class CorpusRunner(object):
+    """
+    Annotates documents with a pool of forked worker processes.
+
+    Args:
+        tier_names (list): The tiers to create for each document.
+        processes (int): The number of worker processes.
+            Defaults to the number of CPUs.
+        chunk_size (int): The number of documents sent to a worker at a time.
+        timeout (float): The number of seconds a worker may spend on a document
+            before it is terminated. If None, documents have no time limit.
+        ordered (bool): Whether results are returned in the order of the
+            input documents or as they are completed.
+        annotators (dict): A dict of tier names to annotator classes
+            used instead of the default annotator for the tier.
+        serialize (function): Takes an annotated AnnoDoc and the tier names
+            and returns the picklable value sent back from the worker.
+
+    Example::
+
+        runner = CorpusRunner(['geonames', 'dates'], processes=4, timeout=60)
+        for result in runner.run((article.text, article.date) for article in articles):
+            print(result.index, result.error or result.value['geonames'])
+    """
+    poll_interval = 0.5
+
+    def __init__(self, tier_names, processes=None, chunk_size=10, timeout=None,
+                 ordered=True, annotators=None, serialize=tiers_to_dicts):
+        self.tier_names = list(tier_names)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.ordered = ordered
+        self.annotators = annotators
+        self.serialize = serialize
+        if hasattr(multiprocessing, 'get_context'):
+            self.context = multiprocessing.get_context('fork')
+        else:
+            self.context = multiprocessing
+        self.preloaded = False
+
+    def preload(self):
+        """
+        Load the spaCy model, annotators and other resources used to create
+        the target tiers in this process by annotating a short document.
+        The workers inherit them when they are forked.
+        """
+        annotate_document(WARM_UP_TEXT, None, self.tier_names, self.annotators, self.serialize)
+        self.preloaded = True
+
+    def run(self, documents):
+        """
+        Annotate an iterable of (text, date) tuples or texts and yield an
+        AnnotationResult for each one.
+        """
+        if not self.preloaded:
+            self.preload()
+        documents = (
+            (idx, document, None) if isinstance(document, six.string_types) else
+            (idx, document[0], document[1])
+            for idx, document in enumerate(documents))
+        # Documents that were sent to workers that were replaced before
+        # starting them.
+        backlog = collections.deque()
+        workers = [Worker(self.context, self) for _ in range(self.processes)]
+        completed = {}
+        next_index = 0
+        documents_remaining = True
+        try:
+            while True:
+                for worker in workers:
+                    if not worker.idle:
+                        continue
+                    chunk = []
+                    while backlog and len(chunk) < self.chunk_size:
+                        chunk.append(backlog.popleft())
+                    while documents_remaining and len(chunk) < self.chunk_size:
+                        document = next(documents, None)
+                        if document is None:
+                            documents_remaining = False
+                        else:
+                            chunk.append(document)
+                    if chunk:
+                        worker.send_chunk(chunk)
+                if all(worker.idle for worker in workers):
+                    break
+                self.wait(workers)
+                for worker_idx, worker in enumerate(workers):
+                    alive = worker.process.is_alive()
+                    results = self.receive(worker)
+                    error = None
+                    if not alive:
+                        error = "The worker process exited with code " + str(worker.process.exitcode)
+                    elif (self.timeout is not None and worker.current is not None and
+                          time.time() - worker.started_at > self.timeout):
+                        error = "The document was not annotated within the timeout"
+                    if error:
+                        if worker.current is not None:
+                            results.append(AnnotationResult(worker.current, None, error))
+                        backlog.extendleft(reversed(worker.pending))
+                        worker.stop(terminate=True)
+                        workers[worker_idx] = Worker(self.context, self)
+                    for result in results:
+                        if self.ordered:
+                            completed[result.index] = result
+                        else:
+                            yield result
+                    while next_index in completed:
+                        yield completed.pop(next_index)
+                        next_index += 1
+        finally:
+            for worker in workers:
+                worker.stop(terminate=not worker.idle)
+
+    def receive(self, worker):
+        results = []
+        while worker.result_connection.poll():
+            try:
+                message_type, value = worker.result_connection.recv()
+            except (EOFError, IOError, OSError):
+                break
+            if message_type == 'started':
+                worker.pending.popleft()
+                worker.current = value
+                worker.started_at = time.time()
+            elif message_type == 'finished':
+                worker.current = None
+                results.append(value)
+            elif message_type == 'ready':
+                worker.idle = True
+        return results
+
+    def wait(self, workers):
+        connections = [worker.result_connection for worker in workers]
+        if wait_for_connections:
+            wait_for_connections(connections, timeout=self.poll_interval)
+        elif not any(connection.poll() for connection in connections):
+            time.sleep(0.01)
+
+
+def annotate_corpus(documents, tier_names, **kwargs):
+    """
+    Annotate an iterable of (text, date) tuples with a CorpusRunner
+    and yield an AnnotationResult for each one.
+    The keyword arguments are passed to the CorpusRunner.
+    """
+    return CorpusRunner(tier_names, **kwargs).run(documents)
@@ -5,16 +5,28 @@ cumulative, case, death, age, hospitalization, approximate, min, max
 """
 from __future__ import absolute_import
 from .annotator import Annotator, AnnoTier, AnnoSpan
-from .spacy_annotator import SpacyAnnotator
+from .spacy_annotator import SpacyAnnotator, as_token_tier
 from .date_annotator import DateAnnotator
 from .raw_number_annotator import RawNumberAnnotator
 from . import utils
-from .spacy_nlp import spacy_nlp
+from .spacy_nlp import get_spacy_nlp, model_lock
 import logging
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s %(message)s')
 logger = logging.getLogger(__name__)
 
-in_case_token = spacy_nlp(u"Break glass in case of emergency.")[3]
+_in_case_token = None
+
+
+def get_in_case_token():
+    """
+    Return a token for the word case used in the sense of "in case of".
+    It is created with the spaCy model the first time it is needed.
+    """
+    global _in_case_token
+    if _in_case_token is None:
+        with model_lock:
+            _in_case_token = get_spacy_nlp()(u"Break glass in case of emergency.")[3]
+    return _in_case_token
 
 
 class CountSpan(AnnoSpan):
@@ -61,20 +73,12 @@ class CountAnnotator(Annotator):
             doc.add_tiers(DateAnnotator())
         if 'raw_numbers' not in doc.tiers:
             doc.add_tiers(RawNumberAnnotator())
-        spacy_tokens = doc.tiers['spacy.tokens']
+        spacy_tokens = as_token_tier(doc.tiers['spacy.tokens'])
         spacy_sentences = doc.tiers['spacy.sentences']
         spacy_nes = doc.tiers['spacy.nes']
         counts = doc.tiers['raw_numbers']
 
-        spacy_lemmas = [span.token.lemma_ for span in spacy_tokens]
-
-        def search_lemmas(lemmas, match_name=None):
-            match_spans = []
-            lemmas = set(lemmas)
-            for span, lemma in zip(spacy_tokens, spacy_lemmas):
-                if lemma in lemmas:
-                    match_spans.append(span)
-            return AnnoTier(match_spans, presorted=True).label_spans(match_name)
+        search_lemmas = spacy_tokens.with_lemmas
 
         counts_tier = AnnoTier(AnnoSpan(count.start, count.end, doc, 'count')
                                for count in counts if is_valid_count(count.text))
@@ -106,15 +110,16 @@ class CountAnnotator(Annotator):
             'approximate|about|near|around',
             'ongoing|active',
         ]
-        count_descriptions = AnnoTier(counts_tier)
         person_and_place_nes = spacy_nes.with_label('GPE') + spacy_nes.with_label('PERSON')
+        modifier_tiers = []
         for group in modifier_lemma_groups:
             lemmas = group.split('|')
-            results = search_lemmas(lemmas, match_name=lemmas[0])
+            results = search_lemmas(lemmas, lemmas[0])
             # prevent components of NEs like the "New" in New York from being
             # treated as count descriptors.
-            results = results.without_overlaps(person_and_place_nes)
-            count_descriptions += count_descriptions.with_nearby_spans_from(results)
+            modifier_tiers.append(results.without_overlaps(person_and_place_nes))
+        # Counts are combined with nearby modifiers from each group in turn.
+        count_descriptions = counts_tier.with_nearby_spans_from_tiers(modifier_tiers)
         case_descriptions = AnnoTier(
             search_lemmas(
                 [
@@ -163,7 +168,7 @@ class CountAnnotator(Annotator):
         for cd_span, token_group in case_descriptions.group_spans_by_containing_span(spacy_tokens):
             for t_span in token_group:
                 token = t_span.token
-                if token.lemma_ == 'case' and token.similarity(in_case_token) < 0.5:
+                if token.lemma_ == 'case' and token.similarity(get_in_case_token()) < 0.5:
                     continue
                 if token.tag_ == 'NN' and any(c.lower_ in determiner_lemmas
                                               for c in token.children):
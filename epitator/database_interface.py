@@ -1,24 +1,34 @@
 #!/usr/bin/env python
-from .get_database_connection import get_database_connection
+from .connection_manager import get_connection_manager
 import re
 
 
+def dict_factory(cursor, row):
+    d = {}
+    for idx, col in enumerate(cursor.description):
+        d[col[0]] = row[idx]
+    return d
+
+
 class DatabaseInterface(object):
     """
     This interface provides utility methods for the embedded EpiTator database.
     """
-    def __init__(self):
-        self.db_connection = get_database_connection()
+    def __init__(self, connection_manager=None):
+        self.connection_manager = connection_manager or get_connection_manager()
+        self.connection_manager.check_database()
 
-        def dict_factory(cursor, row):
-            d = {}
-            for idx, col in enumerate(cursor.description):
-                d[col[0]] = row[idx]
-            return d
-        self.db_connection.row_factory = dict_factory
+    @property
+    def db_connection(self):
+        return self.connection_manager.connection()
 
-    def lookup_synonym(self, synonym, entity_type):
+    def cursor(self):
         cursor = self.db_connection.cursor()
+        cursor.row_factory = dict_factory
+        return cursor
+
+    def lookup_synonym(self, synonym, entity_type):
+        cursor = self.cursor()
         synonym = re.sub(r"[\s\-\/]+", " ", synonym)
         synonym = re.sub(r"[\"']", "", synonym)
         return cursor.execute('''
@@ -32,7 +42,7 @@ class DatabaseInterface(object):
         ''', ['%' + synonym + '%', entity_type])
 
     def get_entity(self, entity_id):
-        cursor = self.db_connection.cursor()
+        cursor = self.cursor()
         return next(cursor.execute('''
         SELECT *
         FROM entities
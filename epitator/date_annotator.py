@@ -1,12 +1,14 @@
 #!/usr/bin/env python
 from __future__ import absolute_import
 from .annotator import Annotator, AnnoTier, AnnoSpan
-from .spacy_annotator import SpacyAnnotator
+from .spacy_annotator import SpacyAnnotator, as_token_tier
 from .structured_data_annotator import StructuredDataAnnotator
+from .utils import LRUCache
 from dateparser.date import DateDataParser
 from dateutil.relativedelta import relativedelta
 import re
 import datetime
+import threading
 
 DATE_RANGE_JOINERS = r"to|through|until|untill|and"
 
@@ -58,6 +60,83 @@ extra_word_re = re.compile(
     r"((late|mid|early)\s)", re.I)
 
 
+MONTHS = {
+    datetime.datetime(2000, month, 1).strftime(form).lower(): month
+    for month in range(1, 13)
+    for form in ["%B", "%b"]}
+MONTHS['sept'] = 9
+month_name_re = r"(?P<month_name>" + "|".join(sorted(MONTHS, key=len, reverse=True)) + ")"
+day_re = r"(?P<day>\d{1,2})(st|nd|rd|th)?"
+year_re = r"(?P<year>[12]\d{3})"
+# Date formats that can be parsed without dateparser. Each pattern
+# matches an entire cleaned date string.
+numeric_date_re = re.compile(
+    r"(?P<a>\d{1,2}) ?(?P<sep>[\/\-\.]) ?(?P<b>\d{1,2}) ?(?P=sep) ?" + year_re + "$")
+numeric_year_first_date_re = re.compile(
+    year_re + r" ?(?P<sep>[\/\-\.]) ?(?P<a>\d{1,2}) ?(?P=sep) ?(?P<b>\d{1,2})$")
+month_name_date_res = [
+    re.compile(day_re + " " + month_name_re + ",? " + year_re + "$", re.I),
+    re.compile(month_name_re + " " + day_re + ",? " + year_re + "$", re.I),
+    re.compile(month_name_re + ",? " + year_re + "$", re.I),
+    re.compile(year_re + "$")]
+
+
+def fast_date_range(text):
+    """
+    Return the datetime range of a cleaned date string in a common absolute
+    format, like 2018-03-12, 12/3/2018, 12 March 2018, March 12, 2018,
+    March 2018 or 2018, without using dateparser. The ranges are the same as
+    the ones dateparser's results are converted to. Numeric dates are read
+    month first, like dateparser does, unless the month would be invalid.
+    Returns None for other strings and invalid dates, which are left to
+    dateparser.
+
+    >>> fast_date_range('12/3/2018')
+    (datetime.datetime(2018, 12, 3, 0, 0), datetime.datetime(2018, 12, 4, 0, 0))
+    >>> fast_date_range('March 2018')
+    (datetime.datetime(2018, 3, 1, 0, 0), datetime.datetime(2018, 4, 1, 0, 0))
+    >>> fast_date_range('last week') is None
+    True
+    """
+    match = numeric_date_re.match(text) or numeric_year_first_date_re.match(text)
+    if match:
+        a = int(match.group('a'))
+        b = int(match.group('b'))
+        if a <= 12:
+            month, day = a, b
+        elif b <= 12:
+            month, day = b, a
+        else:
+            return None
+        period = 'day'
+    else:
+        for pattern in month_name_date_res:
+            match = pattern.match(text)
+            if match:
+                break
+        else:
+            return None
+        groups = match.groupdict()
+        month = MONTHS[groups['month_name'].lower()] if groups.get('month_name') else 1
+        day = int(groups['day']) if groups.get('day') else 1
+        if groups.get('day'):
+            period = 'day'
+        elif groups.get('month_name'):
+            period = 'month'
+        else:
+            period = 'year'
+    try:
+        date = datetime.datetime(int(match.group('year')), month, day)
+    except ValueError:
+        return None
+    if period == 'day':
+        return (date, date + relativedelta(days=1))
+    elif period == 'month':
+        return (date, date + relativedelta(months=1))
+    else:
+        return (date, date + relativedelta(years=1))
+
+
 def clean_date_str(text):
     # strip extra words from the beginning of the date string
     text = extra_word_re.sub("", text, re.I)
@@ -66,6 +145,86 @@ def clean_date_str(text):
     return text.strip()
 
 
+class DateParserPool(object):
+    """
+    Reuses DateDataParsers with the same settings, rather than creating
+    a new one for every date string.
+    Parsers keep state between calls, so each thread has its own parsers.
+    The max_size most recently used parsers of each thread are kept.
+    Parsers that are unlikely to be used again, like those with the current
+    time as their relative base, can be created without keeping them
+    by setting retain to False.
+    """
+    def __init__(self, max_size=100):
+        self.max_size = max_size
+        self.local = threading.local()
+
+    def get(self, relative_base=None, prefer_dates_from=None, strict=False, retain=True):
+        parsers = getattr(self.local, 'parsers', None)
+        if parsers is None:
+            parsers = self.local.parsers = LRUCache(self.max_size)
+        key = (relative_base, prefer_dates_from, strict)
+        parser = parsers.get(key)
+        if parser is None:
+            settings = {}
+            if relative_base is not None:
+                settings['RELATIVE_BASE'] = relative_base
+            if prefer_dates_from is not None:
+                settings['PREFER_DATES_FROM'] = prefer_dates_from
+            if strict:
+                settings['STRICT_PARSING'] = True
+            parser = DateDataParser(['en'], settings=settings)
+            if retain:
+                parsers[key] = parser
+        return parser
+
+
+date_parser_pool = DateParserPool()
+# The datetime ranges of the date strings parsed with dateparser,
+# keyed by the text, relative base and preferred dates.
+parsed_date_cache = LRUCache(20000)
+# Distinguishes strings missing from the cache from strings cached as None.
+unparsed = object()
+
+
+def parse_date_text(text, relative_base, prefer_dates_from='past', cache=True):
+    """
+    Parse a cleaned date string with dateparser and return the datetime range
+    of the day, month or year it refers to, or None if it cannot be parsed.
+    Results are cached, so strings that are repeated with the same relative
+    base are only parsed once. Strings in common absolute formats are parsed
+    by fast_date_range instead.
+    Set cache to False when the relative base will not be used again,
+    so the result and parser are not kept.
+    """
+    result = fast_date_range(text)
+    if result is not None:
+        return list(result)
+    key = (text, relative_base, prefer_dates_from)
+    result = parsed_date_cache.get(key, unparsed) if cache else unparsed
+    if result is unparsed:
+        result = None
+        parser = date_parser_pool.get(relative_base, prefer_dates_from, retain=cache)
+        try:
+            date_data = parser.get_date_data(text)
+        except (TypeError, ValueError):
+            date_data = {'date_obj': None}
+        if date_data['date_obj']:
+            date = date_data['date_obj']
+            if date_data['period'] == 'day':
+                result = (date, date + relativedelta(days=1))
+            elif date_data['period'] == 'month':
+                date = datetime.datetime(date.year, date.month, 1)
+                result = (date, date + relativedelta(months=1))
+            elif date_data['period'] == 'year':
+                date = datetime.datetime(date.year, 1, 1)
+                result = (date, date + relativedelta(years=1))
+        if cache:
+            parsed_date_cache[key] = result
+    # A new list is returned so callers cannot modify the cached range.
+    return None if result is None else list(result)
+
+
 class DateSpan(AnnoSpan):
     def __init__(self, base_span, datetime_range):
         super(DateSpan, self).__init__(
@@ -115,9 +274,11 @@ class DateAnnotator(Annotator):
         # be treated as the most recent date explicitly mentioned in the
         # the document.
         detect_date = doc.date is None
-        doc_date = doc.date or datetime.datetime.now()
-        strict_parser = DateDataParser(['en'], settings={
-            'STRICT_PARSING': True})
+        # Dates parsed relative to the current time are not cached
+        # because the current time is different for every document.
+        now = datetime.datetime.now()
+        doc_date = doc.date or now
+        strict_parser = date_parser_pool.get(strict=True)
 
         def date_to_datetime_range(text,
                                    relative_base=None,
@@ -180,25 +341,11 @@ class DateAnnotator(Annotator):
                 decade = int(decade_match.groups()[0])
                 return [datetime.datetime(decade, 1, 1),
                         datetime.datetime(decade + 10, 1, 1)]
-            parser = DateDataParser(['en'], settings={
-                'RELATIVE_BASE': relative_base or datetime.datetime.now(),
-                'PREFER_DATES_FROM': prefer_dates_from
-            })
-            try:
-                text = re.sub(r" year$", "", text)
-                date_data = parser.get_date_data(text)
-            except (TypeError, ValueError):
-                return
-            if date_data['date_obj']:
-                date = date_data['date_obj']
-                if date_data['period'] == 'day':
-                    return [date, date + relativedelta(days=1)]
-                elif date_data['period'] == 'month':
-                    date = datetime.datetime(date.year, date.month, 1)
-                    return [date, date + relativedelta(months=1)]
-                elif date_data['period'] == 'year':
-                    date = datetime.datetime(date.year, 1, 1)
-                    return [date, date + relativedelta(years=1)]
+            return parse_date_text(
+                re.sub(r" year$", "", text),
+                relative_base,
+                prefer_dates_from,
+                cache=relative_base is not now)
 
         def parse_non_relative_date(text):
             result = date_to_datetime_range(
@@ -256,16 +403,14 @@ class DateAnnotator(Annotator):
                 if date_to_datetime_range(date_group.text) is not None:
                     grouped_date_spans.append(date_group)
         # Find date ranges by looking for joiner words between dates.
-        date_range_joiners = [
-            t_span for t_span in doc.tiers['spacy.tokens']
-            if re.match(r"(" + DATE_RANGE_JOINERS + r"|\-)$", t_span.text, re.I)]
+        spacy_tokens = as_token_tier(doc.tiers['spacy.tokens'])
+        date_range_joiners = spacy_tokens.token_index.lookup(
+            'lower_', DATE_RANGE_JOINERS.split('|') + ['-'])
         date_range_tier = date_span_tier.label_spans('start')\
             .with_following_spans_from(date_range_joiners, max_dist=3)\
             .with_following_spans_from(date_span_tier.label_spans('end'), max_dist=3)\
             .label_spans('date_range')
-        since_tokens = AnnoTier([
-            t_span for t_span in doc.tiers['spacy.tokens']
-            if 'since' == t_span.token.lemma_], presorted=True).label_spans('since_token')
+        since_tokens = spacy_tokens.with_lemmas(['since'], 'since_token')
         since_date_tier = (
             since_tokens.with_following_spans_from(date_span_tier, allow_overlap=True) +
             date_span_tier.with_contained_spans_from(since_tokens)
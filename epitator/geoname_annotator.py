@@ -1,19 +1,20 @@
 #!/usr/bin/env python
 """Geoname Annotator"""
 from __future__ import absolute_import
-import math
 import re
-import sqlite3
 from collections import defaultdict
+import numpy as np
+import six
 
 from .annotator import Annotator, AnnoTier, AnnoSpan
+from .array_annotier import ArrayAnnoTier
 from .ngram_annotator import NgramAnnotator
 from .ne_annotator import NEAnnotator
 from .spacy_annotator import SpacyAnnotator
-from geopy.distance import great_circle
-from .utils import median, normalize_text
+from .spatial_index import great_circle_distances
+from .utils import median, normalize_text, padded_batches, LRUCache
 
-from .get_database_connection import get_database_connection
+from .connection_manager import get_connection_manager
 from . import geoname_classifier
 
 import logging
@@ -53,6 +54,25 @@ CONTAINMENT_LEVELS = [
 ]
 
 
+def feature_code_level(feature_code):
+    """
+    Return the containment level of geonames with the given feature code,
+    or 0 if they are not considered to contain other geonames.
+    """
+    if feature_code == 'ADM1':
+        return 2
+    elif feature_code == 'ADM2':
+        return 3
+    elif feature_code == 'ADM3':
+        return 4
+    elif feature_code == 'ADM4':
+        return 5
+    elif re.match("^PCL.", feature_code):
+        return 1
+    else:
+        return 0
+
+
 def location_contains(loc_outer, loc_inner):
     """
     Do a comparison to see if the first geoname contains the second.
@@ -63,31 +83,80 @@ def location_contains(loc_outer, loc_inner):
     In order for containment to be detected the outer location must have a
     ADM* or PCL* feature code, which is most countries, states, and districts.
     """
-    # Test the country code in advance for efficiency. The country code must match for
-    # any level of containment.
-    if loc_outer.country_code != loc_inner.country_code or loc_outer.country_code == '':
+    containment_key = loc_outer.containment_key
+    if containment_key is None:
         return 0
     if loc_outer.geonameid == loc_inner.geonameid:
         return 0
-    feature_code = loc_outer.feature_code
-    if feature_code == 'ADM1':
-        outer_feature_level = 2
-    elif feature_code == 'ADM2':
-        outer_feature_level = 3
-    elif feature_code == 'ADM3':
-        outer_feature_level = 4
-    elif feature_code == 'ADM4':
-        outer_feature_level = 5
-    elif re.match("^PCL.", feature_code):
-        outer_feature_level = 1
-    else:
+    if loc_inner.admin_codes[:len(containment_key)] != containment_key:
         return 0
-    for prop in CONTAINMENT_LEVELS[1:outer_feature_level]:
-        if loc_outer[prop] == '':
-            return 0
-        if loc_outer[prop] != loc_inner[prop]:
-            return 0
-    return outer_feature_level
+    return len(containment_key)
+
+
+class ContainmentIndex(object):
+    """
+    An index of the geonames in a list that contain other geonames
+    by their containment keys. The geonames in the list that contain
+    a geoname are those whose keys are prefixes of its admin codes,
+    so they can be found with a lookup for each containment level.
+    """
+    def __init__(self, geonames):
+        self.containing_geonames = defaultdict(list)
+        for geoname in geonames:
+            containment_key = geoname.containment_key
+            if containment_key is not None:
+                self.containing_geonames[containment_key].append(geoname)
+
+    def geonames_containing(self, geoname):
+        """
+        Return the geonames in the index that contain the given geoname.
+        """
+        result = []
+        admin_codes = geoname.admin_codes
+        for level in range(1, len(CONTAINMENT_LEVELS) + 1):
+            for containing_geoname in self.containing_geonames.get(admin_codes[:level], []):
+                if containing_geoname.geonameid != geoname.geonameid:
+                    result.append(containing_geoname)
+        return result
+
+
+class ContainmentCodes(object):
+    """
+    The properties of a list of geonames location_contains compares,
+    as arrays so the containment of many pairs of them can be checked at once.
+    Codes are replaced with integers that are equal for equal codes.
+    """
+    def __init__(self, geonames):
+        code_ids = {}
+
+        def code_id(value):
+            return code_ids.setdefault(value, len(code_ids))
+        self.geonameids = np.array([code_id(g.geonameid) for g in geonames], dtype=np.int64)
+        self.levels = np.array([g.containment_level for g in geonames], dtype=np.int64)
+        self.codes = np.array([
+            [code_id(g[prop]) for prop in CONTAINMENT_LEVELS]
+            for g in geonames], dtype=np.int64).reshape(-1, len(CONTAINMENT_LEVELS))
+        self.empty = np.array([
+            [g[prop] == '' for prop in CONTAINMENT_LEVELS]
+            for g in geonames], dtype=bool).reshape(-1, len(CONTAINMENT_LEVELS))
+
+    def contains(self, outer, inner):
+        """
+        Return a boolean array indicating whether location_contains would
+        return a positive value for the geonames at each pair of indices
+        of the outer and inner index arrays.
+        """
+        result = (
+            (self.codes[outer, 0] == self.codes[inner, 0]) &
+            ~self.empty[outer, 0] &
+            (self.geonameids[outer] != self.geonameids[inner]) &
+            (self.levels[outer] > 0))
+        for level in range(1, len(CONTAINMENT_LEVELS)):
+            required = self.levels[outer] > level
+            result &= ~required | (
+                ~self.empty[outer, level] &
+                (self.codes[outer, level] == self.codes[inner, level]))
+        return result
 
 
 class GeoSpan(AnnoSpan):
@@ -144,12 +213,19 @@ class GeonameRow(object):
         'score',
         'lat_long',
         'high_confidence',
-        'base_score']
+        'base_score',
+        'containment_level']
 
     def __init__(self, sqlite3_row):
         for key in sqlite3_row.keys():
             if key in GEONAME_ATTRS:
                 setattr(self, key, sqlite3_row[key])
+        if 'containment_level' in sqlite3_row.keys() and sqlite3_row['containment_level'] is not None:
+            self.containment_level = sqlite3_row['containment_level']
+        else:
+            # Databases imported by older versions of EpiTator
+            # do not have containment levels.
+            self.containment_level = feature_code_level(self.feature_code)
         self.lat_long = (self.latitude, self.longitude,)
         self.alternate_locations = set()
         self.overlapping_locations = set()
@@ -158,6 +234,23 @@ class GeonameRow(object):
         self.parents = set()
         self.score = None
 
+    @property
+    def admin_codes(self):
+        return tuple(getattr(self, prop) for prop in CONTAINMENT_LEVELS)
+
+    @property
+    def containment_key(self):
+        """
+        The admin codes a geoname must have to be contained by this one,
+        or None if it does not contain other geonames.
+        """
+        if self.containment_level == 0:
+            return None
+        containment_key = self.admin_codes[:self.containment_level]
+        if '' in containment_key:
+            return None
+        return containment_key
+
     def add_spans(self, span_text_to_spans):
         for name in set(self.lemmas_used.split(';')):
             for span in span_text_to_spans[name]:
@@ -221,19 +314,28 @@ class GeonameFeatures(object):
         'containing_locations',
     ]
 
-    def __init__(self, geoname, spans_to_nes, span_to_tokens):
+    feature_indices = {name: idx for idx, name in enumerate(feature_names)}
+
+    def __init__(self, geoname, spans_to_nes, span_to_tokens, matrix=None, row=0):
+        """
+        The feature values are stored in the given row of the matrix.
+        Features that only depend on the geoname are expected to have been set
+        in the matrix with set_geoname_features. If no matrix is given a new
+        one is created for the geoname.
+        """
         self.geoname = geoname
         # The set of geonames that are mentioned in proximity to the spans
         # corresponding to this feature.
         # This will be populated by the add_contextual_features function.
         self.nearby_mentions = set()
+        if matrix is None:
+            matrix = np.zeros((1, len(self.feature_names)), dtype=np.float64)
+            set_geoname_features(matrix, [geoname])
+        self.matrix = matrix
+        self.row = row
+        self._values = matrix[row]
         d = {}
-        d['log_population'] = math.log(geoname.population + 1)
-        # Geonames with lots of alternate names
-        # tend to be the ones most commonly referred to.
-        d['name_count'] = math.log(geoname.name_count)
         names_used = geoname.names_used.split(';')
-        d['names_used'] = math.log(len(names_used))
         for name in names_used:
             for span in geoname.spans:
                 if span.text == name:
@@ -286,32 +388,17 @@ class GeonameFeatures(object):
             noun_portions.append(float(noun_pos_tags) / pos_tags)
             other_pos_portions.append(float(other_pos_tags) / pos_tags)
             token_lens.append(pos_tags)
-        d['combined_span'] = 1 if len(geoname.parents) > 0 else 0
         d['noun_portion'] = median(noun_portions)
         d['num_tokens'] = median(token_lens)
         d['med_token_prob'] = median(token_probs)
-        d['exact_alternatives'] = math.log(len(geoname.alternate_locations) + 1)
-        feature_code = geoname.feature_code
-        if feature_code.startswith('PPL'):
-            d['PPL_feature_code'] = 1
-        elif feature_code.startswith('ADM'):
-            d['ADM_feature_code'] = 1
-        elif feature_code.startswith('PCL'):
-            d['PCL_feature_code'] = 1
-        else:
-            d['other_feature_code'] = 1
-        if '1' in feature_code or feature_code == 'PPLA':
-            d['first_order'] = 1
-        self._values = [0] * len(self.feature_names)
         self.set_values(d)
 
     def set_value(self, feature_name, value):
-        self._values[self.feature_names.index(feature_name)] = value
+        self._values[self.feature_indices[feature_name]] = value
 
     def set_values(self, value_dict):
-        for idx, name in enumerate(self.feature_names):
-            if name in value_dict:
-                self._values[idx] = value_dict[name]
+        for name, value in value_dict.items():
+            self._values[self.feature_indices[name]] = value
 
     def set_contextual_features(self):
         """
@@ -319,56 +406,346 @@ class GeonameFeatures(object):
         from the geoname database and span. This extends the GeonameFeature
         with values that require information from nearby_mentions.
         """
-        geoname = self.geoname
-        close_locations = 0
-        very_close_locations = 0
-        containing_locations = 0
-        contained_locations = 0
-        for recently_mentioned_geoname in self.nearby_mentions:
-            if recently_mentioned_geoname == geoname:
-                continue
-            if location_contains(recently_mentioned_geoname, geoname) > 0:
-                containing_locations += 1
-            if location_contains(geoname, recently_mentioned_geoname) > 0:
-                contained_locations += 1
-            distance = great_circle(
-                recently_mentioned_geoname.lat_long, geoname.lat_long
-            ).kilometers
-            if distance < 400:
-                close_locations += 1
-            if distance < 100:
-                very_close_locations += 1
-        greatest_overlapping_score = 0.0
-        for location in geoname.overlapping_locations:
-            if location.base_score > greatest_overlapping_score:
-                greatest_overlapping_score = location.base_score
-        self.set_values(dict(
-            close_locations=close_locations,
-            very_close_locations=very_close_locations,
-            base_score=geoname.base_score,
-            base_score_margin=geoname.base_score - greatest_overlapping_score,
-            containing_locations=containing_locations,
-            contained_locations=contained_locations,
-        ))
+        set_contextual_features([self])
 
     def to_dict(self):
         return {
             key: value
-            for key, value in zip(self.feature_names, self._values)}
+            for key, value in zip(self.feature_names, self._values.tolist())}
 
     def values(self):
         return self._values
 
 
+def set_geoname_features(matrix, geonames):
+    """
+    Set the feature values that only depend on the geonames' database fields
+    and the locations they overlap with in the rows of the feature matrix.
+    """
+    columns = GeonameFeatures.feature_indices
+    populations = np.array([geoname.population for geoname in geonames], dtype=np.float64)
+    matrix[:, columns['log_population']] = np.log(populations + 1)
+    # Geonames with lots of alternate names
+    # tend to be the ones most commonly referred to.
+    matrix[:, columns['name_count']] = np.log(np.array(
+        [geoname.name_count for geoname in geonames], dtype=np.float64))
+    matrix[:, columns['names_used']] = np.log(np.array(
+        [geoname.names_used.count(';') + 1 for geoname in geonames], dtype=np.float64))
+    matrix[:, columns['exact_alternatives']] = np.log(np.array(
+        [len(geoname.alternate_locations) + 1 for geoname in geonames], dtype=np.float64))
+    matrix[:, columns['combined_span']] = [
+        len(geoname.parents) > 0 for geoname in geonames]
+    feature_codes = np.array([geoname.feature_code for geoname in geonames], dtype=object).astype(six.text_type)
+    ppl = np.char.startswith(feature_codes, 'PPL')
+    adm = ~ppl & np.char.startswith(feature_codes, 'ADM')
+    pcl = ~ppl & ~adm & np.char.startswith(feature_codes, 'PCL')
+    matrix[:, columns['PPL_feature_code']] = ppl
+    matrix[:, columns['ADM_feature_code']] = adm
+    matrix[:, columns['PCL_feature_code']] = pcl
+    matrix[:, columns['other_feature_code']] = ~(ppl | adm | pcl)
+    matrix[:, columns['first_order']] = (
+        (np.char.find(feature_codes, '1') >= 0) | (feature_codes == 'PPLA'))
+
+
+def shared_feature_matrix(features):
+    """
+    Return the matrix the values of the features are the rows of,
+    or None if they are not stored in the rows of a single matrix.
+    """
+    if len(features) == 0:
+        return None
+    matrix = features[0].matrix
+    if len(matrix) != len(features):
+        return None
+    for idx, feature in enumerate(features):
+        if feature.matrix is not matrix or feature.row != idx:
+            return None
+    return matrix
+
+
+def feature_matrix(features):
+    """
+    Return a matrix with a row of values for each feature.
+    """
+    matrix = shared_feature_matrix(features)
+    if matrix is None:
+        matrix = np.array([feature.values() for feature in features], dtype=np.float64)
+        matrix = matrix.reshape(len(features), len(GeonameFeatures.feature_names))
+    return matrix
+
+
+def set_contextual_features(features):
+    """
+    Set the values of the contextual features of a list of GeonameFeatures.
+    The distances and containment relationships between the geonames
+    and their nearby mentions are computed for all the features at once.
+    """
+    geoname_indices = {}
+    geonames = []
+
+    def geoname_index(geoname):
+        if geoname not in geoname_indices:
+            geoname_indices[geoname] = len(geonames)
+            geonames.append(geoname)
+        return geoname_indices[geoname]
+    feature_indices = []
+    mention_indices = []
+    feature_geoname_indices = []
+    for feature_idx, feature in enumerate(features):
+        geoname_idx = geoname_index(feature.geoname)
+        for recently_mentioned_geoname in feature.nearby_mentions:
+            if recently_mentioned_geoname == feature.geoname:
+                continue
+            feature_indices.append(feature_idx)
+            mention_indices.append(geoname_index(recently_mentioned_geoname))
+            feature_geoname_indices.append(geoname_idx)
+    feature_indices = np.array(feature_indices, dtype=np.int64)
+    mention_indices = np.array(mention_indices, dtype=np.int64)
+    feature_geoname_indices = np.array(feature_geoname_indices, dtype=np.int64)
+    lat_longs = np.array([geoname.lat_long for geoname in geonames], dtype=np.float64)
+    distances = great_circle_distances(
+        lat_longs[mention_indices], lat_longs[feature_geoname_indices])
+    containment_codes = ContainmentCodes(geonames)
+
+    def count_by_feature(pair_values):
+        return np.bincount(feature_indices[pair_values], minlength=len(features))
+    close_locations = count_by_feature(distances < 400)
+    very_close_locations = count_by_feature(distances < 100)
+    containing_locations = count_by_feature(
+        containment_codes.contains(mention_indices, feature_geoname_indices))
+    contained_locations = count_by_feature(
+        containment_codes.contains(feature_geoname_indices, mention_indices))
+    base_scores = np.array([feature.geoname.base_score for feature in features], dtype=np.float64)
+    greatest_overlapping_scores = np.zeros(len(features), dtype=np.float64)
+    for feature_idx, feature in enumerate(features):
+        for location in feature.geoname.overlapping_locations:
+            if location.base_score > greatest_overlapping_scores[feature_idx]:
+                greatest_overlapping_scores[feature_idx] = location.base_score
+    columns = dict(
+        close_locations=close_locations,
+        very_close_locations=very_close_locations,
+        base_score=base_scores,
+        base_score_margin=base_scores - greatest_overlapping_scores,
+        containing_locations=containing_locations,
+        contained_locations=contained_locations)
+    matrix = shared_feature_matrix(features)
+    if matrix is not None:
+        for name, values in columns.items():
+            matrix[:, GeonameFeatures.feature_indices[name]] = values
+    else:
+        for feature_idx, feature in enumerate(features):
+            feature.set_values({
+                name: values[feature_idx] for name, values in columns.items()})
+
+
+# The number of values bound to each IN (...) lookup. This is kept below
+# SQLite's default limit of 999 bound parameters per statement.
+QUERY_BATCH_SIZE = 500
+
+GEONAME_LOOKUP_QUERY = """
+SELECT * FROM geoname_lookup
+WHERE alternatename_lemmatized IN (""" + ','.join(['?'] * QUERY_BATCH_SIZE) + ")"
+
+
+# The number of geonames whose admin codes are bound to each admin name
+# lookup. Each geoname uses four parameters.
+ADMIN_NAMES_BATCH_SIZE = 200
+
+ADMIN_NAMES_QUERY = """
+WITH codes (country_code, admin1_code, admin2_code, admin3_code) AS (
+    VALUES """ + ','.join(['(?,?,?,?)'] * ADMIN_NAMES_BATCH_SIZE) + """
+)
+SELECT
+    codes.country_code,
+    codes.admin1_code,
+    codes.admin2_code,
+    codes.admin3_code,
+    cc.name,
+    a1.name,
+    a2.name,
+    a3.name
+FROM codes
+JOIN adminnames a3 ON (
+    a3.country_code = codes.country_code AND
+    a3.admin1_code = codes.admin1_code AND
+    a3.admin2_code = codes.admin2_code AND
+    a3.admin3_code = codes.admin3_code )
+JOIN adminnames a2 ON (
+    a2.country_code = a3.country_code AND
+    a2.admin1_code = a3.admin1_code AND
+    a2.admin2_code = a3.admin2_code AND
+    a2.admin3_code = "" )
+JOIN adminnames a1 ON (
+    a1.country_code = a3.country_code AND
+    a1.admin1_code = a3.admin1_code AND
+    a1.admin2_code = "" AND
+    a1.admin3_code = "" )
+JOIN adminnames cc ON (
+    cc.country_code = a3.country_code AND
+    cc.admin1_code = "00" AND
+    cc.admin2_code = "" AND
+    cc.admin3_code = "" )
+"""
+
+# The country, admin1, admin2 and admin3 names for admin code tuples,
+# shared by all the GeonameAnnotators in the process.
+# None is stored for codes that do not have names.
+admin_names_cache = LRUCache(10000)
+# Distinguishes codes missing from the cache from codes cached as None.
+uncached = object()
+
+
+HOT_GEONAME_NAMES_QUERY = """
+SELECT DISTINCT alternatename_lemmatized
+FROM alternatenames
+WHERE geonameid IN (
+    SELECT geonameid
+    FROM geonames
+    JOIN alternatename_counts USING ( geonameid )
+    ORDER BY population DESC, count DESC
+    LIMIT ?
+)"""
+
+
+class HotGeonameCache(object):
+    """
+    An in-memory copy of the geoname_lookup rows for the lemmatized names of
+    the geonames with the largest populations and most alternate names.
+    All the rows for each of those names are loaded, including the rows
+    for other geonames with the same name, so names in the cache never need
+    to be looked up in the database.
+
+    Args:
+        connection_manager: The ConnectionManager used to load the rows.
+        size (int): The number of geonames whose names are loaded.
+    """
+    def __init__(self, connection_manager, size):
+        self.size = size
+        self.rows_by_name = {}
+        names = [row[0] for row in connection_manager.execute(HOT_GEONAME_NAMES_QUERY, (size,))]
+        for batch in padded_batches(names, QUERY_BATCH_SIZE):
+            for row in connection_manager.execute(GEONAME_LOOKUP_QUERY, batch):
+                row = {key: row[key] for key in row.keys()}
+                self.rows_by_name.setdefault(row['alternatename_lemmatized'], []).append(row)
+        # Names that only appear in rows without name counts
+        # have no rows in the lookup table.
+        for name in names:
+            self.rows_by_name.setdefault(name, [])
+
+    def lookup(self, lemmatized_names):
+        """
+        Return the cached rows for the given names,
+        and a list of the names that are not in the cache.
+        """
+        rows = []
+        uncached_names = []
+        for name in lemmatized_names:
+            if name in self.rows_by_name:
+                rows.extend(self.rows_by_name[name])
+            else:
+                uncached_names.append(name)
+        return rows, uncached_names
+
+    def __len__(self):
+        return len(self.rows_by_name)
+
+
 class GeonameAnnotator(Annotator):
-    def __init__(self, custom_classifier=None):
-        self.connection = get_database_connection()
-        self.connection.row_factory = sqlite3.Row
+    """
+    Args:
+        custom_classifier: A module or object with the same functions and
+            thresholds as the geoname_classifier module.
+        connection_manager: The ConnectionManager used to query the database.
+        hot_cache_size (int): If set, the names of this many of the most
+            populous geonames are loaded into a HotGeonameCache when the
+            annotator is created.
+    """
+    def __init__(self, custom_classifier=None, connection_manager=None, hot_cache_size=None):
+        self.connection_manager = connection_manager or get_connection_manager()
+        self.connection_manager.check_database()
+        self.hot_geoname_cache = None
+        if hot_cache_size:
+            self.hot_geoname_cache = HotGeonameCache(self.connection_manager, hot_cache_size)
         if custom_classifier:
             self.geoname_classifier = custom_classifier
         else:
             self.geoname_classifier = geoname_classifier
 
+    def cache_parameters(self):
+        """
+        Return the parameters that affect the tiers the annotator creates.
+        The hot geoname cache does not change them. Tiers created with a
+        custom classifier are not cached because it cannot be identified
+        by its type.
+        """
+        return {
+            'db_path': self.connection_manager.db_path,
+            'geoname_classifier': self.geoname_classifier}
+
+    @property
+    def connection(self):
+        return self.connection_manager.connection()
+
+    def geonames_matching(self, lemmatized_names):
+        """
+        Return rows with the fields of the geonames table, name_count,
+        and the alternate names (names_used) and lemmatized alternate names
+        (lemmas_used) of each geoname that match the given lemmatized names,
+        ordered by geonameid.
+        Names in the hot geoname cache are looked up there. The others are
+        looked up in fixed size batches of bound parameters so the same
+        prepared statement is used for every document.
+        """
+        rows = []
+        uncached_names = lemmatized_names
+        if self.hot_geoname_cache:
+            cached_rows, uncached_names = self.hot_geoname_cache.lookup(lemmatized_names)
+            rows.extend(cached_rows)
+        for batch in padded_batches(uncached_names, QUERY_BATCH_SIZE):
+            rows.extend(self.connection_manager.execute(GEONAME_LOOKUP_QUERY, batch))
+        # The rows are sorted so the names are combined in the same order
+        # however they were looked up.
+        rows.sort(key=lambda row: (row['alternatename_lemmatized'], row['geonameid']))
+        geonames_by_id = {}
+        for row in rows:
+            geonameid = row['geonameid']
+            if geonameid in geonames_by_id:
+                geoname = geonames_by_id[geonameid]
+                geoname['names_used'] += ';' + row['names_used']
+                geoname['lemmas_used'] += ';' + row['lemmas_used']
+            else:
+                geoname = {key: row[key] for key in row.keys()}
+                del geoname['alternatename_lemmatized']
+                geonames_by_id[geonameid] = geoname
+        return [geonames_by_id[geonameid] for geonameid in sorted(geonames_by_id.keys())]
+
+    def get_admin_names(self, admin_codes):
+        """
+        Return a dict of (country_code, admin1_code, admin2_code, admin3_code)
+        tuples to tuples of the country, admin1, admin2 and admin3 names
+        for the given code tuples, or None if the codes do not have names.
+        Names that are not in the admin names cache are looked up in batches.
+        """
+        result = {}
+        uncached_codes = []
+        for codes in set(admin_codes):
+            # Other threads may evict the codes between a membership test
+            # and a lookup, so they are looked up once.
+            names = admin_names_cache.get(codes, uncached)
+            if names is uncached:
+                uncached_codes.append(codes)
+            else:
+                result[codes] = names
+        for codes in uncached_codes:
+            result[codes] = None
+        for batch in padded_batches(uncached_codes, ADMIN_NAMES_BATCH_SIZE, (None,) * 4):
+            for row in self.connection_manager.execute(
+                    ADMIN_NAMES_QUERY, [code for codes in batch for code in codes]):
+                result[tuple(row[:4])] = tuple(row[4:])
+        for codes in uncached_codes:
+            admin_names_cache[codes] = result[codes]
+        return result
+
     def get_candidate_geonames(self, doc):
         """
         Returns an array of geoname dicts correponding to locations that the
@@ -434,20 +811,8 @@ class GeonameAnnotator(Annotator):
             if lower_case_direction.match(span_text):
                 span_text_to_spans[re.sub(r"(north|south|east|west)\s(.+)", r"\1ern \2", span_text)].extend(spans)
         possible_geonames = list(span_text_to_spans.keys())
-        possible_geonames_escaped = [x.replace("'", "''") if "'" in x else x for x in possible_geonames]
         logger.info('%s possible geoname texts' % len(possible_geonames))
-        cursor = self.connection.cursor()
-        geoname_results = list(cursor.execute('''
-        SELECT
-            geonames.*,
-            count AS name_count,
-            group_concat(alternatename, ";") AS names_used,
-            group_concat(alternatename_lemmatized, ";") AS lemmas_used
-        FROM geonames
-        JOIN alternatename_counts USING ( geonameid )
-        JOIN alternatenames USING ( geonameid )
-        WHERE alternatename_lemmatized IN (''' + ','.join("'{0}'".format(x) for x in possible_geonames_escaped) + ''')
-        GROUP BY geonameid'''))
+        geoname_results = self.geonames_matching(possible_geonames)
         logger.info('%s geonames fetched' % len(geoname_results))
         geoname_results = [GeonameRow(g) for g in geoname_results]
         candidate_geonames = []
@@ -468,19 +833,19 @@ class GeonameAnnotator(Annotator):
                 span_to_geonames[span].append(geoname)
         geoname_spans = span_to_geonames.keys()
         combined_spans = AnnoTier(geoname_spans).chains(at_least=2, at_most=4, max_dist=4).label_spans('combined_span')
+        span_to_containment_index = {}
         for combined_span in combined_spans:
             leaf_spans = combined_span.iterate_leaf_base_spans()
             first_spans = next(leaf_spans)
             potential_geonames = {geoname: set()
                                   for geoname in span_to_geonames[first_spans]}
             for leaf_span in leaf_spans:
-                leaf_span_geonames = span_to_geonames[leaf_span]
+                if leaf_span not in span_to_containment_index:
+                    span_to_containment_index[leaf_span] = ContainmentIndex(span_to_geonames[leaf_span])
+                containment_index = span_to_containment_index[leaf_span]
                 next_potential_geonames = defaultdict(set)
                 for potential_geoname, prev_containing_geonames in potential_geonames.items():
-                    containing_geonames = [
-                        containing_geoname
-                        for containing_geoname in leaf_span_geonames
-                        if location_contains(containing_geoname, potential_geoname) > 0]
+                    containing_geonames = containment_index.geonames_containing(potential_geoname)
                     if len(containing_geonames) > 0:
                         next_potential_geonames[potential_geoname] |= prev_containing_geonames | set(containing_geonames)
                 potential_geonames = next_potential_geonames
@@ -502,7 +867,7 @@ class GeonameAnnotator(Annotator):
             geoname_set = set(geonames)
             for geoname in geonames:
                 geoname.alternate_locations |= geoname_set
-        possible_geoname_tier = AnnoTier([
+        possible_geoname_tier = ArrayAnnoTier([
             AnnoSpan(span.start, span.end, span.doc, metadata=set(geonames))
             for span, geonames in span_to_geonames.items()])
         grouped_possible_geonames = possible_geoname_tier.group_spans_by_containing_span(
@@ -525,7 +890,7 @@ class GeonameAnnotator(Annotator):
     def extract_features(self, geonames, doc):
         spans_to_nes = {}
         span_to_tokens = {}
-        geospan_tier = AnnoTier(
+        geospan_tier = ArrayAnnoTier(
             set([span for geoname in geonames for span in geoname.spans]))
         for span, ne_spans in geospan_tier.group_spans_by_containing_span(
                 doc.tiers['nes'], allow_partial_containment=True):
@@ -533,15 +898,17 @@ class GeonameAnnotator(Annotator):
         for span, token_spans in geospan_tier.group_spans_by_containing_span(
                 doc.tiers['spacy.tokens']):
             span_to_tokens[span] = token_spans
-        return [GeonameFeatures(geoname, spans_to_nes, span_to_tokens)
-                for geoname in geonames]
+        matrix = np.zeros((len(geonames), len(GeonameFeatures.feature_names)), dtype=np.float64)
+        set_geoname_features(matrix, geonames)
+        return [GeonameFeatures(geoname, spans_to_nes, span_to_tokens, matrix, row)
+                for row, geoname in enumerate(geonames)]
 
     def add_contextual_features(self, candidate_geonames, features, base_classifier_predict, base_classifier_threshold):
         """
         Extend a list of features with values that are based on the geonames
         mentioned nearby.
         """
-        scores = base_classifier_predict([list(f.values()) for f in features])
+        scores = base_classifier_predict(feature_matrix(features))
         for geoname, feature, score in zip(candidate_geonames, features, scores):
             geoname.base_score = score[1]
             geoname.high_confidence = float(
@@ -604,8 +971,7 @@ class GeonameAnnotator(Annotator):
                 rf_buffer_idx += 1
             except StopIteration:
                 rfs_iter_end = True
-        for feature in features:
-            feature.set_contextual_features()
+        set_contextual_features(features)
 
     def annotate(self, doc, show_features_for_geonameids=None, split_compound_geonames=False):
         logger.info('geoannotator started')
@@ -619,8 +985,8 @@ class GeonameAnnotator(Annotator):
             candidate_geonames, features,
             self.geoname_classifier.predict_proba_base,
             self.geoname_classifier.HIGH_CONFIDENCE_THRESHOLD)
-        scores = self.geoname_classifier.predict_proba_contextual([
-            list(f.values()) for f in features])
+        scores = self.geoname_classifier.predict_proba_contextual(
+            feature_matrix(features))
         for geoname, score in zip(candidate_geonames, scores):
             geoname.score = float(score[1])
         if show_features_for_geonameids:
@@ -632,46 +998,23 @@ class GeonameAnnotator(Annotator):
         culled_geonames = [geoname
                            for geoname in candidate_geonames
                            if geoname.score > self.geoname_classifier.GEONAME_SCORE_THRESHOLD]
-        cursor = self.connection.cursor()
-        for geoname in culled_geonames:
-            geoname_results = list(cursor.execute('''
-                SELECT
-                    cc.name,
-                    a1.name,
-                    a2.name,
-                    a3.name
-                FROM adminnames a3
-                JOIN adminnames a2 ON (
-                    a2.country_code = a3.country_code AND
-                    a2.admin1_code = a3.admin1_code AND
-                    a2.admin2_code = a3.admin2_code AND
-                    a2.admin3_code = "" )
-                JOIN adminnames a1 ON (
-                    a1.country_code = a3.country_code AND
-                    a1.admin1_code = a3.admin1_code AND
-                    a1.admin2_code = "" AND
-                    a1.admin3_code = "" )
-                JOIN adminnames cc ON (
-                    cc.country_code = a3.country_code AND
-                    cc.admin1_code = "00" AND
-                    cc.admin2_code = "" AND
-                    cc.admin3_code = "" )
-                WHERE (a3.country_code = ? AND a3.admin1_code = ? AND a3.admin2_code = ? AND a3.admin3_code = ?)
-                ''', (
-                geoname.country_code or "",
-                geoname.admin1_code or "",
-                geoname.admin2_code or "",
-                geoname.admin3_code or "",)))
-            for result in geoname_results:
-                prev_val = None
-                for idx, attr in enumerate(['country_name', 'admin1_name', 'admin2_name', 'admin3_name']):
-                    val = result[idx]
-                    if val == prev_val:
-                        # Names are repeated for admin levels beyond that of
-                        # the geoname.
-                        break
-                    setattr(geoname, attr, val)
-                    prev_val = val
+        admin_codes = [(
+            geoname.country_code or "",
+            geoname.admin1_code or "",
+            geoname.admin2_code or "",
+            geoname.admin3_code or "",) for geoname in culled_geonames]
+        admin_names = self.get_admin_names(admin_codes)
+        for geoname, codes in zip(culled_geonames, admin_codes):
+            if admin_names[codes] is None:
+                continue
+            prev_val = None
+            for attr, val in zip(ADMINNAME_ATTRS, admin_names[codes]):
+                if val == prev_val:
+                    # Names are repeated for admin levels beyond that of
+                    # the geoname.
+                    break
+                setattr(geoname, attr, val)
+                prev_val = val
         logger.info('admin names added')
         geospans = []
         for geoname in culled_geonames:
@@ -10,12 +10,160 @@ else:
     ANNOTATOR_DB_PATH = os.path.expanduser("~") + '/.epitator.sqlitedb'
 
 
-def get_database_connection(create_database=False):
-    databse_exists = os.path.exists(ANNOTATOR_DB_PATH)
+DB_VERSION = '0.0.5'
+
+# The containment level of a geoname determines which of its admin codes
+# a geoname it contains must share. It is 1 for countries, 2-5 for
+# first to fourth order administrative divisions and 0 for geonames that
+# do not contain other geonames.
+CONTAINMENT_LEVEL_SQL = """
+CASE
+    WHEN feature_code = 'ADM1' THEN 2
+    WHEN feature_code = 'ADM2' THEN 3
+    WHEN feature_code = 'ADM3' THEN 4
+    WHEN feature_code = 'ADM4' THEN 5
+    WHEN feature_code GLOB 'PCL?*' THEN 1
+    ELSE 0
+END"""
+
+
+def create_geoname_lookup_table(cur):
+    """
+    Create the geoname_lookup table from the geonames, alternatenames and
+    alternatename_counts tables. It has a row for each lemmatized alternate
+    name and geoname it refers to with the geoname's fields, its name count,
+    and the alternate names that lemmatize to the name, so the geonames
+    matching a name can be fetched with an index lookup.
+    """
+    geoname_columns = [
+        (column[1], column[2])
+        for column in cur.execute("PRAGMA table_info(geonames)")
+        if column[1] != 'geonameid']
+    cur.execute("""
+    CREATE TABLE geoname_lookup (
+        alternatename_lemmatized TEXT,
+        geonameid TEXT,
+        """ + "".join('"' + name + '" ' + sqltype + ",\n" for name, sqltype in geoname_columns) + """
+        name_count INTEGER,
+        names_used TEXT,
+        lemmas_used TEXT,
+        PRIMARY KEY (alternatename_lemmatized, geonameid)
+    ) WITHOUT ROWID""")
+    cur.execute("""
+    INSERT INTO geoname_lookup
+    SELECT
+        alternatename_lemmatized,
+        geonameid,
+        """ + "".join('geonames."' + name + '",\n' for name, sqltype in geoname_columns) + """
+        count,
+        group_concat(alternatename, ";"),
+        group_concat(alternatename_lemmatized, ";")
+    FROM alternatenames
+    JOIN geonames USING ( geonameid )
+    JOIN alternatename_counts USING ( geonameid )
+    GROUP BY alternatename_lemmatized, geonameid
+    """)
+
+
+def create_geoname_locations_table(cur):
+    """
+    Create the geoname_locations R*Tree index of the geonames' coordinates.
+    Its ids are the geonames' ids as integers.
+    If SQLite was compiled without the R*Tree module the table is not created
+    and spatial queries are unavailable.
+    """
+    try:
+        cur.execute("""
+        CREATE VIRTUAL TABLE geoname_locations USING rtree (
+            id, min_latitude, max_latitude, min_longitude, max_longitude
+        )""")
+    except sqlite3.OperationalError:
+        print("The geoname_locations table could not be created "
+              "because SQLite's R*Tree module is unavailable.")
+        return
+    cur.execute("""
+    INSERT INTO geoname_locations
+    SELECT CAST(geonameid AS INTEGER), latitude, latitude, longitude, longitude
+    FROM geonames
+    """)
+
+
+def add_containment_levels(cur, table_name):
+    """
+    Add a containment_level column to a table of geonames.
+    """
+    columns = [column[1] for column in cur.execute("PRAGMA table_info(" + table_name + ")")]
+    if 'containment_level' not in columns:
+        cur.execute("ALTER TABLE " + table_name + " ADD COLUMN containment_level INTEGER")
+    cur.execute("UPDATE " + table_name + " SET containment_level = " + CONTAINMENT_LEVEL_SQL)
+
+
+def create_alternatename_geonameid_index(cur):
+    """
+    Index the alternatenames table by geonameid, so the names of
+    the geonames loaded into the HotGeonameCache can be looked up
+    without scanning it.
+    """
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS alternatename_geonameid_index
+    ON alternatenames (geonameid)
+    """)
+
+
+def table_exists(cur, table_name):
+    return next(cur.execute("""
+    SELECT name FROM sqlite_master WHERE type='table' AND name=?
+    """, (table_name,)), None) is not None
+
+
+def migrate_to_0_0_2(cur):
+    if table_exists(cur, 'alternatename_counts') and not table_exists(cur, 'geoname_lookup'):
+        print("Creating the geoname_lookup table. This may take a few minutes...")
+        create_geoname_lookup_table(cur)
+
+
+def migrate_to_0_0_3(cur):
+    for table_name in ['geonames', 'geoname_lookup']:
+        if table_exists(cur, table_name):
+            print("Adding containment levels to the " + table_name + " table...")
+            add_containment_levels(cur, table_name)
+
+
+def migrate_to_0_0_4(cur):
+    if table_exists(cur, 'geonames') and not table_exists(cur, 'geoname_locations'):
+        print("Creating the geoname_locations spatial index...")
+        create_geoname_locations_table(cur)
+
+
+def migrate_to_0_0_5(cur):
+    if table_exists(cur, 'alternatenames'):
+        print("Indexing alternate names by geonameid...")
+        create_alternatename_geonameid_index(cur)
+
+
+# Functions that update databases created by previous versions of EpiTator,
+# and the version each updates the database to.
+MIGRATIONS = [
+    ('0.0.1', '0.0.2', migrate_to_0_0_2),
+    ('0.0.2', '0.0.3', migrate_to_0_0_3),
+    ('0.0.3', '0.0.4', migrate_to_0_0_4),
+    ('0.0.4', '0.0.5', migrate_to_0_0_5),
+]
+
+
+def get_database_connection(create_database=False, db_path=None):
+    """
+    Return a connection to the EpiTator database at db_path,
+    or ANNOTATOR_DB_PATH if it is not given, updating the database
+    if it was created by an earlier version of EpiTator.
+    """
+    if db_path is None:
+        db_path = ANNOTATOR_DB_PATH
+    databse_exists = os.path.exists(db_path)
     if databse_exists or create_database:
         if not databse_exists:
-            print("Creating database at:", ANNOTATOR_DB_PATH)
-        connection = sqlite3.connect(ANNOTATOR_DB_PATH)
+            print("Creating database at:", db_path)
+        connection = sqlite3.connect(db_path)
         cur = connection.cursor()
         cur.execute("PRAGMA foreign_keys = ON")
         cur.execute("""
@@ -37,17 +185,32 @@ def get_database_connection(create_database=False):
             cur.execute('''
             CREATE INDEX synonym_index ON synonyms (synonym);
             ''')
-            cur.execute("INSERT INTO metadata VALUES ('dbversion', '0.0.1')")
+            cur.execute("INSERT INTO metadata VALUES ('dbversion', ?)", (DB_VERSION,))
             connection.commit()
         db_version = next(cur.execute("""
         SELECT value AS version FROM metadata WHERE property = 'dbversion'
         """), None)
-        if not db_version or db_version[0] != "0.0.1":
-            raise Exception("The database at " + ANNOTATOR_DB_PATH +
+        for from_version, to_version, migrate in MIGRATIONS:
+            if db_version and db_version[0] == from_version:
+                # Each migration runs in a transaction so a failed migration
+                # does not leave the database partially updated.
+                cur.execute("BEGIN")
+                try:
+                    migrate(cur)
+                    cur.execute("""
+                    UPDATE metadata SET value = ? WHERE property = 'dbversion'
+                    """, (to_version,))
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+                db_version = (to_version,)
+        if not db_version or db_version[0] != DB_VERSION:
+            raise Exception("The database at " + db_path +
                             " has a version that is not compatible by this version of EpiTator.\n"
                             "You will need to rerun the data import scripts.")
         return connection
     else:
-        raise Exception("There is no EpiTator database at: " + ANNOTATOR_DB_PATH +
+        raise Exception("There is no EpiTator database at: " + db_path +
                         "\nRun `python -m epitator.importers.import_all` to create a new database"
                         "\nor set ANNOTATOR_DB_PATH to use a database at a different location.")
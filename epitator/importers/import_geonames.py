@@ -9,7 +9,9 @@ from six import BytesIO
 from zipfile import ZipFile
 from six.moves.urllib import request
 from six.moves.urllib.error import URLError
-from ..get_database_connection import get_database_connection
+from ..get_database_connection import (
+    get_database_connection, create_geoname_lookup_table, add_containment_levels,
+    create_geoname_locations_table, create_alternatename_geonameid_index)
 from ..utils import parse_number, batched, normalize_text
 
 
@@ -80,7 +82,10 @@ def import_geonames(drop_previous=False):
         cur.execute("""DROP TABLE IF EXISTS 'alternatenames'""")
         cur.execute("""DROP TABLE IF EXISTS 'alternatename_counts'""")
         cur.execute("""DROP INDEX IF EXISTS 'alternatename_index'""")
+        cur.execute("""DROP INDEX IF EXISTS 'alternatename_geonameid_index'""")
         cur.execute("""DROP TABLE IF EXISTS 'adminnames'""")
+        cur.execute("""DROP TABLE IF EXISTS 'geoname_lookup'""")
+        cur.execute("""DROP TABLE IF EXISTS 'geoname_locations'""")
     table_exists = len(list(cur.execute("""SELECT name FROM sqlite_master
         WHERE type='table' AND name='geonames'"""))) > 0
     if table_exists:
@@ -134,11 +139,13 @@ def import_geonames(drop_previous=False):
         cur.executemany(geonames_insert_command, geoname_tuples)
         cur.executemany(alternatenames_insert_command, alternatename_tuples)
         cur.executemany(adminnames_insert_command, adminname_tuples)
+    add_containment_levels(cur, 'geonames')
     print("Creating indexes...")
     cur.execute('''
     CREATE INDEX alternatename_index
     ON alternatenames (alternatename_lemmatized);
     ''')
+    create_alternatename_geonameid_index(cur)
     connection.commit()
     cur.execute('''CREATE TABLE alternatename_counts
                  (geonameid text primary key, count integer)''')
@@ -149,6 +156,12 @@ def import_geonames(drop_previous=False):
     GROUP BY geonameid
     ''')
     connection.commit()
+    print("Creating geoname lookup table...")
+    create_geoname_lookup_table(cur)
+    connection.commit()
+    print("Creating spatial index...")
+    create_geoname_locations_table(cur)
+    connection.commit()
     connection.close()
 
 
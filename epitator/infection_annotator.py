@@ -22,6 +22,8 @@ InfectionAnnotator calls in the annotate() method.
 
 In general, these inner functions all return metadata dicts, and rely on
 epitator.utils.merge_dicts() to merge them before generating AnnoSpans.
+The tokens of each noun chunk, and the metadata generated from them, are
+found once by noun_chunk_tokens() and shared by the functions.
 """
 from itertools import groupby
 from operator import itemgetter
@@ -193,7 +195,50 @@ def has_single_count(metadata):
     return metadata.get("count") is not None and not isinstance(metadata["count"], list)
 
 
-def from_noun_chunks_with_infection_lemmas(doc, debug=False):
+class NounChunkTokens(object):
+    """
+    A noun chunk, the token spans it contains, and the attributes and counts
+    generated from them. The chunk's ancestors and their metadata are
+    generated the first time they are used.
+    """
+    def __init__(self, nc, tokens, doc):
+        self.nc = nc
+        self.tokens = tokens
+        self.doc = doc
+        self.metadata = merge_dicts([
+            generate_attributes(tokens),
+            generate_counts(tokens)
+        ], unique=True)
+        self.is_argument = any(dep in [t.dep_ for t in tokens] for dep in ["nsubj", "nsubjpass", "dobj"])
+        self._ancestors = None
+
+    def ancestors(self):
+        """
+        Return a list of the token spans of the ancestors of the chunk's root
+        and their metadata.
+        """
+        if self._ancestors is None:
+            ancestors = [TokenSpan(a, self.doc, self.nc.offset) for a in self.nc.span.root.ancestors]
+            ancestor_metadata = merge_dicts([
+                generate_attributes(ancestors),
+                generate_counts(ancestors)
+            ], unique=True)
+            self._ancestors = ancestors, ancestor_metadata
+        return self._ancestors
+
+
+def noun_chunk_tokens(doc):
+    """
+    Given an AnnoDoc, return a list of NounChunkTokens for its noun chunks.
+    The tokens are grouped by noun chunk in a single pass over both tiers.
+    """
+    nc_tier, tokens_tier = doc.require_tiers('spacy.noun_chunks', 'spacy.tokens', via=SpacyAnnotator)
+    return [
+        NounChunkTokens(nc, nc_tokens, doc)
+        for nc, nc_tokens in nc_tier.group_spans_by_containing_span(tokens_tier)]
+
+
+def from_noun_chunks_with_infection_lemmas(doc, debug=False, noun_chunks=None):
     """
     Given an AnnoDoc, return a list of AnnoSpans which contain spaCy noun
     chunks and infection lemmas. Counts are also extracted and included in the
@@ -202,31 +247,27 @@ def from_noun_chunks_with_infection_lemmas(doc, debug=False):
     debug -- Include a "debug_attributes" list in AnnoSpan metadata
     dictioanries, containing strings corresponding to certain parts of code in
     this and other functions, to facilitate debugging.
+
+    noun_chunks -- The NounChunkTokens for the document's noun chunks.
+    They are created if they are not given.
     """
-    nc_tier, tokens_tier = doc.require_tiers('spacy.noun_chunks', 'spacy.tokens', via=SpacyAnnotator)
+    if noun_chunks is None:
+        noun_chunks = noun_chunk_tokens(doc)
 
     infection_spans = []
 
-    for nc in nc_tier:
+    for chunk in noun_chunks:
         # First, we check for trigger attributes in the noun chunks.
         debug_attributes = []
-        nc_tokens = [t for t in tokens_tier.spans_contained_by_span(nc)]
-        out_tokens = nc_tokens
-        metadata = merge_dicts([
-            generate_attributes(out_tokens),
-            generate_counts(out_tokens)
-        ], unique=True)
+        out_tokens = list(chunk.tokens)
+        metadata = dict(chunk.metadata)
         if has_trigger_lemmas(metadata):
             debug_attributes.append("attributes from noun chunk")
 
             # If the noun chunk is the subject of the root verb, we check the
             # ancestors for metadata lemmas too.
-            if any(dep in [t.dep_ for t in nc_tokens] for dep in ["nsubj", "nsubjpass", "dobj"]):
-                ancestors = [TokenSpan(a, doc, nc.offset) for a in nc.span.root.ancestors]
-                ancestor_metadata = merge_dicts([
-                    generate_attributes(ancestors),
-                    generate_counts(ancestors)
-                ], unique=True)
+            if chunk.is_argument:
+                ancestors, ancestor_metadata = chunk.ancestors()
                 # TODO: Maybe this should include "or has_counts(ancestor_metadata)"
                 if has_trigger_lemmas(ancestor_metadata):
                     out_tokens.extend(ancestors)
@@ -245,7 +286,7 @@ def from_noun_chunks_with_infection_lemmas(doc, debug=False):
     return(infection_spans)
 
 
-def from_noun_chunks_with_person_lemmas(doc, debug=False):
+def from_noun_chunks_with_person_lemmas(doc, debug=False, noun_chunks=None):
     """
     Given an AnnoDoc, return a list of AnnoSpans which contain spaCy noun
     chunks and person lemmas. Counts are also extracted and included in the
@@ -256,29 +297,26 @@ def from_noun_chunks_with_person_lemmas(doc, debug=False):
     debug -- Include a "debug_attributes" list in AnnoSpan metadata
     dictioanries, containing strings corresponding to certain parts of code in
     this and other functions, to facilitate debugging.
+
+    noun_chunks -- The NounChunkTokens for the document's noun chunks.
+    They are created if they are not given.
     """
-    nc_tier, tokens_tier = doc.require_tiers('spacy.noun_chunks', 'spacy.tokens', via=SpacyAnnotator)
+    if noun_chunks is None:
+        noun_chunks = noun_chunk_tokens(doc)
 
     infection_spans = []
 
-    for nc in nc_tier:
+    for chunk in noun_chunks:
         debug_attributes = []
-        nc_tokens = [t for t in tokens_tier.spans_contained_by_span(nc)]
-        metadata = merge_dicts([
-            generate_attributes(nc_tokens),
-            generate_counts(nc_tokens)
-        ], unique=True)
+        nc = chunk.nc
+        metadata = dict(chunk.metadata)
         # If the noun chunk's metadata indicates that it refers to a person,
         # we check the disjoint subtree.
         if "person" in metadata["attributes"]:
-            out_tokens = nc_tokens
+            out_tokens = list(chunk.tokens)
             debug_attributes.append("attributes from noun chunk")
-            if any(dep in [t.dep_ for t in nc_tokens] for dep in ["nsubj", "nsubjpass", "dobj"]):
-                ancestors = [TokenSpan(a, doc, nc.offset) for a in nc.span.root.ancestors]
-                ancestor_metadata = merge_dicts([
-                    generate_attributes(ancestors),
-                    generate_counts(ancestors)
-                ], unique=True)
+            if chunk.is_argument:
+                ancestors, ancestor_metadata = chunk.ancestors()
                 # Maybe this should include "or has_counts(ancestor_metadata)"
                 if has_trigger_lemmas(ancestor_metadata):
                     out_tokens.extend(ancestors)
@@ -361,25 +399,25 @@ def add_count_modifiers(spans, doc):
 
     person_and_place_nes = spacy_nes.with_label('GPE') + spacy_nes.with_label('PERSON')
 
-    def modifiers_for_spans(spans, modifier_lemma_groups):
-        span_lemmas = [s.token.lemma_ for s in spans]
-
-        modifier_spans = []
-        modifier_attributes = []
-
-        for group in modifier_lemma_groups:
-            group_lemmas = group.split('|')
-            group_name = group_lemmas[0]
-
-            # If a lemma matches we add it to the candidate lemmas and metadata.
-            for candidate, lemma, in zip(spans, span_lemmas):
-                if lemma in group_lemmas:
-                    modifier_spans.append(candidate)
-                    modifier_attributes.append(group_name)
-
-        if len(modifier_spans) > 0:
-            modifiers = SpanGroup(base_spans=modifier_spans,
-                                  metadata={"attributes": modifier_attributes})
+    # The index and name of the group of each modifier lemma.
+    modifier_groups = {}
+    for group_idx, group in enumerate(modifier_lemma_groups):
+        group_lemmas = group.split('|')
+        for lemma in group_lemmas:
+            modifier_groups.setdefault(lemma, (group_idx, group_lemmas[0]))
+
+    def modifiers_for_spans(spans):
+        matches = []
+        for span_idx, span in enumerate(spans):
+            group = modifier_groups.get(span.token.lemma_)
+            if group is not None:
+                group_idx, group_name = group
+                matches.append((group_idx, span_idx, group_name, span))
+        if len(matches) > 0:
+            # The modifiers are ordered by group, then by position.
+            matches.sort(key=lambda match: match[:2])
+            modifiers = SpanGroup(base_spans=[match[3] for match in matches],
+                                  metadata={"attributes": [match[2] for match in matches]})
             return modifiers
         else:
             return None
@@ -391,7 +429,7 @@ def add_count_modifiers(spans, doc):
         # Prepare candidate modifier spans and lemmas
         base_spans = [t for t in spacy_tokens.spans_overlapped_by_span(base_span)]
         base_spans = AnnoTier(base_spans).without_overlaps(person_and_place_nes)
-        base_modifiers = modifiers_for_spans(base_spans, modifier_lemma_groups)
+        base_modifiers = modifiers_for_spans(base_spans)
         if base_modifiers is not None:
             candidates.append(SpanGroup([base_span, base_modifiers]))
 
@@ -401,7 +439,7 @@ def add_count_modifiers(spans, doc):
         ancestor_spans = AnnoTier(ancestor_spans).without_overlaps(person_and_place_nes)\
             .without_overlaps(base_spans)\
             .optimal_span_set()
-        ancestor_modifiers = modifiers_for_spans(ancestor_spans, modifier_lemma_groups)
+        ancestor_modifiers = modifiers_for_spans(ancestor_spans)
         if ancestor_modifiers is not None:
             candidates.append(SpanGroup([candidates[-1], ancestor_modifiers]))
 
@@ -415,9 +453,10 @@ def add_count_modifiers(spans, doc):
 class InfectionAnnotator(Annotator):
     def annotate(self, doc, debug=False):
         doc.require_tiers('spacy.tokens', 'spacy.nes', via=SpacyAnnotator)
+        noun_chunks = noun_chunk_tokens(doc)
         spans = []
-        spans.extend(from_noun_chunks_with_infection_lemmas(doc, debug))
-        spans.extend(from_noun_chunks_with_person_lemmas(doc, debug))
+        spans.extend(from_noun_chunks_with_infection_lemmas(doc, debug, noun_chunks))
+        spans.extend(from_noun_chunks_with_person_lemmas(doc, debug, noun_chunks))
         tier = add_count_modifiers(spans, doc)
         return {
             'infections': AnnoTier(
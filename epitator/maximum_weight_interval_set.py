@@ -4,50 +4,75 @@ class Interval():
         self.end = end
         self.weight = weight
         self.corresponding_object = corresponding_object
-        # The combined weight of the MWIS prior to this interval.
-        self.__value__ = None
-        # The previous inverval in the MWIS prior to this interval.
-        self.__previous__ = None
-
-    def start_endpoint(self):
-        return Endpoint(self, True)
-
-    def end_endpoint(self):
-        return Endpoint(self, False)
 
     def __len__(self):
         return self.end - self.start
 
 
-class Endpoint():
-    def __init__(self, interval, is_start):
-        self.interval = interval
-        self.is_start = is_start
+# The endpoints are sorted in the following order when offsets are the same:
+# [NI end points][ZI start points][NI start points][ZI end points]
+# NI = Non-zero length interval
+# ZI = Zero length interval
+NI_END = 0
+ZI_START = 1
+NI_START = 2
+ZI_END = 3
 
-    def get_idx(self):
-        if self.is_start:
-            return self.interval.start
-        else:
-            return self.interval.end
 
-    def __lt__(self, other):
-        # This sorts endpont in the following order when offsets are the same:
-        # [NI end points][ZI start points][NI start points][ZI end points]
-        # NI = Non-zero length interval
-        # ZI = Zero length interval
-        if self.get_idx() == other.get_idx():
-            if len(self.interval) == 0:
-                if len(other.interval) == 0:
-                    return self.is_start and not other.is_start
-                else:
-                    return self.is_start and other.is_start
-            else:
-                if len(other.interval) == 0:
-                    return not self.is_start or not other.is_start
-                else:
-                    return not self.is_start and other.is_start
+def add_weights(value, weight):
+    if isinstance(value, tuple):
+        return tuple(a + b for a, b in zip(value, weight))
+    else:
+        return weight + value
+
+
+def maximum_weight_interval_indices(starts, ends, weights):
+    """
+    Takes parallel lists of interval start offsets, end offsets and weights
+    and returns the indices of the intervals in a non-overlapping set of them
+    with the maximum possible weight, ordered by their position in the set.
+    See find_maximum_weight_interval_set for how overlaps are defined.
+
+    >>> maximum_weight_interval_indices([0, 2, 4], [3, 4, 6], [2, 1, 2])
+    [0, 2]
+    >>> maximum_weight_interval_indices([0, 2, 4], [3, 4, 6], [(2, 1), (3, 0), (2, 0)])
+    [1, 2]
+    """
+    endpoint_keys = []
+    for idx in range(len(starts)):
+        start = starts[idx]
+        end = ends[idx]
+        # The last element is the endpoint's position in the list,
+        # so ties are broken in the order the endpoints were added.
+        # Its low bit is set for end points.
+        if start == end:
+            endpoint_keys.append((start, ZI_START, 2 * idx))
+            endpoint_keys.append((end, ZI_END, 2 * idx + 1))
         else:
-            return self.get_idx() < other.get_idx()
+            endpoint_keys.append((start, NI_START, 2 * idx))
+            endpoint_keys.append((end, NI_END, 2 * idx + 1))
+    endpoint_keys.sort()
+    # The combined weight of the MWIS ending with each interval.
+    values = [None] * len(starts)
+    # The previous inverval in the MWIS ending with each interval.
+    previous = [-1] * len(starts)
+    max_idx_sofar = -1
+    for _, _, position in endpoint_keys:
+        idx = position >> 1
+        if position & 1 == 0:
+            if max_idx_sofar == -1:
+                values[idx] = weights[idx]
+            else:
+                values[idx] = add_weights(values[max_idx_sofar], weights[idx])
+                previous[idx] = max_idx_sofar
+        elif max_idx_sofar == -1 or values[idx] >= values[max_idx_sofar]:
+            max_idx_sofar = idx
+    result = []
+    while max_idx_sofar != -1:
+        result.append(max_idx_sofar)
+        max_idx_sofar = previous[max_idx_sofar]
+    result.reverse()
+    return result
 
 
 def find_maximum_weight_interval_set(intervals):
@@ -63,32 +88,14 @@ def find_maximum_weight_interval_set(intervals):
     the left endpoint of another interval without it being considered an overlap.
     Of course, if an endpoint is in the middle of another non-zero length
     interval, it is considered to be overlapping.
+
+    >>> intervals = [Interval(0, 3, 2, 'a'), Interval(3, 3, 1, 'b'), Interval(3, 3, 1, 'c')]
+    >>> [interval.corresponding_object for interval in find_maximum_weight_interval_set(intervals)]
+    ['a', 'c']
     """
-    endpoints = []
-    for interval in intervals:
-        endpoints.append(interval.start_endpoint())
-        endpoints.append(interval.end_endpoint())
-    sorted_endpoints = sorted(endpoints)
-    max_interval_sofar = None
-    for endpoint in sorted_endpoints:
-        if endpoint.is_start:
-            endpoint.interval.__value__ = endpoint.interval.weight
-            if max_interval_sofar:
-                if isinstance(max_interval_sofar.__value__, tuple):
-                    endpoint.interval.__value__ = tuple(map(sum, zip(max_interval_sofar.__value__,
-                                                                     endpoint.interval.__value__)))
-                else:
-                    endpoint.interval.__value__ += max_interval_sofar.__value__
-                endpoint.interval.__previous__ = max_interval_sofar
-        else:  # endoint.is_end
-            if not max_interval_sofar:
-                max_interval_sofar = endpoint.interval
-            elif endpoint.interval.__value__ >= max_interval_sofar.__value__:
-                max_interval_sofar = endpoint.interval
-    mwis = []
-    while max_interval_sofar:
-        mwis.insert(0, max_interval_sofar)
-        max_interval_sofar = max_interval_sofar.__previous__
-    if len(intervals) >= 1:
-        assert len(mwis) >= 1
-    return mwis
+    return [
+        intervals[idx]
+        for idx in maximum_weight_interval_indices(
+            [interval.start for interval in intervals],
+            [interval.end for interval in intervals],
+            [interval.weight for interval in intervals])]
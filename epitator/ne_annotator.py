@@ -6,6 +6,9 @@ from .spacy_annotator import SpacyAnnotator
 
 
 class NEAnnotator(Annotator):
+    # The nes tier is the spacy.nes tier, so caching it would not save any work.
+    cacheable = False
+
     def annotate(self, doc):
         if 'spacy.nes' not in doc.tiers:
             doc.add_tiers(SpacyAnnotator())
@@ -1,12 +1,17 @@
 #!/usr/bin/env python
 """Ngram Annotator"""
 from __future__ import absolute_import
-from .annotator import Annotator, AnnoTier, AnnoSpan
+from .annotator import Annotator, AnnoSpan
+from .array_annotier import ArrayAnnoTier
 from .token_annotator import TokenAnnotator
 from six.moves import range
 
 
 class NgramAnnotator(Annotator):
+    # Ngrams are quick to create from the tokens tier, and the annotators that
+    # use them also use the spaCy tokens, so caching them would not avoid
+    # parsing the document.
+    cacheable = False
 
     def __init__(self, n_min=1, n_max=5):
         self.n_min = n_min
@@ -30,6 +35,6 @@ class NgramAnnotator(Annotator):
                                 doc)
                 ngram_spans.append(span)
 
-        doc.tiers['ngrams'] = AnnoTier(ngram_spans)
+        doc.tiers['ngrams'] = ArrayAnnoTier(ngram_spans)
 
         return doc
@@ -6,6 +6,9 @@ from .spacy_annotator import SpacyAnnotator
 
 
 class POSAnnotator(Annotator):
+    # The tags are copied from the spaCy tokens,
+    # so caching them would not avoid parsing the document.
+    cacheable = False
 
     def annotate(self, doc):
         if 'spacy.tokens' not in doc.tiers:
@@ -6,9 +6,9 @@ from .annotator import Annotator, AnnoSpan, AnnoTier
 from .annospan import SpanGroup
 from .ngram_annotator import NgramAnnotator
 from .spacy_annotator import SpacyAnnotator
-from .get_database_connection import get_database_connection
+from .connection_manager import get_connection_manager
+from .utils import padded_batches
 from collections import defaultdict
-import sqlite3
 import logging
 import re
 
@@ -16,6 +16,20 @@ import re
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s %(message)s')
 logger = logging.getLogger(__name__)
 
+# The number of values bound to each IN (...) lookup. This is kept below
+# SQLite's default limit of 999 bound parameters per statement.
+LOOKUP_BATCH_SIZE = 500
+
+SYNONYMS_QUERY = """
+SELECT * FROM synonyms
+WHERE synonym IN (""" + ','.join(['?'] * LOOKUP_BATCH_SIZE) + """)
+ORDER BY synonym, rowid"""
+
+ENTITIES_QUERY = """
+SELECT id, label, type
+FROM entities
+WHERE id IN (""" + ','.join(['?'] * LOOKUP_BATCH_SIZE) + ")"
+
 
 class ResolvedKeywordSpan(AnnoSpan):
     def __init__(self, span, resolutions):
@@ -42,9 +56,19 @@ class ResolvedKeywordSpan(AnnoSpan):
 
 
 class ResolvedKeywordAnnotator(Annotator):
-    def __init__(self):
-        self.connection = get_database_connection()
-        self.connection.row_factory = sqlite3.Row
+    def __init__(self, connection_manager=None):
+        self.connection_manager = connection_manager or get_connection_manager()
+        self.connection_manager.check_database()
+
+    def cache_parameters(self):
+        """
+        Return the parameters that affect the tiers the annotator creates.
+        """
+        return {'db_path': self.connection_manager.db_path}
+
+    @property
+    def connection(self):
+        return self.connection_manager.connection()
 
     @property
     def synonyms(self):
@@ -52,6 +76,19 @@ class ResolvedKeywordAnnotator(Annotator):
         return cursor.execute("""
         SELECT * FROM synonyms ORDER BY synonym""")
 
+    def synonyms_matching(self, texts):
+        """
+        Yield the rows of the synonyms table that exactly match one of the
+        given texts ordered by synonym.
+        The texts are looked up in batches using the synonym index, so the
+        cost depends on the number of texts rather than the size of the
+        synonyms table. The batches are padded to a fixed size so the same
+        prepared statement is used for every document.
+        """
+        for batch in padded_batches(sorted(set(texts)), LOOKUP_BATCH_SIZE):
+            for result in self.connection_manager.execute(SYNONYMS_QUERY, batch):
+                yield result
+
     def annotate(self, doc):
         logger.info('start resolved keyword annotator')
         tokens = doc.require_tiers('spacy.tokens', via=SpacyAnnotator)
@@ -74,43 +111,30 @@ class ResolvedKeywordAnnotator(Annotator):
                     lemmatized_text = SpanGroup(ngram_tokens[0:-1]).text + ' ' + lemmatized_text
                 span_text_to_spans[lemmatized_text.lower()].append(ngram_span)
 
-        ngrams = list(set(span_text_to_spans.keys()))
-        cursor = self.connection.cursor()
-
         spans_to_resolved_keywords = defaultdict(list)
         entity_ids = set()
-        ordered_ngram_iter = iter(sorted(ngrams))
-        try:
-            ngram = next(ordered_ngram_iter)
-            for result in self.synonyms:
-                while ngram < result['synonym']:
-                    ngram = next(ordered_ngram_iter)
-                if ngram == result['synonym']:
-                    # increase the weight of entities matching longer spans of text
-                    # as they are less likely to be false positives.
-                    if len(ngram) > 12:
-                        match_weight = 2
-                    elif len(ngram) > 10:
-                        match_weight = 1
-                    else:
-                        match_weight = 0
-                    for span in span_text_to_spans[ngram]:
-                        spans_to_resolved_keywords[span].append(
-                            dict(result,
-                                 weight=result['weight'] + match_weight))
-                        entity_ids.add(result['entity_id'])
-        except StopIteration:
-            pass
+        for result in self.synonyms_matching(span_text_to_spans.keys()):
+            ngram = result['synonym']
+            # increase the weight of entities matching longer spans of text
+            # as they are less likely to be false positives.
+            if len(ngram) > 12:
+                match_weight = 2
+            elif len(ngram) > 10:
+                match_weight = 1
+            else:
+                match_weight = 0
+            for span in span_text_to_spans[ngram]:
+                spans_to_resolved_keywords[span].append(
+                    dict(result,
+                         weight=result['weight'] + match_weight))
+                entity_ids.add(result['entity_id'])
 
         logger.info('%s entities resolved' % len(entity_ids))
 
-        results = cursor.execute('''
-             SELECT id, label, type
-             FROM entities
-             WHERE id IN (''' + ','.join('?' for x in entity_ids) + ')', list(entity_ids))
         ids_to_entities = {}
-        for result in results:
-            ids_to_entities[result['id']] = {k: result[k] for k in result.keys()}
+        for batch in padded_batches(list(entity_ids), LOOKUP_BATCH_SIZE):
+            for result in self.connection_manager.execute(ENTITIES_QUERY, batch):
+                ids_to_entities[result['id']] = {k: result[k] for k in result.keys()}
         spans = []
         for span, resolved_keywords in spans_to_resolved_keywords.items():
             sorted_resolved_keywords = sorted(resolved_keywords,
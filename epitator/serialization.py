@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+"""
+A compact, versioned, json serializable format for annotated documents.
+
+Unlike AnnoDoc.to_dict, the format stores everything needed to rebuild
+the document's tiers: the span classes, labels, metadata, span group members,
+and objects like geonames that spans reference.
+Spans and objects that are referenced more than once, or that reference
+each other, are stored once in a table and referenced by their position in it.
+spaCy objects are not stored. Spans of classes that are not registered
+are stored as the nearest registered class they inherit from, so TokenSpans
+are loaded as AnnoSpans without their tokens. Tiers are stored the same way,
+so TokenTiers, which look up their spans' tokens, are loaded as AnnoTiers.
+
+>>> from .annodoc import AnnoDoc
+>>> from .annospan import AnnoSpan, SpanGroup
+>>> from .annotier import AnnoTier
+>>> import datetime
+>>> doc = AnnoDoc('one two three', date=datetime.datetime(2011, 11, 11))
+>>> one = AnnoSpan(0, 3, doc, label='number', metadata={'value': 1})
+>>> doc.tiers['numbers'] = AnnoTier([one, AnnoSpan(4, 7, doc, label='number')])
+>>> doc.tiers['groups'] = AnnoTier([SpanGroup([one, AnnoSpan(8, 13, doc)], 'pair')])
+>>> loaded_doc = doc_from_dict(doc_to_dict(doc))
+>>> loaded_doc.date
+datetime.datetime(2011, 11, 11, 0, 0)
+>>> loaded_doc.tiers['numbers']
+AnnoTier([AnnoSpan(0-3, number), AnnoSpan(4-7, number)])
+>>> loaded_doc.tiers['numbers'].spans[0].metadata
+{'value': 1}
+>>> loaded_doc.tiers['groups']
+AnnoTier([SpanGroup(text=one two three, label=pair, AnnoSpan(0-3, number), AnnoSpan(8-13, three))])
+>>> loaded_doc.tiers['groups'].spans[0].base_spans[0] is loaded_doc.tiers['numbers'].spans[0]
+True
+"""
+from __future__ import absolute_import
+import datetime
+import dateutil.parser
+import importlib
+import json
+import sqlite3
+import six
+
+FORMAT_NAME = 'epitator.annodoc'
+FORMAT_VERSION = 1
+
+ANNOSPAN_ATTRS = ['start', 'end', 'doc', 'metadata', 'label', 'base_spans']
+
+
+class SerializableType(object):
+    """
+    A class that can be stored in the format.
+
+    Args:
+        name (str): The name the class is stored under.
+        module_name (str): The module the class is imported from when it is loaded.
+        class_name (str): The name of the class.
+        attributes (list): The attributes of instances to store. If None, all
+            the attributes in the instance's __slots__ and __dict__ are stored.
+    """
+    def __init__(self, name, module_name, class_name, attributes=None):
+        self.name = name
+        self.module_name = module_name
+        self.class_name = class_name
+        self.attributes = attributes
+        self._cls = None
+
+    @property
+    def cls(self):
+        if self._cls is None:
+            self._cls = getattr(importlib.import_module(self.module_name), self.class_name)
+        return self._cls
+
+
+span_types = {}
+object_types = {}
+tier_types = {}
+# Registered types keyed by the module and name of their class.
+types_by_class_path = {}
+
+
+def register_span_type(name, module_name, class_name, attributes=None):
+    """
+    Register an AnnoSpan subclass so spans of it are loaded as instances of it.
+    """
+    span_types[name] = SerializableType(name, module_name, class_name, attributes)
+    types_by_class_path[(module_name, class_name)] = span_types[name]
+
+
+def register_object_type(name, module_name, class_name, attributes=None):
+    """
+    Register a class of objects spans may reference in their metadata
+    or attributes.
+    """
+    object_types[name] = SerializableType(name, module_name, class_name, attributes)
+    types_by_class_path[(module_name, class_name)] = object_types[name]
+
+
+def register_tier_type(name, module_name, class_name):
+    """
+    Register an AnnoTier subclass so tiers of it are loaded as instances of it.
+    Tiers are only loaded as registered classes, so a serialized document
+    cannot make doc_from_dict import other modules.
+    """
+    tier_types[name] = SerializableType(name, module_name, class_name)
+    types_by_class_path[(module_name, class_name)] = tier_types[name]
+
+
+register_span_type('AnnoSpan', 'epitator.annospan', 'AnnoSpan')
+register_span_type('SpanGroup', 'epitator.annospan', 'SpanGroup')
+register_span_type('GeoSpan', 'epitator.geoname_annotator', 'GeoSpan')
+register_span_type('DateSpan', 'epitator.date_annotator', 'DateSpan')
+register_span_type('CountSpan', 'epitator.count_annotator', 'CountSpan')
+register_span_type('ResolvedKeywordSpan', 'epitator.resolved_keyword_annotator', 'ResolvedKeywordSpan')
+register_tier_type('AnnoTier', 'epitator.annotier', 'AnnoTier')
+register_tier_type('ArrayAnnoTier', 'epitator.array_annotier', 'ArrayAnnoTier')
+# The candidate locations geonames are compared with during annotation
+# are not stored.
+register_object_type('GeonameRow', 'epitator.geoname_annotator', 'GeonameRow', [
+    'geonameid', 'name', 'feature_code', 'country_code',
+    'admin1_code', 'admin2_code', 'admin3_code', 'admin4_code',
+    'longitude', 'latitude', 'population', 'asciiname', 'containment_level',
+    'names_used', 'lemmas_used', 'name_count',
+    'country_name', 'admin1_name', 'admin2_name', 'admin3_name',
+    'spans', 'original_spans', 'parents', 'score', 'lat_long',
+    'high_confidence', 'base_score'])
+
+
+def registered_type(obj):
+    for cls in type(obj).__mro__:
+        serializable_type = types_by_class_path.get((cls.__module__, cls.__name__))
+        if serializable_type:
+            return cls, serializable_type
+    return None, None
+
+
+def instance_attributes(obj, cls, serializable_type):
+    """
+    Return a list of the attributes of the object to store
+    if it is stored as an instance of the given registered class.
+    """
+    if serializable_type.attributes is not None:
+        return serializable_type.attributes
+    attributes = []
+    for base_cls in reversed(cls.__mro__):
+        for attribute in base_cls.__dict__.get('__slots__', []):
+            if attribute not in attributes:
+                attributes.append(attribute)
+    instances_have_dicts = any('__dict__' in base_cls.__dict__ for base_cls in cls.__mro__[:-1])
+    if instances_have_dicts and hasattr(obj, '__dict__'):
+        attributes.extend(sorted(attribute for attribute in vars(obj) if attribute not in attributes))
+    return attributes
+
+
+def is_spacy_object(value):
+    return type(value).__module__.split('.')[0] in ['spacy', 'thinc']
+
+
+class Encoder(object):
+    def __init__(self, doc):
+        self.doc = doc
+        self.type_names = []
+        self.type_indices = {}
+        self.spans = []
+        self.span_indices = {}
+        self.objects = []
+        self.object_indices = {}
+
+    def type_index(self, name):
+        if name not in self.type_indices:
+            self.type_indices[name] = len(self.type_names)
+            self.type_names.append(name)
+        return self.type_indices[name]
+
+    def span_index(self, span):
+        idx = self.span_indices.get(id(span))
+        if idx is not None:
+            return idx
+        cls, span_type = registered_type(span)
+        if span_type is None or span_type.name not in span_types:
+            raise TypeError("Spans of type %s cannot be serialized" % type(span).__name__)
+        # The index is assigned before the span's values are encoded
+        # so spans that reference themselves through their metadata
+        # are only stored once.
+        idx = len(self.spans)
+        self.span_indices[id(span)] = idx
+        self.spans.append(None)
+        if span.doc is not self.doc:
+            raise ValueError("Spans from other documents cannot be serialized")
+        # Spans are stored as [type, start, end, label, metadata, base spans, attributes]
+        # with trailing empty values omitted.
+        extra_attributes = {}
+        for attribute in instance_attributes(span, cls, span_type):
+            if attribute in ANNOSPAN_ATTRS or not hasattr(span, attribute):
+                continue
+            extra_attributes[attribute] = self.encode(getattr(span, attribute))
+        encoded = [
+            self.type_index(span_type.name),
+            span.start,
+            span.end,
+            span.label,
+            self.encode(span.metadata),
+            [self.span_index(base_span) for base_span in span.base_spans],
+            extra_attributes]
+        empty_values = [None, None, [], {}]
+        while len(encoded) > 3 and encoded[-1] == empty_values[len(encoded) - 4]:
+            encoded.pop()
+        self.spans[idx] = encoded
+        return idx
+
+    def object_index(self, obj, cls, object_type):
+        idx = self.object_indices.get(id(obj))
+        if idx is not None:
+            return idx
+        idx = len(self.objects)
+        self.object_indices[id(obj)] = idx
+        self.objects.append(None)
+        attributes = {}
+        for attribute in instance_attributes(obj, cls, object_type):
+            if hasattr(obj, attribute):
+                attributes[attribute] = self.encode(getattr(obj, attribute))
+        self.objects[idx] = [self.type_index(object_type.name), attributes]
+        return idx
+
+    def encode(self, value):
+        if value is None or isinstance(value, (bool, float) + six.integer_types + six.string_types):
+            return value
+        elif isinstance(value, list):
+            return [self.encode(item) for item in value]
+        elif isinstance(value, dict):
+            if all(isinstance(key, six.string_types) and not key.startswith('$') for key in value):
+                return {key: self.encode(item) for key, item in value.items()}
+            return {'$dict': [[self.encode(key), self.encode(item)] for key, item in value.items()]}
+        elif isinstance(value, sqlite3.Row):
+            return {key: self.encode(value[key]) for key in value.keys()}
+        elif isinstance(value, tuple):
+            return {'$tuple': [self.encode(item) for item in value]}
+        elif isinstance(value, (set, frozenset)):
+            return {'$set': [self.encode(item) for item in value]}
+        elif isinstance(value, datetime.datetime):
+            return {'$dt': value.isoformat()}
+        elif isinstance(value, datetime.date):
+            return {'$date': value.isoformat()}
+        elif is_spacy_object(value):
+            return None
+        elif type(value).__module__ == 'numpy' and hasattr(value, 'item'):
+            # NumPy scalars
+            return self.encode(value.item())
+        cls, serializable_type = registered_type(value)
+        if serializable_type is None or serializable_type.name in tier_types:
+            raise TypeError("Values of type %s cannot be serialized" % type(value).__name__)
+        elif serializable_type.name in span_types:
+            return {'$span': self.span_index(value)}
+        else:
+            return {'$obj': self.object_index(value, cls, serializable_type)}
+
+
+def parse_datetime(value):
+    for date_format in ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%d', '%Y-%m-%dT%H:%M:%S.%f']:
+        try:
+            return datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    # Datetimes with time zones
+    return dateutil.parser.parse(value)
+
+
+class Decoder(object):
+    def __init__(self, doc, serialized):
+        self.doc = doc
+        self.serialized = serialized
+        type_names = serialized['types']
+        # The spans and objects are created before any values are decoded
+        # so references between them can be resolved in any order.
+        self.spans = []
+        for encoded in serialized['spans']:
+            cls = span_types[type_names[encoded[0]]].cls
+            self.spans.append(cls.__new__(cls))
+        self.objects = []
+        for type_idx, _ in serialized['objects']:
+            cls = object_types[type_names[type_idx]].cls
+            self.objects.append(cls.__new__(cls))
+        for span, encoded in zip(self.spans, serialized['spans']):
+            encoded = encoded + [None, None, None, None][len(encoded) - 3:]
+            span.start = encoded[1]
+            span.end = encoded[2]
+            span.doc = doc
+            span.label = encoded[3]
+            span.metadata = self.decode(encoded[4])
+            span.base_spans = [self.spans[idx] for idx in encoded[5] or []]
+            for attribute, value in (encoded[6] or {}).items():
+                setattr(span, attribute, self.decode(value))
+        for obj, (_, attributes) in zip(self.objects, serialized['objects']):
+            for attribute, value in attributes.items():
+                setattr(obj, attribute, self.decode(value))
+
+    def decode(self, value):
+        if isinstance(value, list):
+            return [self.decode(item) for item in value]
+        elif isinstance(value, dict):
+            if len(value) == 1:
+                key, item = next(iter(value.items()))
+                if key == '$span':
+                    return self.spans[item]
+                elif key == '$obj':
+                    return self.objects[item]
+                elif key == '$tuple':
+                    return tuple(self.decode(x) for x in item)
+                elif key == '$set':
+                    return set(self.decode(x) for x in item)
+                elif key == '$dt':
+                    return parse_datetime(item)
+                elif key == '$date':
+                    return parse_datetime(item).date()
+                elif key == '$dict':
+                    return {self.decode(k): self.decode(v) for k, v in item}
+            return {key: self.decode(item) for key, item in value.items()}
+        return value
+
+
+def doc_to_dict(doc, tier_names=None):
+    """
+    Serialize the document and the given tiers, or all its tiers if
+    tier_names is None, into a json serializable dict.
+    Tiers of classes that are not registered are stored as the nearest
+    registered class they inherit from.
+    """
+    if tier_names is None:
+        tier_names = sorted(doc.tiers.keys())
+    encoder = Encoder(doc)
+    tiers = {}
+    serialized_tier_types = {}
+    for tier_name in tier_names:
+        tier = doc.tiers[tier_name]
+        tiers[tier_name] = [encoder.span_index(span) for span in tier]
+        _, tier_type = registered_type(tier)
+        if tier_type is None or tier_type.name not in tier_types:
+            raise TypeError("Tiers of type %s cannot be serialized" % type(tier).__name__)
+        if tier_type.name != 'AnnoTier':
+            serialized_tier_types[tier_name] = tier_type.name
+    result = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'text': doc.text,
+        'date': encoder.encode(doc.date),
+        'types': encoder.type_names,
+        'spans': encoder.spans,
+        'objects': encoder.objects,
+        'tiers': tiers,
+    }
+    if serialized_tier_types:
+        result['tier_types'] = serialized_tier_types
+    return result
+
+
+def doc_from_dict(serialized):
+    """
+    Create an AnnoDoc from a dict created by doc_to_dict.
+    """
+    from .annodoc import AnnoDoc
+    if serialized.get('format') != FORMAT_NAME:
+        raise ValueError("The dict is not a serialized AnnoDoc")
+    if serialized['version'] > FORMAT_VERSION:
+        raise ValueError(
+            "The document was serialized with format version %d, but this version of EpiTator "
+            "can only load versions up to %d" % (serialized['version'], FORMAT_VERSION))
+    doc = AnnoDoc(serialized['text'])
+    decoder = Decoder(doc, serialized)
+    doc.date = decoder.decode(serialized['date'])
+    serialized_tier_types = serialized.get('tier_types', {})
+    for tier_name, span_indices in serialized['tiers'].items():
+        tier_type_name = serialized_tier_types.get(tier_name, 'AnnoTier')
+        if tier_type_name not in tier_types:
+            raise ValueError("Unknown tier type: %s" % tier_type_name)
+        tier_class = tier_types[tier_type_name].cls
+        doc.tiers[tier_name] = tier_class(
+            [decoder.spans[idx] for idx in span_indices], presorted=True)
+    return doc
+
+
+def dumps(doc, tier_names=None):
+    """
+    Serialize the document into a json string.
+    """
+    return json.dumps(doc_to_dict(doc, tier_names), separators=(',', ':'))
+
+
+def loads(serialized):
+    """
+    Create an AnnoDoc from a json string created by dumps.
+    """
+    return doc_from_dict(json.loads(serialized))
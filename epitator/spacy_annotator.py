@@ -2,8 +2,11 @@
 """Create annotation tiers using spacy"""
 from __future__ import absolute_import
 from .annotator import Annotator, AnnoSpan, AnnoTier
+from .annospan import SpanGroup
+from collections import defaultdict
+from operator import attrgetter
 import re
-from .spacy_nlp import spacy_nlp, custom_sentencizer
+from .spacy_nlp import get_spacy_nlp, custom_sentencizer, model_lock
 
 
 class TokenSpan(AnnoSpan):
@@ -56,57 +59,160 @@ class SentSpan(AnnoSpan):
         return self.start - self.span.start_char
 
 
+class TokenIndex(object):
+    """
+    An inverted index of token spans by their lemmas, lowercased texts and
+    part of speech tags. Each value maps to a list of the spans with it
+    sorted by start offset.
+    """
+    attributes = ['lemma_', 'lower_', 'tag_']
+
+    def __init__(self, token_spans):
+        self.spans = token_spans
+        self.size = len(token_spans)
+        self.spans_by_value = {attribute: defaultdict(list) for attribute in self.attributes}
+        lemmas = self.spans_by_value['lemma_']
+        lowers = self.spans_by_value['lower_']
+        tags = self.spans_by_value['tag_']
+        for span in token_spans:
+            token = span.token
+            lemmas[token.lemma_].append(span)
+            lowers[token.lower_].append(span)
+            tags[token.tag_].append(span)
+
+    def lookup(self, attribute, values):
+        """
+        Return a list of the spans with any of the given values of the
+        attribute, sorted by start offset.
+        """
+        index = self.spans_by_value[attribute]
+        span_lists = [index[value] for value in set(values) if value in index]
+        if len(span_lists) == 1:
+            return list(span_lists[0])
+        return sorted((span for spans in span_lists for span in spans), key=attrgetter('start'))
+
+
+class TokenTier(AnnoTier):
+    """
+    The tier of TokenSpans created by the SpacyAnnotator.
+    Tokens can be looked up by lemma, lowercased text or tag with
+    an index that is created the first time it is used,
+    so searches take time proportional to the number of matching tokens
+    rather than the number of tokens in the document.
+    """
+    @property
+    def token_index(self):
+        token_index = getattr(self, '_token_index', None)
+        if token_index is None or token_index.spans is not self.spans or token_index.size != len(self.spans):
+            token_index = self._token_index = TokenIndex(self.spans)
+        return token_index
+
+    def lookup(self, attribute, values, label=None):
+        """
+        Create a tier of the tokens with any of the given values of the
+        attribute, wrapped in span groups with the given label.
+        """
+        return AnnoTier([
+            SpanGroup([span], label)
+            for span in self.token_index.lookup(attribute, values)], presorted=True)
+
+    def with_lemmas(self, lemmas, label=None):
+        """
+        Create a tier of the tokens with the given lemmas,
+        wrapped in span groups with the given label.
+        """
+        return self.lookup('lemma_', lemmas, label)
+
+    def with_texts(self, texts, label=None):
+        """
+        Create a tier of the tokens that match one of the given texts,
+        ignoring case, wrapped in span groups with the given label.
+        """
+        return self.lookup('lower_', [text.lower() for text in texts], label)
+
+    def with_tags(self, tags, label=None):
+        """
+        Create a tier of the tokens with the given part of speech tags,
+        wrapped in span groups with the given label.
+        """
+        return self.lookup('tag_', tags, label)
+
+
+def as_token_tier(tier):
+    """
+    Return the tier as a TokenTier so its tokens can be looked up
+    by their attributes.
+    """
+    if isinstance(tier, TokenTier):
+        return tier
+    return TokenTier(tier)
+
+
 class SpacyAnnotator(Annotator):
-    def annotate(self, doc):
-        tiers = {}
-        ne_spans = []
-        token_spans = []
-        noun_chunks = []
-        # SpaCy's neural nets currently use up too much memory on large docs,
-        # so the document is divided into sections before recognizing named
-        # entities. Each section is composed of N sentences. Sentence parsing
-        # is not memory constrained.
-        # https://github.com/explosion/spaCy/issues/1636
+    """
+    Creates the spacy.tokens, spacy.nes, spacy.noun_chunks and spacy.sentences
+    tiers.
+    SpaCy's neural nets currently use up too much memory on large docs,
+    so documents are divided into groups of sentences that are parsed
+    separately. Sentence parsing is not memory constrained.
+    https://github.com/explosion/spaCy/issues/1636
+    """
+    group_size = 10
+    # The tiers contain spaCy tokens and spans.
+    cacheable = False
+
+    def sentence_groups(self, doc):
+        """
+        Return the sentence tier of the doc and the offsets of the
+        sections of its text that are parsed separately.
+        """
         sentences = AnnoTier([
             SentSpan(sent, doc) for sent in custom_sentencizer(doc.text)])
-        tiers['spacy.sentences'] = sentences
-        group_size = 10
-        for sent_group_idx in range(0, len(sentences), group_size):
+        groups = []
+        for sent_group_idx in range(0, len(sentences), self.group_size):
             doc_offset = sentences.spans[sent_group_idx].start
-            sent_group_end = sentences.spans[min(sent_group_idx + group_size, len(sentences)) - 1].end
-            ne_chunk_start = None
-            ne_chunk_end = None
-            ne_chunk_type = None
-            spacy_doc = spacy_nlp(doc.text[doc_offset:sent_group_end])
-            noun_chunks.extend(SentSpan(chunk, doc, offset=doc_offset) for chunk in spacy_doc.noun_chunks)
-            for token in spacy_doc:
-                start = token.idx + doc_offset
-                end = start + len(token)
-                # White-space tokens are skipped.
-                if not re.match(r"^\s", token.text):
-                    token_spans.append(TokenSpan(token, doc, offset=doc_offset))
-                if ne_chunk_start is not None and token.ent_iob_ != "I":
-                    ne_spans.append(AnnoSpan(ne_chunk_start, ne_chunk_end,
-                                             doc, label=ne_chunk_type))
-                    ne_chunk_start = None
-                    ne_chunk_end = None
-                    ne_chunk_type = None
-                if token.ent_type_:
-                    if token.ent_iob_ == "B":
-                        ne_chunk_start = start
-                        ne_chunk_end = end
-                        ne_chunk_type = token.ent_type_
-                    elif token.ent_iob_ == "I":
-                        ne_chunk_end = end
-                    elif token.ent_iob_ == "O":
-                        ne_spans.append(AnnoSpan(start, end,
-                                                 doc, label=token.ent_type_))
-                    else:
-                        raise Exception("Unexpected IOB tag: " + str(token.ent_iob_))
-            if ne_chunk_start is not None:
+            sent_group_end = sentences.spans[min(sent_group_idx + self.group_size, len(sentences)) - 1].end
+            groups.append((doc_offset, sent_group_end))
+        return sentences, groups
+
+    def add_group_spans(self, spacy_doc, doc, doc_offset, token_spans, ne_spans, noun_chunks):
+        """
+        Add the spans for a parsed section of the doc starting at doc_offset
+        to the given span lists.
+        """
+        ne_chunk_start = None
+        ne_chunk_end = None
+        ne_chunk_type = None
+        noun_chunks.extend(SentSpan(chunk, doc, offset=doc_offset) for chunk in spacy_doc.noun_chunks)
+        for token in spacy_doc:
+            start = token.idx + doc_offset
+            end = start + len(token)
+            # White-space tokens are skipped.
+            if not re.match(r"^\s", token.text):
+                token_spans.append(TokenSpan(token, doc, offset=doc_offset))
+            if ne_chunk_start is not None and token.ent_iob_ != "I":
                 ne_spans.append(AnnoSpan(ne_chunk_start, ne_chunk_end,
                                          doc, label=ne_chunk_type))
+                ne_chunk_start = None
+                ne_chunk_end = None
+                ne_chunk_type = None
+            if token.ent_type_:
+                if token.ent_iob_ == "B":
+                    ne_chunk_start = start
+                    ne_chunk_end = end
+                    ne_chunk_type = token.ent_type_
+                elif token.ent_iob_ == "I":
+                    ne_chunk_end = end
+                elif token.ent_iob_ == "O":
+                    ne_spans.append(AnnoSpan(start, end,
+                                             doc, label=token.ent_type_))
+                else:
+                    raise Exception("Unexpected IOB tag: " + str(token.ent_iob_))
+        if ne_chunk_start is not None:
+            ne_spans.append(AnnoSpan(ne_chunk_start, ne_chunk_end,
+                                     doc, label=ne_chunk_type))
 
+    def create_tiers(self, sentences, token_spans, ne_spans, noun_chunks):
         ambiguous_year_pattern = re.compile(r'\d{1,4}$', re.I)
         for ne_span in ne_spans:
             if ne_span.label == 'DATE' and ambiguous_year_pattern.match(ne_span.text):
@@ -116,8 +222,48 @@ class SpacyAnnotator(Annotator):
                 date_as_number = int(ne_span.text)
                 if date_as_number < 1900:
                     ne_span.label = 'QUANTITY'
+        return {
+            'spacy.sentences': sentences,
+            'spacy.noun_chunks': AnnoTier(noun_chunks, presorted=True),
+            'spacy.tokens': TokenTier(token_spans, presorted=True),
+            'spacy.nes': AnnoTier(ne_spans, presorted=True),
+        }
+
+    def annotate(self, doc):
+        ne_spans = []
+        token_spans = []
+        noun_chunks = []
+        sentences, groups = self.sentence_groups(doc)
+        for doc_offset, sent_group_end in groups:
+            with model_lock:
+                spacy_doc = get_spacy_nlp()(doc.text[doc_offset:sent_group_end])
+            self.add_group_spans(spacy_doc, doc, doc_offset, token_spans, ne_spans, noun_chunks)
+        return self.create_tiers(sentences, token_spans, ne_spans, noun_chunks)
 
-        tiers['spacy.noun_chunks'] = AnnoTier(noun_chunks, presorted=True)
-        tiers['spacy.tokens'] = AnnoTier(token_spans, presorted=True)
-        tiers['spacy.nes'] = AnnoTier(ne_spans, presorted=True)
-        return tiers
+    def annotate_many(self, docs, batch_size=100):
+        """
+        Add the spaCy tiers to all the given AnnoDocs.
+        The sentence groups of all the documents are parsed
+        together with spacy_nlp.pipe in batches of batch_size texts.
+        Returns the list of docs.
+        """
+        docs = list(docs)
+        doc_spans = []
+        group_positions = []
+        for doc_idx, doc in enumerate(docs):
+            sentences, groups = self.sentence_groups(doc)
+            doc_spans.append((sentences, [], [], []))
+            group_positions.extend((doc_idx, doc_offset, sent_group_end)
+                                   for doc_offset, sent_group_end in groups)
+        group_texts = (docs[doc_idx].text[doc_offset:sent_group_end]
+                       for doc_idx, doc_offset, sent_group_end in group_positions)
+        # The pipe parses the texts as they are consumed,
+        # so the lock is held until all of them have been added.
+        with model_lock:
+            spacy_docs = get_spacy_nlp().pipe(group_texts, batch_size=batch_size)
+            for (doc_idx, doc_offset, _), spacy_doc in zip(group_positions, spacy_docs):
+                sentences, token_spans, ne_spans, noun_chunks = doc_spans[doc_idx]
+                self.add_group_spans(spacy_doc, docs[doc_idx], doc_offset, token_spans, ne_spans, noun_chunks)
+        for doc, spans in zip(docs, doc_spans):
+            doc.tiers.update(self.create_tiers(*spans))
+        return docs
@@ -1,14 +1,94 @@
 #!/usr/bin/env python
-"""Load a shared spacy model"""
-import spacy
+"""
+Load a shared spacy model
+
+The model is loaded the first time it is used rather than when this module
+is imported, so importing annotators that do not use it is fast.
+Services that want to load it up front can call load_models().
+
+spaCy pipelines are not safe to call from multiple threads at once because
+parsing adds strings to the shared vocabulary, so calls to the models are
+made while holding model_lock. Threads that share the models parse one text
+at a time. Use processes, like the CorpusRunner's workers, to parse in parallel.
+"""
 import os
 import re
-if os.environ.get('SPACY_MODEL_SHORTCUT_LINK'):
-    spacy_nlp = spacy.load(os.environ.get('SPACY_MODEL_SHORTCUT_LINK'))
-else:
-    import en_core_web_md as spacy_model
-    spacy_nlp = spacy_model.load()
-sent_nlp = spacy.blank('en')
+import threading
+
+_spacy_nlp = None
+_sent_nlp = None
+# Held while the models are loaded and while they are called.
+model_lock = threading.RLock()
+
+
+def get_spacy_nlp():
+    """
+    Return the shared spaCy model, loading it if it has not been loaded yet.
+    The SPACY_MODEL_SHORTCUT_LINK environment variable can be used to
+    specify a model other than en_core_web_md.
+    """
+    global _spacy_nlp
+    if _spacy_nlp is None:
+        with model_lock:
+            if _spacy_nlp is None:
+                import spacy
+                if os.environ.get('SPACY_MODEL_SHORTCUT_LINK'):
+                    _spacy_nlp = spacy.load(os.environ.get('SPACY_MODEL_SHORTCUT_LINK'))
+                else:
+                    import en_core_web_md as spacy_model
+                    _spacy_nlp = spacy_model.load()
+    return _spacy_nlp
+
+
+def get_sent_nlp():
+    """
+    Return the blank spaCy pipeline used to split sentences.
+    """
+    global _sent_nlp
+    if _sent_nlp is None:
+        with model_lock:
+            if _sent_nlp is None:
+                import spacy
+                _sent_nlp = spacy.blank('en')
+    return _sent_nlp
+
+
+def load_models():
+    """
+    Load the spaCy models now instead of when they are first used.
+    """
+    get_spacy_nlp()
+    get_sent_nlp()
+
+
+class LazyModel(object):
+    """
+    Stands in for a model that is loaded by the given function
+    the first time it is called or one of its attributes is accessed.
+    The model is loaded while holding model_lock, so threads that use it
+    at the same time load it once. Code that uses its attributes to parse
+    texts, like pipe, should hold model_lock while doing so.
+    """
+    def __init__(self, load):
+        self._load = load
+
+    def __call__(self, *args, **kwargs):
+        with model_lock:
+            return self._load()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name == '_load':
+            # Looking up special attributes, as copying or pickling does,
+            # does not load the model.
+            raise AttributeError(name)
+        with model_lock:
+            return getattr(self._load(), name)
+
+
+# These are kept so code that imports the models from this module
+# continues to work.
+spacy_nlp = LazyModel(get_spacy_nlp)
+sent_nlp = LazyModel(get_sent_nlp)
 
 line_break_re = re.compile(r"\n{4,}")
 
@@ -18,7 +98,8 @@ def custom_sentencizer(doc_text):
     A modified version of the default sentencizer_strategy that also breaks
     on sequences of more than 4 spaces.
     """
-    doc = sent_nlp(doc_text)
+    with model_lock:
+        doc = get_sent_nlp()(doc_text)
     start = 0
     seen_sent_end = False
     for i, word in enumerate(doc):
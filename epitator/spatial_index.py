@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Great circle distances and queries for the geonames near a location.
+
+The geonames importer builds an R*Tree index of the geonames' coordinates,
+the geoname_locations table, which SpatialIndex uses to find geonames
+within a bounding box or radius without loading the gazetteer into memory.
+
+Example::
+
+    from epitator.spatial_index import SpatialIndex
+    index = SpatialIndex()
+    for geoname, distance in index.geonames_within(47.61, -122.33, 50):
+        print(geoname['name'], distance)
+"""
+from __future__ import absolute_import
+import math
+import numpy as np
+from geopy.distance import EARTH_RADIUS
+from .connection_manager import get_connection_manager
+
+
+def great_circle_distances(lat_longs_a, lat_longs_b):
+    """
+    Return an array of the great circle distances in kilometers between
+    the corresponding (latitude, longitude) pairs of the two arrays.
+    This uses the same formula as geopy's great_circle.
+
+    >>> great_circle_distances([(0, 0), (10, 20)], [(0, 1), (10, 20)]).round(3).tolist()
+    [111.195, 0.0]
+    """
+    lat_longs_a = np.radians(np.asarray(lat_longs_a, dtype=np.float64).reshape(-1, 2))
+    lat_longs_b = np.radians(np.asarray(lat_longs_b, dtype=np.float64).reshape(-1, 2))
+    lat1, lng1 = lat_longs_a[:, 0], lat_longs_a[:, 1]
+    lat2, lng2 = lat_longs_b[:, 0], lat_longs_b[:, 1]
+    sin_lat1, cos_lat1 = np.sin(lat1), np.cos(lat1)
+    sin_lat2, cos_lat2 = np.sin(lat2), np.cos(lat2)
+    delta_lng = lng2 - lng1
+    cos_delta_lng, sin_delta_lng = np.cos(delta_lng), np.sin(delta_lng)
+    d = np.arctan2(np.sqrt((cos_lat2 * sin_delta_lng) ** 2 +
+                           (cos_lat1 * sin_lat2 -
+                            sin_lat1 * cos_lat2 * cos_delta_lng) ** 2),
+                   sin_lat1 * sin_lat2 + cos_lat1 * cos_lat2 * cos_delta_lng)
+    return EARTH_RADIUS * d
+
+
+def bounding_boxes(latitude, longitude, radius):
+    """
+    Return a list of (min_latitude, max_latitude, min_longitude, max_longitude)
+    boxes that together cover the points within the radius in kilometers of
+    the given location. Two boxes are returned when the area crosses the
+    antimeridian.
+
+    >>> [[round(x, 3) for x in box] for box in bounding_boxes(0, 0, 111.19508)]
+    [[-1.0, 1.0, -1.0, 1.0]]
+    >>> [[round(x, 3) for x in box] for box in bounding_boxes(0, 179.5, 111.19508)]
+    [[-1.0, 1.0, 178.5, 180.0], [-1.0, 1.0, -180.0, -179.5]]
+    """
+    angular_radius = float(radius) / EARTH_RADIUS
+    latitude_delta = math.degrees(angular_radius)
+    min_latitude = latitude - latitude_delta
+    max_latitude = latitude + latitude_delta
+    if min_latitude <= -90 or max_latitude >= 90:
+        # The area includes a pole so it includes all longitudes.
+        return [(max(min_latitude, -90.0), min(max_latitude, 90.0), -180.0, 180.0)]
+    sin_longitude_delta = math.sin(angular_radius) / math.cos(math.radians(latitude))
+    if sin_longitude_delta >= 1:
+        return [(min_latitude, max_latitude, -180.0, 180.0)]
+    longitude_delta = math.degrees(math.asin(sin_longitude_delta))
+    min_longitude = longitude - longitude_delta
+    max_longitude = longitude + longitude_delta
+    if min_longitude < -180:
+        return [
+            (min_latitude, max_latitude, min_longitude + 360, 180.0),
+            (min_latitude, max_latitude, -180.0, max_longitude)]
+    elif max_longitude > 180:
+        return [
+            (min_latitude, max_latitude, min_longitude, 180.0),
+            (min_latitude, max_latitude, -180.0, max_longitude - 360)]
+    return [(min_latitude, max_latitude, min_longitude, max_longitude)]
+
+
+GEONAMES_IN_BOX_QUERY = """
+SELECT geonames.*
+FROM geoname_locations
+JOIN geonames ON geonames.geonameid = CAST(geoname_locations.id AS TEXT)
+WHERE geoname_locations.max_latitude >= ? AND geoname_locations.min_latitude <= ?
+AND geoname_locations.max_longitude >= ? AND geoname_locations.min_longitude <= ?
+AND geonames.latitude BETWEEN ? AND ?
+AND geonames.longitude BETWEEN ? AND ?
+"""
+
+
+class SpatialIndex(object):
+    """
+    Queries the geonames near a location with the geoname_locations index.
+    Geonames are returned as sqlite3.Rows of the geonames table.
+
+    Args:
+        connection: A connection to a database with the geonames and
+            geoname_locations tables. If it is not given the connections
+            of the connection manager are used.
+        connection_manager: The ConnectionManager to use.
+            Defaults to the one annotators use.
+    """
+    def __init__(self, connection=None, connection_manager=None):
+        self.connection_manager = None
+        if connection is None:
+            self.connection_manager = connection_manager or get_connection_manager()
+        self._connection = connection
+        table = next(iter(self.execute("""
+        SELECT name FROM sqlite_master WHERE name = 'geoname_locations'
+        """)), None)
+        if table is None:
+            raise Exception(
+                "The database does not have a geoname_locations spatial index."
+                "\nRerun the geonames importer with an SQLite build that includes the R*Tree module.")
+
+    @property
+    def connection(self):
+        if self._connection is not None:
+            return self._connection
+        return self.connection_manager.connection()
+
+    def execute(self, query, parameters=()):
+        if self.connection_manager is not None:
+            return self.connection_manager.execute(query, parameters)
+        return self.connection.execute(query, parameters).fetchall()
+
+    def geonames_in_box(self, min_latitude, max_latitude, min_longitude, max_longitude):
+        """
+        Return the geonames with coordinates within the given bounds.
+        """
+        # The R*Tree stores coordinates with reduced precision, so the
+        # geonames' coordinates are also compared.
+        return self.execute(GEONAMES_IN_BOX_QUERY, (
+            min_latitude, max_latitude, min_longitude, max_longitude,
+            min_latitude, max_latitude, min_longitude, max_longitude))
+
+    def geonames_within(self, latitude, longitude, radius):
+        """
+        Return a list of (geoname, distance) tuples for the geonames
+        within the radius in kilometers of the given location,
+        ordered by their distance from it.
+        """
+        geonames = []
+        geonameids = set()
+        for box in bounding_boxes(latitude, longitude, radius):
+            for geoname in self.geonames_in_box(*box):
+                if geoname['geonameid'] not in geonameids:
+                    geonameids.add(geoname['geonameid'])
+                    geonames.append(geoname)
+        if len(geonames) == 0:
+            return []
+        distances = great_circle_distances(
+            (latitude, longitude),
+            [(geoname['latitude'], geoname['longitude']) for geoname in geonames])
+        result = [
+            (geoname, float(distance))
+            for geoname, distance in zip(geonames, distances)
+            if distance <= radius]
+        result.sort(key=lambda item: item[1])
+        return result
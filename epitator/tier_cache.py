@@ -0,0 +1,456 @@
+#!/usr/bin/env python
+"""
+A persistent cache of the tiers annotators create.
+
+Tiers are stored under a hash of the document's text and date,
+the annotator's class and parameters, the keyword arguments it was called with,
+the EpiTator version and the versions of the datasets in the EpiTator
+database. When a cache is set with set_tier_cache, AnnoDoc.add_tiers
+(and through it require_tiers) uses the cached tiers instead of running
+the annotator if they are available.
+
+The cache assumes any tiers already on a document were created from its text
+by EpiTator's annotators. Tiers that contain spaCy objects cannot be cached,
+and neither can tiers created by annotators with cacheable set to False.
+When cached tiers are used, the tiers of the annotators they depend on are
+not added to the document.
+
+Caches and their stores can be shared by multiple threads.
+
+Example::
+
+    from epitator.tier_cache import TierCache, SQLiteTierStore, set_tier_cache
+    set_tier_cache(TierCache(SQLiteTierStore('tiers.sqlitedb', max_size=2 * 1024 ** 3)))
+"""
+from __future__ import absolute_import
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import types
+import zlib
+import six
+from .version import __version__
+from .connection_manager import get_connection_manager
+
+
+class UncacheableError(Exception):
+    pass
+
+
+class CacheStats(object):
+    """
+    Counts of the cache's hits, misses, stored entries, evicted entries
+    and results that could not be cached.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    def to_dict(self):
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            stores=self.stores,
+            evictions=self.evictions,
+            uncacheable=self.uncacheable)
+
+    def __repr__(self):
+        return 'CacheStats(%s)' % ', '.join(
+            '%s=%d' % item for item in sorted(self.to_dict().items()))
+
+
+class SQLiteTierStore(object):
+    """
+    Stores cache entries in a SQLite database.
+    When the total size of the stored entries exceeds max_size bytes the least
+    recently used entries are removed. If max_size is None the store is unbounded.
+    """
+    def __init__(self, path, max_size=None):
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.RLock()
+        # The connection opened in this process, and the process it was opened in.
+        self._connection = None
+        self._connection_pid = None
+        # The tables are created before the store is used.
+        self.connection
+
+    @property
+    def connection(self):
+        """
+        The connection the threads using the store in this process share,
+        which they take turns using. SQLite connections cannot be used across
+        forks, so processes forked from one using the store open their own.
+        """
+        pid = os.getpid()
+        if self._connection_pid != pid:
+            with self.lock:
+                if self._connection_pid != pid:
+                    # Connections inherited from the parent process are
+                    # dropped rather than closed, since closing them could
+                    # interfere with the parent's use of them.
+                    self._connection = self.open_connection()
+                    self._connection_pid = pid
+        return self._connection
+
+    def open_connection(self):
+        connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        with connection:
+            connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_used REAL
+            )""")
+            connection.execute("""
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)
+            """)
+            connection.execute("""
+            CREATE TABLE IF NOT EXISTS properties (
+                property TEXT PRIMARY KEY, value INTEGER
+            )""")
+            connection.execute("""
+            INSERT OR IGNORE INTO properties VALUES ('size', 0)
+            """)
+        return connection
+
+    def get(self, key):
+        with self.lock:
+            row = next(self.connection.execute(
+                "SELECT value FROM entries WHERE key = ?", (key,)), None)
+            if row is None:
+                return None
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return bytes(row[0])
+
+    def set(self, key, value):
+        """
+        Store the value and return the number of entries evicted to make room for it.
+        """
+        evictions = 0
+        with self.lock, self.connection:
+            self.remove_entry(key)
+            self.connection.execute(
+                "INSERT INTO entries VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), time.time()))
+            self.connection.execute(
+                "UPDATE properties SET value = value + ? WHERE property = 'size'",
+                (len(value),))
+            if self.max_size is not None:
+                while self.size() > self.max_size:
+                    oldest_key = next(self.connection.execute(
+                        "SELECT key FROM entries ORDER BY last_used LIMIT 1"))[0]
+                    self.remove_entry(oldest_key)
+                    evictions += 1
+        return evictions
+
+    def remove_entry(self, key):
+        row = next(self.connection.execute(
+            "SELECT size FROM entries WHERE key = ?", (key,)), None)
+        if row is not None:
+            self.connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.connection.execute(
+                "UPDATE properties SET value = value - ? WHERE property = 'size'",
+                (row[0],))
+
+    def size(self):
+        with self.lock:
+            return next(self.connection.execute(
+                "SELECT value FROM properties WHERE property = 'size'"))[0]
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM entries")
+            self.connection.execute("UPDATE properties SET value = 0 WHERE property = 'size'")
+
+
+# The prefix of the files entries are written to before they are stored.
+TEMP_PREFIX = '.tmp'
+
+
+class DirectoryTierStore(object):
+    """
+    Stores cache entries as files in a directory.
+    When the total size of the stored entries exceeds max_size bytes the least
+    recently used entries are removed. If max_size is None the store is unbounded.
+    The modification times of the files are used to track when they were last used.
+    """
+    def __init__(self, path, max_size=None):
+        self.path = path
+        self.max_size = max_size
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.lock = threading.Lock()
+        self._size = sum(size for _, size, _ in self.entries())
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def entries(self):
+        """
+        Return a list of (path, size, last used time) tuples for the stored entries.
+        """
+        result = []
+        for dir_path, _, file_names in os.walk(self.path):
+            for file_name in file_names:
+                if file_name.startswith(TEMP_PREFIX):
+                    continue
+                file_path = os.path.join(dir_path, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                result.append((file_path, stat.st_size, stat.st_mtime))
+        return result
+
+    def get(self, key):
+        file_path = self.entry_path(key)
+        try:
+            with open(file_path, 'rb') as f:
+                value = f.read()
+            os.utime(file_path, None)
+        except (IOError, OSError):
+            return None
+        return value
+
+    def set(self, key, value):
+        """
+        Store the value and return the number of entries evicted to make room for it.
+        """
+        file_path = self.entry_path(key)
+        dir_path = os.path.dirname(file_path)
+        if not os.path.exists(dir_path):
+            try:
+                os.makedirs(dir_path)
+            except OSError:
+                # Another process may have created it.
+                pass
+        # The value is written to a temporary file that is renamed
+        # so readers never see a partially written entry.
+        fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=dir_path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(value)
+        os.rename(temp_path, file_path)
+        evictions = 0
+        with self.lock:
+            self._size += len(value)
+            if self.max_size is not None and self._size > self.max_size:
+                # Other processes may be using the directory,
+                # so the entries are listed again rather than tracked in memory.
+                entries = sorted(self.entries(), key=lambda entry: entry[2])
+                self._size = sum(size for _, size, _ in entries)
+                for entry_path, size, _ in entries:
+                    if self._size <= self.max_size:
+                        break
+                    try:
+                        os.remove(entry_path)
+                    except OSError:
+                        continue
+                    self._size -= size
+                    evictions += 1
+        return evictions
+
+    def size(self):
+        return self._size
+
+    def clear(self):
+        with self.lock:
+            for entry_path, _, _ in self.entries():
+                os.remove(entry_path)
+            self._size = 0
+
+
+def parameter_value(value):
+    """
+    Convert an annotator parameter into a json serializable value.
+    Values that are not numbers, strings or containers of them are
+    represented by their type.
+    """
+    if value is None or isinstance(value, (bool, float) + six.integer_types + six.string_types):
+        return value
+    elif isinstance(value, (list, tuple)):
+        return [parameter_value(item) for item in value]
+    elif isinstance(value, dict):
+        return sorted([str(key), parameter_value(item)] for key, item in value.items())
+    elif isinstance(value, types.ModuleType):
+        return 'module:' + value.__name__
+    else:
+        return 'type:' + type(value).__module__ + '.' + type(value).__name__
+
+
+def represented_by_type(value):
+    """
+    Return True if part of a value returned by parameter_value
+    only represents the type of the original parameter.
+    Different parameters of the same type cannot be told apart by it.
+    """
+    if isinstance(value, six.string_types):
+        return value.startswith('type:')
+    elif isinstance(value, list):
+        return any(represented_by_type(item) for item in value)
+    return False
+
+
+class TierCache(object):
+    """
+    Looks up and stores the tiers annotators create for documents.
+
+    Args:
+        store: A SQLiteTierStore, DirectoryTierStore, or other object with
+            get(key) and set(key, value) methods.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.stats = CacheStats()
+        self.lock = threading.Lock()
+        self._database_versions = {}
+
+    def database_versions(self, connection_manager=None):
+        """
+        Return the properties of the metadata table of the EpiTator database
+        the connection manager reads, which record the versions of the
+        imported datasets. The default connection manager is used if
+        none is given.
+        """
+        connection_manager = connection_manager or get_connection_manager()
+        db_path = connection_manager.db_path
+        if db_path not in self._database_versions:
+            try:
+                rows = connection_manager.execute("SELECT property, value FROM metadata")
+            except Exception:
+                versions = []
+            else:
+                versions = sorted(list(row) for row in rows)
+            self._database_versions[db_path] = versions
+        return self._database_versions[db_path]
+
+    def count(self, stat, value=1):
+        """
+        Add the value to one of the cache's stats.
+        """
+        with self.lock:
+            setattr(self.stats, stat, getattr(self.stats, stat) + value)
+
+    def key(self, doc, annotator, kwargs):
+        """
+        Return the key the tiers created by the annotator are stored under,
+        or None if they cannot be cached.
+        Annotators can define a cache_parameters method that returns the
+        parameters that affect their tiers. Otherwise their attributes are used.
+        Tiers cannot be cached if a parameter is only represented by its type.
+        """
+        if not getattr(annotator, 'cacheable', True):
+            return None
+        for value in kwargs.values():
+            if parameter_value(value) != value:
+                return None
+        annotator_class = type(annotator)
+        if hasattr(annotator, 'cache_parameters'):
+            parameters = annotator.cache_parameters()
+        else:
+            parameters = getattr(annotator, '__dict__', {})
+        parameters = parameter_value(parameters)
+        if represented_by_type(parameters):
+            return None
+        key_value = json.dumps([
+            doc.text,
+            repr(doc.date),
+            annotator_class.__module__ + '.' + annotator_class.__name__,
+            parameters,
+            parameter_value(kwargs),
+            __version__,
+            self.database_versions(getattr(annotator, 'connection_manager', None))
+        ], sort_keys=True)
+        return hashlib.sha256(key_value.encode('utf8')).hexdigest()
+
+    def dumps(self, tiers, doc):
+        """
+        Serialize a dict of tiers. References to the document are stored
+        as references to the document they are loaded into.
+        """
+        def persistent_id(obj):
+            if obj is doc:
+                return 'doc'
+            elif type(obj).__module__.split('.')[0] in ['spacy', 'thinc']:
+                raise UncacheableError("spaCy objects cannot be cached")
+            return None
+        output = six.BytesIO()
+        pickler = pickle.Pickler(output, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = persistent_id
+        pickler.dump(tiers)
+        return zlib.compress(output.getvalue())
+
+    def loads(self, value, doc):
+        unpickler = pickle.Unpickler(six.BytesIO(zlib.decompress(value)))
+        unpickler.persistent_load = lambda persistent_id: doc
+        return unpickler.load()
+
+    def add_tiers(self, doc, annotator, **kwargs):
+        """
+        Add the tiers the annotator creates to the document,
+        using the cached tiers if they are available.
+        """
+        key = self.key(doc, annotator, kwargs)
+        if key is None:
+            self.count('uncacheable')
+            result = annotator.annotate(doc, **kwargs)
+            if isinstance(result, dict):
+                doc.tiers.update(result)
+            return doc
+        value = self.store.get(key)
+        if value is not None:
+            try:
+                tiers = self.loads(value, doc)
+            except Exception:
+                # Entries written by other versions of the code may fail to load.
+                tiers = None
+            if tiers is not None:
+                self.count('hits')
+                doc.tiers.update(tiers)
+                return doc
+        self.count('misses')
+        tiers_before = dict(doc.tiers)
+        result = annotator.annotate(doc, **kwargs)
+        if isinstance(result, dict):
+            doc.tiers.update(result)
+            new_tiers = result
+        else:
+            # Annotators that add their tiers to the document themselves
+            # return it instead of a dict.
+            new_tiers = {
+                name: tier for name, tier in doc.tiers.items()
+                if tiers_before.get(name) is not tier}
+        try:
+            value = self.dumps(new_tiers, doc)
+        except (UncacheableError, pickle.PicklingError, TypeError, AttributeError):
+            self.count('uncacheable')
+            return doc
+        self.count('evictions', self.store.set(key, value))
+        self.count('stores')
+        return doc
+
+
+tier_cache = None
+
+
+def get_tier_cache():
+    return tier_cache
+
+
+def set_tier_cache(cache):
+    """
+    Set the TierCache AnnoDoc.add_tiers uses. If None, tiers are not cached.
+    """
+    global tier_cache
+    tier_cache = cache
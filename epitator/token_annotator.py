@@ -6,6 +6,9 @@ from .spacy_annotator import SpacyAnnotator
 
 
 class TokenAnnotator(Annotator):
+    # The tokens tier contains spaCy tokens.
+    cacheable = False
+
     def annotate(self, doc):
         if 'spacy.tokens' not in doc.tiers:
             doc.add_tiers(SpacyAnnotator())
@@ -2,8 +2,9 @@
 from __future__ import absolute_import
 from __future__ import print_function
 import re
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from itertools import compress
+import threading
 import unicodedata
 
 space_punct_re = re.compile(r"[\s\(\)\[\]\.\-\/\,]+")
@@ -144,6 +145,80 @@ def batched(iterable, batch_size=100):
     yield batch
 
 
+def padded_batches(values, batch_size, fill_value=None):
+    """
+    Yield lists of exactly batch_size values, with the last list padded
+    with the fill value. SQL statements that bind each batch as parameters
+    are identical, so the prepared statement can be reused.
+
+    >>> list(padded_batches([1, 2, 3], 2))
+    [[1, 2], [3, None]]
+    """
+    for batch in batched(values, batch_size):
+        if len(batch) > 0:
+            yield batch + [fill_value] * (batch_size - len(batch))
+
+
+class LRUCache(object):
+    """
+    A dict-like cache that holds at most max_size items.
+    When it is full the least recently used item is removed to make room
+    for new ones. The cache can be shared by multiple threads.
+
+    >>> cache = LRUCache(2)
+    >>> cache['a'] = 1
+    >>> cache['b'] = 2
+    >>> cache.get('a')
+    1
+    >>> cache['c'] = 3
+    >>> 'b' in cache
+    False
+    >>> sorted(cache.keys())
+    ['a', 'c']
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.items:
+                return default
+            # Move the item to the end of the ordered dict.
+            value = self.items.pop(key)
+            self.items[key] = value
+            return value
+
+    def __getitem__(self, key):
+        with self.lock:
+            value = self.items.pop(key)
+            self.items[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = value
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def keys(self):
+        with self.lock:
+            return list(self.items.keys())
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
 def flatten(l, unique=False, simplify=False):
     """
     Flatten an arbitrarily deep list or set to a depth-one list.
@@ -10,6 +10,22 @@ if __name__ == "__main__":
         doctest.testmod(epitator.annospan, raise_on_error=raise_on_error)
         import epitator.annodoc
         doctest.testmod(epitator.annodoc, raise_on_error=raise_on_error)
+        import epitator.array_annotier
+        doctest.testmod(epitator.array_annotier, raise_on_error=raise_on_error)
+        import epitator.annotator_registry
+        doctest.testmod(epitator.annotator_registry, raise_on_error=raise_on_error)
+        import epitator.maximum_weight_interval_set
+        doctest.testmod(epitator.maximum_weight_interval_set, raise_on_error=raise_on_error)
+        import epitator.serialization
+        doctest.testmod(epitator.serialization, raise_on_error=raise_on_error)
+        import epitator.utils
+        doctest.testmod(epitator.utils, raise_on_error=raise_on_error)
+        import epitator.spatial_index
+        doctest.testmod(epitator.spatial_index, raise_on_error=raise_on_error)
+        import epitator.geoname_annotator
+        doctest.testmod(epitator.geoname_annotator, raise_on_error=raise_on_error)
+        import epitator.date_annotator
+        doctest.testmod(epitator.date_annotator, raise_on_error=raise_on_error)
     except doctest.UnexpectedException as e:
         print("Failed example:")
         print(e.example.lineno, ":", e.example.source)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""Tests for AnnoTier operations"""
+from __future__ import absolute_import
+import unittest
+import random
+from epitator.annospan import AnnoSpan, SpanGroup
+from epitator.annotier import AnnoTier
+from epitator.annodoc import AnnoDoc
+
+
+def linear_span_before(tier, target_span, allow_overlap=True):
+    closest_span = None
+    for span in tier:
+        if span.start >= target_span.start:
+            break
+        if not allow_overlap and span.end > target_span.start:
+            break
+        closest_span = span
+    return closest_span
+
+
+def linear_span_after(tier, target_span):
+    span = None
+    for span in tier:
+        if span.start >= target_span.end:
+            break
+    return span
+
+
+def linear_nearest_to(tier, target_span):
+    closest_span = None
+    min_distance = None
+    for span in tier:
+        span_distance = span.distance(target_span)
+        if closest_span is None or span_distance <= min_distance:
+            closest_span = span
+            min_distance = span_distance
+        else:
+            break
+    return closest_span
+
+
+def random_spans(rng, doc, count, sort=True):
+    spans = []
+    for _ in range(count):
+        start = rng.randint(0, 90)
+        spans.append(AnnoSpan(start, start + rng.choice([0, 1, 3, 10, 30]), doc))
+    if sort:
+        spans.sort()
+    return spans
+
+
+def span_structure(span):
+    if isinstance(span, SpanGroup):
+        return (span.label, [span_structure(base_span) for base_span in span.base_spans])
+    return (span.start, span.end, span.label)
+
+
+class AnnoTierTest(unittest.TestCase):
+
+    def test_with_nearby_spans_from_tiers(self):
+        rng = random.Random(2)
+        doc = AnnoDoc('x' * 1000)
+        for _ in range(50):
+            anchors = []
+            for _ in range(rng.randint(0, 8)):
+                start = rng.randint(0, 950)
+                anchors.append(AnnoSpan(start, start + rng.randint(0, 10), doc, 'count'))
+            other_tiers = []
+            for label in ['new', 'total', 'cases', 'about']:
+                # The modifiers are non-overlapping tokens.
+                starts = sorted(rng.sample(range(0, 990, 10), rng.randint(0, 6)))
+                other_tiers.append(AnnoTier([
+                    SpanGroup([AnnoSpan(start, start + rng.randint(1, 9), doc)], label)
+                    for start in starts]))
+            max_dist = rng.choice([0, 5, 50, 100])
+            expected = AnnoTier(anchors)
+            for other_tier in other_tiers:
+                expected += expected.with_nearby_spans_from(other_tier, max_dist=max_dist)
+            result = AnnoTier(anchors).with_nearby_spans_from_tiers(other_tiers, max_dist=max_dist)
+            self.assertEqual(
+                [span_structure(span) for span in result],
+                [span_structure(span) for span in expected])
+
+    def check_indexed_queries(self, tier, targets):
+        for target in targets:
+            self.assertEqual(
+                tier.spans_contained_by_span(target).spans,
+                AnnoTier([span for span in tier if target.contains(span)]).spans)
+            self.assertEqual(
+                tier.spans_overlapped_by_span(target).spans,
+                AnnoTier([span for span in tier if target.overlaps(span)]).spans)
+            for allow_overlap in [True, False]:
+                self.assertIs(
+                    tier.span_before(target, allow_overlap=allow_overlap),
+                    linear_span_before(tier, target, allow_overlap=allow_overlap))
+            self.assertIs(tier.span_after(target), linear_span_after(tier, target))
+            self.assertIs(tier.nearest_to(target), linear_nearest_to(tier, target))
+
+    def test_indexed_queries(self):
+        # The indexed queries return the same spans as scans of the tier,
+        # including for tiers with overlapping or unsorted spans.
+        rng = random.Random(3)
+        doc = AnnoDoc('x' * 200)
+        for _ in range(200):
+            sort = rng.random() < 0.8
+            tier = AnnoTier(random_spans(rng, doc, rng.randint(0, 12), sort), presorted=True)
+            targets = random_spans(rng, doc, 10)
+            self.check_indexed_queries(tier, targets)
+
+    def test_empty_tier_queries(self):
+        doc = AnnoDoc('one two three')
+        tier = AnnoTier([])
+        target = AnnoSpan(4, 7, doc)
+        self.assertEqual(tier.spans_contained_by_span(target).spans, [])
+        self.assertEqual(tier.spans_overlapped_by_span(target).spans, [])
+        self.assertIsNone(tier.span_before(target))
+        self.assertIsNone(tier.span_after(target))
+        self.assertIsNone(tier.nearest_to(target))
+
+    def test_reassigned_spans(self):
+        # The index is discarded when the spans are reassigned,
+        # and recreated when spans are added to the list.
+        rng = random.Random(4)
+        doc = AnnoDoc('x' * 200)
+        for _ in range(50):
+            size = rng.randint(1, 10)
+            tier = AnnoTier(random_spans(rng, doc, size), presorted=True)
+            targets = random_spans(rng, doc, 5)
+            self.check_indexed_queries(tier, targets)
+            tier.spans = random_spans(rng, doc, size, sort=rng.random() < 0.8)
+            self.check_indexed_queries(tier, targets)
+            tier.spans.append(AnnoSpan(95, 100, doc))
+            self.check_indexed_queries(tier, targets)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Tests for the ConnectionManager"""
+from __future__ import absolute_import
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from epitator.get_database_connection import get_database_connection
+from epitator.connection_manager import ConnectionManager
+
+
+class ConnectionManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, 'test.sqlitedb')
+        connection = get_database_connection(create_database=True, db_path=self.db_path)
+        connection.execute("INSERT INTO entities VALUES ('id1', 'label', 'disease', 'test')")
+        connection.commit()
+        connection.close()
+        self.manager = ConnectionManager(self.db_path)
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.directory)
+
+    def test_read_only(self):
+        rows = self.manager.execute("SELECT id, label FROM entities")
+        self.assertEqual([tuple(row) for row in rows], [('id1', 'label')])
+        self.assertEqual(rows[0]['label'], 'label')
+        with self.assertRaises(sqlite3.OperationalError):
+            self.manager.execute("INSERT INTO entities VALUES ('id2', 'label', 'disease', 'test')")
+
+    def test_connection_per_thread(self):
+        connection = self.manager.connection()
+        self.assertIs(self.manager.connection(), connection)
+        thread_connections = []
+        thread = threading.Thread(target=lambda: thread_connections.append(self.manager.connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(thread_connections[0], connection)
+
+    def test_query_timings(self):
+        query = "SELECT * FROM entities WHERE id = ?"
+        for _ in range(3):
+            self.manager.execute(query, ('id1',))
+        timing = self.manager.query_timings()[query]
+        self.assertEqual(timing.calls, 3)
+        self.assertTrue(timing.seconds >= 0)
+        self.manager.reset_timings()
+        self.assertEqual(self.manager.query_timings(), {})
+
+    def test_missing_database(self):
+        manager = ConnectionManager(os.path.join(self.directory, 'missing.sqlitedb'))
+        with self.assertRaises(Exception):
+            manager.connection()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""Tests for the CorpusRunner"""
+from __future__ import absolute_import
+import os
+import time
+import unittest
+from epitator.annotator import Annotator, AnnoTier, AnnoSpan
+from epitator.corpus_runner import CorpusRunner
+
+
+class LengthAnnotator(Annotator):
+    """
+    Annotates the full text of the document, unless the text tells
+    it to crash, hang or raise an exception.
+    """
+    def annotate(self, doc):
+        if doc.text == 'crash':
+            os._exit(3)
+        elif doc.text == 'hang':
+            time.sleep(30)
+        elif doc.text == 'raise':
+            raise ValueError("Bad document")
+        return {'length': AnnoTier([AnnoSpan(0, len(doc.text), doc)])}
+
+
+class CorpusRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.texts = ['document %d' % idx for idx in range(30)]
+
+    def run_corpus(self, texts, **kwargs):
+        runner = CorpusRunner(['length'], processes=3, chunk_size=4,
+                              annotators={'length': LengthAnnotator}, **kwargs)
+        return list(runner.run(texts))
+
+    def test_ordered_results(self):
+        results = self.run_corpus([(text, None) for text in self.texts])
+        self.assertEqual([result.index for result in results], list(range(len(self.texts))))
+        for result, text in zip(results, self.texts):
+            self.assertIsNone(result.error)
+            self.assertEqual(result.value['length'][0]['textOffsets'], [[0, len(text)]])
+
+    def test_unordered_results(self):
+        results = self.run_corpus(self.texts, ordered=False)
+        self.assertEqual(sorted(result.index for result in results), list(range(len(self.texts))))
+
+    def test_failures(self):
+        self.texts[5] = 'crash'
+        self.texts[11] = 'hang'
+        self.texts[17] = 'raise'
+        results = self.run_corpus(self.texts, timeout=1)
+        self.assertEqual([result.index for result in results], list(range(len(self.texts))))
+        failed = [result.index for result in results if result.error]
+        self.assertEqual(failed, [5, 11, 17])
+        self.assertIn('exited', results[5].error)
+        self.assertIn('timeout', results[11].error)
+        self.assertIn('Bad document', results[17].error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -191,6 +191,12 @@ Ongoing cases: 7
         self.assertHasCounts('The average number of cases reported annually is 600',
                              [{'count': 600, 'attributes': ['annual', 'average', 'case']}])
 
+    def test_modifier_attributes(self):
+        # The attributes come from modifiers in several lemma groups.
+        self.assertHasCounts('There were about 20 new cases and a total of 5 deaths.',
+                             [{'count': 20, 'attributes': ['approximate', 'case', 'incremental']},
+                              {'count': 5, 'attributes': ['case', 'cumulative', 'death']}])
+
     def test_attributes_3(self):
         self.assertHasCounts("""
 As of [Thu 7 Sep 2017], there have been a total of:
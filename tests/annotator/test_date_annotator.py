@@ -3,7 +3,48 @@ from __future__ import absolute_import
 import unittest
 import datetime
 from epitator.annotator import AnnoDoc
-from epitator.date_annotator import DateAnnotator
+from dateparser.date import DateDataParser
+from dateutil.relativedelta import relativedelta
+from epitator.date_annotator import DateAnnotator, date_parser_pool, parse_date_text, parsed_date_cache, fast_date_range
+
+# Date strings in the formats parsed without dateparser.
+FAST_PATH_DATES = [
+    '12/3/2018', '3/12/2018', '25/12/2018', '12/25/2018', '01/02/2019',
+    '12-3-2018', '12.3.2018', '12 / 3 / 2018', '12 - 03 - 2018',
+    '2018-03-12', '2018-3-12', '2018/03/12', '2018.3.12', '2018-13-01', '1999-12-31',
+    '12 March 2018', '12 Mar 2018', '1st Jan 2018', '22nd Sept 2017', '3 DECEMBER 1999',
+    '12 March, 2018', 'March 12 2018', 'March 12, 2018', 'Jan 1st, 2018',
+    'October 7th 2010', 'March 2018', 'Sep 2018', 'sept 2018', 'December, 2011',
+    '2018', '1066', '2999',
+]
+# Date strings that are left to dateparser.
+DATEPARSER_DATES = [
+    'last week', 'yesterday', 'Friday', '11-6-87', '12/3', 'March 12',
+    '31 February 2018', '2018-02-30', '13/13/2018', '12-3/2018', '12-4-0900',
+    '0900', '2018-Mar-12', '12 March 2018 10:00',
+]
+
+
+def dateparser_date_range(text, relative_base):
+    """
+    The datetime range DateAnnotator derived from dateparser's result before
+    the fast path was added.
+    """
+    date_data = DateDataParser(['en'], settings={
+        'RELATIVE_BASE': relative_base,
+        'PREFER_DATES_FROM': 'past'
+    }).get_date_data(text)
+    date = date_data['date_obj']
+    if not date:
+        return None
+    if date_data['period'] == 'day':
+        return (date, date + relativedelta(days=1))
+    elif date_data['period'] == 'month':
+        date = datetime.datetime(date.year, date.month, 1)
+        return (date, date + relativedelta(months=1))
+    elif date_data['period'] == 'year':
+        date = datetime.datetime(date.year, 1, 1)
+        return (date, date + relativedelta(years=1))
 
 
 class DateAnnotatorTest(unittest.TestCase):
@@ -301,3 +342,61 @@ A 31-year-old man from east Delhi's Mandawali succumbed to malaria at Safdarjung
             [date.replace(tzinfo=None) for date in doc.tiers['dates'].spans[0].datetime_range],
             [datetime.datetime(2018, 9, 29, 13, 31),
              datetime.datetime(2018, 9, 30, 13, 31)])
+
+    def test_parse_caching(self):
+        relative_base = datetime.datetime(2018, 1, 1)
+        self.assertIs(date_parser_pool.get(relative_base, 'past'),
+                      date_parser_pool.get(relative_base, 'past'))
+        self.assertIsNot(date_parser_pool.get(relative_base, 'past'),
+                         date_parser_pool.get(relative_base, 'future'))
+        parsed_date_cache.clear()
+        result = parse_date_text('March 12', relative_base)
+        self.assertEqual(result, [datetime.datetime(2017, 3, 12),
+                                  datetime.datetime(2017, 3, 13)])
+        self.assertEqual(len(parsed_date_cache), 1)
+        result.append(None)
+        self.assertEqual(parse_date_text('March 12', relative_base),
+                         [datetime.datetime(2017, 3, 12),
+                          datetime.datetime(2017, 3, 13)])
+        self.assertEqual(len(parsed_date_cache), 1)
+        self.assertIsNone(parse_date_text('not a date', relative_base))
+        self.assertIsNone(parse_date_text('not a date', relative_base))
+        self.assertEqual(len(parsed_date_cache), 2)
+        # Results parsed with cache set to False are not kept,
+        # and neither are their parsers.
+        parsers = len(date_parser_pool.local.parsers)
+        self.assertEqual(parse_date_text('March 12', datetime.datetime(2018, 2, 2), cache=False),
+                         [datetime.datetime(2017, 3, 12),
+                          datetime.datetime(2017, 3, 13)])
+        self.assertEqual(len(parsed_date_cache), 2)
+        self.assertEqual(len(date_parser_pool.local.parsers), parsers)
+
+    def test_undated_document_caching(self):
+        # Dates in documents without a date are parsed relative to the current
+        # time, so they are not cached.
+        date_parser_pool.get(strict=True)
+        parsers = len(date_parser_pool.local.parsers)
+        parsed_date_cache.clear()
+        doc = AnnoDoc("The first case was reported yesterday and the second on Friday.")
+        doc.add_tier(self.annotator)
+        self.assertEqual(len(doc.tiers['dates']), 2)
+        self.assertEqual(len(parsed_date_cache), 0)
+        self.assertEqual(len(date_parser_pool.local.parsers), parsers)
+
+    def test_fast_path_equivalence(self):
+        for relative_base in [datetime.datetime(2018, 6, 15), datetime.datetime(900, 1, 1)]:
+            for text in FAST_PATH_DATES:
+                result = fast_date_range(text)
+                self.assertIsNotNone(result, text)
+                self.assertEqual(result, dateparser_date_range(text, relative_base), text)
+        for text in DATEPARSER_DATES:
+            self.assertIsNone(fast_date_range(text), text)
+
+    def test_fast_path_dates(self):
+        doc = AnnoDoc("Cases were reported on 2018-03-12, 12/3/2018 and 3 March 2018.")
+        doc.add_tier(self.annotator)
+        self.assertEqual(
+            [span.datetime_range for span in doc.tiers['dates']],
+            [[datetime.datetime(2018, 3, 12), datetime.datetime(2018, 3, 13)],
+             [datetime.datetime(2018, 12, 3), datetime.datetime(2018, 12, 4)],
+             [datetime.datetime(2018, 3, 3), datetime.datetime(2018, 3, 4)]])
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""Tests for the computation of the GeonameAnnotator's contextual features"""
+from __future__ import absolute_import
+import unittest
+import math
+import random
+import re
+import sqlite3
+import numpy as np
+from geopy.distance import great_circle
+from epitator.geoname_annotator import (
+    GeonameRow, GeonameFeatures, location_contains, set_contextual_features,
+    set_geoname_features, feature_matrix, feature_code_level, ContainmentIndex,
+    CONTAINMENT_LEVELS)
+from epitator.get_database_connection import CONTAINMENT_LEVEL_SQL
+
+
+def random_geoname(rng, geonameid):
+    return GeonameRow(dict(
+        geonameid=str(geonameid),
+        name='Place %d' % geonameid,
+        feature_code=rng.choice(['ADM1', 'ADM2', 'ADM3', 'ADM4', 'PCLI', 'PPL', 'PPLA']),
+        country_code=rng.choice(['', 'US', 'CA']),
+        admin1_code=rng.choice(['', '01', '02']),
+        admin2_code=rng.choice(['', '001']),
+        admin3_code=rng.choice(['', '1', None]),
+        admin4_code=rng.choice(['', 'A']),
+        # Nearby locations are clustered so some are within the distance thresholds.
+        latitude=rng.choice([10, 45]) + rng.uniform(-2, 2),
+        longitude=rng.choice([-100, 20]) + rng.uniform(-2, 2),
+        population=rng.choice([0, 1, 5000]),
+        asciiname='Place %d' % geonameid,
+        names_used=rng.choice(['Place', 'Place;Place;The Place']),
+        lemmas_used='place',
+        name_count=rng.randint(1, 30)))
+
+
+def features_without_spans(geonames):
+    """
+    Create GeonameFeatures for geonames without spans, which only have
+    the features that do not depend on them.
+    """
+    matrix = np.zeros((len(geonames), len(GeonameFeatures.feature_names)))
+    set_geoname_features(matrix, geonames)
+    features = []
+    for row, geoname in enumerate(geonames):
+        feature = GeonameFeatures.__new__(GeonameFeatures)
+        feature.geoname = geoname
+        feature.nearby_mentions = set()
+        feature.matrix = matrix
+        feature.row = row
+        feature._values = matrix[row]
+        features.append(feature)
+    return features
+
+
+def reference_location_contains(loc_outer, loc_inner):
+    """
+    The implementation of location_contains that compared admin codes
+    one at a time.
+    """
+    if loc_outer.country_code != loc_inner.country_code or loc_outer.country_code == '':
+        return 0
+    if loc_outer.geonameid == loc_inner.geonameid:
+        return 0
+    feature_code = loc_outer.feature_code
+    if feature_code == 'ADM1':
+        outer_feature_level = 2
+    elif feature_code == 'ADM2':
+        outer_feature_level = 3
+    elif feature_code == 'ADM3':
+        outer_feature_level = 4
+    elif feature_code == 'ADM4':
+        outer_feature_level = 5
+    elif re.match("^PCL.", feature_code):
+        outer_feature_level = 1
+    else:
+        return 0
+    for prop in CONTAINMENT_LEVELS[1:outer_feature_level]:
+        if loc_outer[prop] == '':
+            return 0
+        if loc_outer[prop] != loc_inner[prop]:
+            return 0
+    return outer_feature_level
+
+
+def reference_contextual_features(feature):
+    """
+    The per-pair implementation the batched computation replaced.
+    """
+    geoname = feature.geoname
+    close_locations = 0
+    very_close_locations = 0
+    containing_locations = 0
+    contained_locations = 0
+    for recently_mentioned_geoname in feature.nearby_mentions:
+        if recently_mentioned_geoname == geoname:
+            continue
+        if reference_location_contains(recently_mentioned_geoname, geoname) > 0:
+            containing_locations += 1
+        if reference_location_contains(geoname, recently_mentioned_geoname) > 0:
+            contained_locations += 1
+        distance = great_circle(
+            recently_mentioned_geoname.lat_long, geoname.lat_long
+        ).kilometers
+        if distance < 400:
+            close_locations += 1
+        if distance < 100:
+            very_close_locations += 1
+    return dict(
+        close_locations=close_locations,
+        very_close_locations=very_close_locations,
+        containing_locations=containing_locations,
+        contained_locations=contained_locations)
+
+
+class ContextualFeaturesTest(unittest.TestCase):
+
+    def test_matches_reference(self):
+        rng = random.Random(1)
+        for _ in range(50):
+            geonames = [random_geoname(rng, idx) for idx in range(rng.randint(1, 40))]
+            features = features_without_spans(geonames)
+            for feature in features:
+                feature.geoname.base_score = rng.random()
+                feature.nearby_mentions = set(rng.sample(geonames, rng.randint(0, min(len(geonames), 10))))
+            for geoname in geonames:
+                geoname.overlapping_locations = set(rng.sample(geonames, rng.randint(0, min(len(geonames), 2))))
+            set_contextual_features(features)
+            for feature in features:
+                values = feature.to_dict()
+                for key, value in reference_contextual_features(feature).items():
+                    self.assertEqual(values[key], value)
+            # Features that do not share a matrix are updated individually.
+            features = features_without_spans(geonames)
+            features.reverse()
+            set_contextual_features(features)
+            for feature in features:
+                values = feature.to_dict()
+                for key, value in reference_contextual_features(feature).items():
+                    self.assertEqual(values[key], value)
+
+    def test_no_nearby_mentions(self):
+        geoname = random_geoname(random.Random(2), 1)
+        geoname.base_score = 0.5
+        feature = features_without_spans([geoname])[0]
+        feature.nearby_mentions = set([geoname])
+        feature.set_contextual_features()
+        self.assertEqual(feature.to_dict()['close_locations'], 0)
+        self.assertEqual(feature.to_dict()['base_score_margin'], 0.5)
+
+
+class GeonameFeaturesTest(unittest.TestCase):
+
+    def test_geoname_features(self):
+        rng = random.Random(3)
+        geonames = [random_geoname(rng, idx) for idx in range(100)]
+        for geoname in geonames:
+            geoname.alternate_locations = set(rng.sample(geonames, rng.randint(0, 3)))
+        features = features_without_spans(geonames)
+        for feature in features:
+            geoname = feature.geoname
+            values = feature.to_dict()
+            self.assertEqual(values['log_population'], math.log(geoname.population + 1))
+            self.assertEqual(values['name_count'], math.log(geoname.name_count))
+            self.assertEqual(values['names_used'], math.log(len(geoname.names_used.split(';'))))
+            self.assertEqual(values['exact_alternatives'], math.log(len(geoname.alternate_locations) + 1))
+            feature_code = geoname.feature_code
+            self.assertEqual(values['PPL_feature_code'], feature_code.startswith('PPL'))
+            self.assertEqual(values['ADM_feature_code'], feature_code.startswith('ADM'))
+            self.assertEqual(values['PCL_feature_code'], feature_code.startswith('PCL'))
+            self.assertEqual(values['other_feature_code'], 0)
+            self.assertEqual(values['first_order'], '1' in feature_code or feature_code == 'PPLA')
+        self.assertIs(feature_matrix(features), features[0].matrix)
+        self.assertEqual(
+            feature_matrix(features[::-1]).tolist(),
+            features[0].matrix[::-1].tolist())
+
+
+class ContainmentTest(unittest.TestCase):
+
+    def test_location_contains(self):
+        rng = random.Random(4)
+        geonames = [random_geoname(rng, idx) for idx in range(60)]
+        # Include geonames with the same id as others.
+        geonames += [random_geoname(rng, idx) for idx in range(10)]
+        index = ContainmentIndex(geonames)
+        for inner in geonames:
+            expected_containing = []
+            for outer in geonames:
+                self.assertEqual(
+                    location_contains(outer, inner),
+                    reference_location_contains(outer, inner))
+                if reference_location_contains(outer, inner) > 0:
+                    expected_containing.append(outer)
+            self.assertEqual(
+                sorted(map(id, index.geonames_containing(inner))),
+                sorted(map(id, expected_containing)))
+
+    def test_containment_level_sql(self):
+        feature_codes = ['ADM1', 'ADM2', 'ADM3', 'ADM4', 'ADM5', 'ADM1H', 'PCL', 'PCLI',
+                         'PCLIX', 'pcli', 'PPL', 'PPLA', 'XPCL', '']
+        connection = sqlite3.connect(':memory:')
+        connection.execute("CREATE TABLE geonames (feature_code TEXT)")
+        connection.executemany("INSERT INTO geonames VALUES (?)", [(code,) for code in feature_codes])
+        for feature_code, level in connection.execute(
+                "SELECT feature_code, " + CONTAINMENT_LEVEL_SQL + " FROM geonames"):
+            self.assertEqual(level, feature_code_level(feature_code))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""Tests for the GeonameAnnotator's database queries"""
+from __future__ import absolute_import
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from epitator.get_database_connection import (
+    get_database_connection, create_geoname_lookup_table, add_containment_levels, DB_VERSION)
+from epitator.connection_manager import ConnectionManager
+from epitator.geoname_annotator import (
+    GeonameAnnotator, QUERY_BATCH_SIZE, ADMIN_NAMES_BATCH_SIZE, admin_names_cache,
+    HOT_GEONAME_NAMES_QUERY)
+
+# The query geonames were looked up with before the geoname_lookup table was added.
+GROUPED_GEONAMES_QUERY = """
+SELECT
+    geonames.*,
+    count AS name_count,
+    group_concat(alternatename, ";") AS names_used,
+    group_concat(alternatename_lemmatized, ";") AS lemmas_used
+FROM geonames
+JOIN alternatename_counts USING ( geonameid )
+JOIN alternatenames USING ( geonameid )
+WHERE alternatename_lemmatized IN (%s)
+GROUP BY geonameid
+"""
+
+# The query the admin names of each geoname were looked up with
+# before they were looked up in batches.
+GEONAME_ADMIN_NAMES_QUERY = """
+SELECT
+    cc.name,
+    a1.name,
+    a2.name,
+    a3.name
+FROM adminnames a3
+JOIN adminnames a2 ON (
+    a2.country_code = a3.country_code AND
+    a2.admin1_code = a3.admin1_code AND
+    a2.admin2_code = a3.admin2_code AND
+    a2.admin3_code = "" )
+JOIN adminnames a1 ON (
+    a1.country_code = a3.country_code AND
+    a1.admin1_code = a3.admin1_code AND
+    a1.admin2_code = "" AND
+    a1.admin3_code = "" )
+JOIN adminnames cc ON (
+    cc.country_code = a3.country_code AND
+    cc.admin1_code = "00" AND
+    cc.admin2_code = "" AND
+    cc.admin3_code = "" )
+WHERE (a3.country_code = ? AND a3.admin1_code = ? AND a3.admin2_code = ? AND a3.admin3_code = ?)
+"""
+
+
+class GeonameQueryTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(3)
+        self.directory = tempfile.mkdtemp()
+        db_path = os.path.join(self.directory, 'test.sqlitedb')
+        connection = get_database_connection(create_database=True, db_path=db_path)
+        cur = connection.cursor()
+        cur.execute("""
+        CREATE TABLE geonames (
+            geonameid TEXT PRIMARY KEY, name TEXT, feature_code TEXT, population INTEGER,
+            country_code TEXT, admin1_code TEXT, admin2_code TEXT, admin3_code TEXT)
+        """)
+        cur.execute("""
+        CREATE TABLE alternatenames (
+            geonameid TEXT, alternatename TEXT, alternatename_lemmatized TEXT)
+        """)
+        self.names = ['name %d' % idx for idx in range(QUERY_BATCH_SIZE + 200)]
+        for geonameid in range(1000):
+            cur.execute("INSERT INTO geonames VALUES (?, ?, 'PPL', ?, 'US', '01', '', '')", (
+                str(geonameid), 'Geoname %d' % geonameid, rng.randint(0, 10000)))
+            for name in rng.sample(self.names, rng.randint(1, 4)):
+                for alternatename in set([name.title(), name.upper()]):
+                    cur.execute("INSERT INTO alternatenames VALUES (?, ?, ?)", (
+                        str(geonameid), alternatename, name))
+        cur.execute("""
+        CREATE TABLE alternatename_counts (geonameid TEXT PRIMARY KEY, count INTEGER)
+        """)
+        # Some geonames do not have name counts.
+        cur.execute("""
+        INSERT INTO alternatename_counts
+        SELECT geonameid, count(alternatename)
+        FROM geonames INNER JOIN alternatenames USING ( geonameid )
+        WHERE CAST(geonameid AS INTEGER) % 10 != 0
+        GROUP BY geonameid
+        """)
+        cur.execute("""
+        CREATE TABLE adminnames (
+            name TEXT, country_code TEXT, admin1_code TEXT, admin2_code TEXT, admin3_code TEXT,
+            PRIMARY KEY (country_code, admin1_code, admin2_code, admin3_code))
+        """)
+        self.admin_codes = []
+        for country_code in ['AA', 'BB', 'CC', 'DD']:
+            # The countries of the DD admin divisions do not have names.
+            if country_code != 'DD':
+                cur.execute("INSERT INTO adminnames VALUES (?, ?, '00', '', '')", (
+                    'Country ' + country_code, country_code))
+            for admin1 in range(6):
+                for admin2 in range(-1, 6):
+                    for admin3 in range(-1, 3):
+                        codes = (
+                            country_code,
+                            '%02d' % (admin1 + 1),
+                            '' if admin2 < 0 else str(admin2),
+                            '' if admin2 < 0 or admin3 < 0 else str(admin3))
+                        if codes in self.admin_codes:
+                            continue
+                        self.admin_codes.append(codes)
+                        # Some admin divisions do not have names.
+                        if rng.random() < 0.9:
+                            cur.execute("INSERT INTO adminnames VALUES (?, ?, ?, ?, ?)", (
+                                'Admin ' + ' '.join(codes),) + codes)
+        add_containment_levels(cur, 'geonames')
+        create_geoname_lookup_table(cur)
+        connection.commit()
+        connection.close()
+        self.connection_manager = ConnectionManager(db_path)
+        self.annotator = GeonameAnnotator(connection_manager=self.connection_manager)
+
+    def tearDown(self):
+        self.connection_manager.close()
+        shutil.rmtree(self.directory)
+
+    def test_geonames_matching(self):
+        rng = random.Random(4)
+        for size in [1, 20, QUERY_BATCH_SIZE, len(self.names)]:
+            names = rng.sample(self.names, size) + ['missing name']
+            expected = self.connection_manager.execute(
+                GROUPED_GEONAMES_QUERY % ','.join('?' * len(names)), names)
+            geonames = self.annotator.geonames_matching(names)
+            self.assertEqual(
+                [geoname['geonameid'] for geoname in geonames],
+                sorted(row['geonameid'] for row in expected))
+            expected_by_id = {row['geonameid']: row for row in expected}
+            for geoname in geonames:
+                row = expected_by_id[geoname['geonameid']]
+                for key in row.keys():
+                    if key in ['names_used', 'lemmas_used']:
+                        # group_concat does not order the names.
+                        self.assertEqual(
+                            sorted(geoname[key].split(';')), sorted(row[key].split(';')))
+                    else:
+                        self.assertEqual(geoname[key], row[key])
+
+    def test_get_admin_names(self):
+        rng = random.Random(5)
+        # The number of codes is not a multiple of the batch size,
+        # so the last batch is padded.
+        admin_codes = rng.sample(self.admin_codes, 2 * ADMIN_NAMES_BATCH_SIZE + 37)
+        admin_codes += [('EE', '01', '', ''), ('', '', '', '')]
+        self.assertTrue(len(set(admin_codes)) % ADMIN_NAMES_BATCH_SIZE != 0)
+        admin_names_cache.clear()
+        admin_names = self.annotator.get_admin_names(admin_codes)
+        self.assertEqual(set(admin_names.keys()), set(admin_codes))
+        # Padding rows are not returned.
+        self.assertNotIn((None,) * 4, admin_names)
+        missing = 0
+        for codes in admin_codes:
+            rows = self.connection_manager.execute(GEONAME_ADMIN_NAMES_QUERY, codes)
+            if len(rows) == 0:
+                missing += 1
+                self.assertIsNone(admin_names[codes])
+            else:
+                self.assertEqual(admin_names[codes], tuple(rows[-1]))
+        self.assertTrue(0 < missing < len(admin_codes))
+        # The names are cached, including the codes without names.
+        self.assertEqual(self.annotator.get_admin_names(admin_codes), admin_names)
+        self.assertIsNone(admin_names_cache.get(('EE', '01', '', '')))
+        self.assertEqual(len(admin_names_cache), len(set(admin_codes)))
+
+    def test_alternatename_geonameid_index_migration(self):
+        db_path = os.path.join(self.directory, 'test.sqlitedb')
+        connection = get_database_connection(db_path=db_path)
+        self.assertFalse(list(connection.execute("""
+        SELECT name FROM sqlite_master WHERE name = 'alternatename_geonameid_index'
+        """)))
+        # Databases created by the previous version are indexed when they are opened.
+        connection.execute("UPDATE metadata SET value = '0.0.4' WHERE property = 'dbversion'")
+        connection.commit()
+        connection.close()
+        connection = get_database_connection(db_path=db_path)
+        self.assertEqual(
+            next(connection.execute("SELECT value FROM metadata WHERE property = 'dbversion'"))[0],
+            DB_VERSION)
+        plan = ' '.join(
+            str(row[-1]) for row in connection.execute(
+                "EXPLAIN QUERY PLAN " + HOT_GEONAME_NAMES_QUERY, (10,)))
+        self.assertIn('alternatename_geonameid_index', plan)
+        connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Tests for the GeonameAnnotator's hot geoname cache"""
+from __future__ import absolute_import
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from epitator.get_database_connection import (
+    get_database_connection, create_geoname_lookup_table, add_containment_levels)
+from epitator.connection_manager import ConnectionManager
+from epitator.geoname_annotator import GeonameAnnotator
+
+
+class HotGeonameCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(1)
+        self.directory = tempfile.mkdtemp()
+        db_path = os.path.join(self.directory, 'test.sqlitedb')
+        connection = get_database_connection(create_database=True, db_path=db_path)
+        cur = connection.cursor()
+        cur.execute("""
+        CREATE TABLE geonames (
+            geonameid TEXT PRIMARY KEY, name TEXT, feature_code TEXT, population INTEGER)
+        """)
+        cur.execute("""
+        CREATE TABLE alternatenames (
+            geonameid TEXT, alternatename TEXT, alternatename_lemmatized TEXT)
+        """)
+        self.names = ['name %d' % idx for idx in range(50)]
+        for geonameid in range(300):
+            cur.execute("INSERT INTO geonames VALUES (?, ?, 'PPL', ?)", (
+                str(geonameid), 'Geoname %d' % geonameid, rng.randint(0, 10000)))
+            for name in rng.sample(self.names, rng.randint(1, 4)):
+                for alternatename in set([name.title(), name.upper()]):
+                    cur.execute("INSERT INTO alternatenames VALUES (?, ?, ?)", (
+                        str(geonameid), alternatename, name))
+        cur.execute("""
+        CREATE TABLE alternatename_counts (geonameid TEXT PRIMARY KEY, count INTEGER)
+        """)
+        cur.execute("""
+        INSERT INTO alternatename_counts
+        SELECT geonameid, count(alternatename)
+        FROM geonames INNER JOIN alternatenames USING ( geonameid )
+        GROUP BY geonameid
+        """)
+        add_containment_levels(cur, 'geonames')
+        create_geoname_lookup_table(cur)
+        connection.commit()
+        connection.close()
+        self.connection_manager = ConnectionManager(db_path)
+
+    def tearDown(self):
+        self.connection_manager.close()
+        shutil.rmtree(self.directory)
+
+    def test_matches_database_lookups(self):
+        annotator = GeonameAnnotator(connection_manager=self.connection_manager)
+        cached_annotator = GeonameAnnotator(
+            connection_manager=self.connection_manager, hot_cache_size=10)
+        self.assertTrue(0 < len(cached_annotator.hot_geoname_cache) < len(self.names))
+        rng = random.Random(2)
+        for _ in range(20):
+            names = rng.sample(self.names, rng.randint(1, 20)) + ['missing name']
+            self.assertEqual(
+                cached_annotator.geonames_matching(names),
+                annotator.geonames_matching(names))
+
+
+if __name__ == '__main__':
+    unittest.main()
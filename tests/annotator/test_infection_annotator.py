@@ -8,7 +8,9 @@ from __future__ import absolute_import
 import unittest
 from . import test_utils
 from epitator.annotator import AnnoDoc
-from epitator.infection_annotator import InfectionAnnotator
+from epitator.infection_annotator import (
+    InfectionAnnotator, noun_chunk_tokens,
+    from_noun_chunks_with_infection_lemmas, from_noun_chunks_with_person_lemmas)
 from six.moves import zip
 
 
@@ -141,6 +143,22 @@ class TestInfectionAnnotator(unittest.TestCase):
     def test_recovered_case_removal(self):
         self.assertHasCounts('5 recovered cases of Ebola were discharged from the hospital.', [])
 
+    def test_shared_noun_chunks(self):
+        doc = AnnoDoc('Three patients were hospitalized and 2 people died. '
+                      'A man was infected in the city.')
+        noun_chunks = noun_chunk_tokens(doc)
+        self.assertEqual(len(noun_chunks), len(doc.tiers['spacy.noun_chunks']))
+        for chunk in noun_chunks:
+            self.assertEqual(
+                chunk.tokens,
+                list(doc.tiers['spacy.tokens'].spans_contained_by_span(chunk.nc)))
+        for extract in [from_noun_chunks_with_infection_lemmas, from_noun_chunks_with_person_lemmas]:
+            shared_spans = extract(doc, noun_chunks=noun_chunks)
+            self.assertEqual(
+                [(span.start, span.end, span.metadata) for span in shared_spans],
+                [(span.start, span.end, span.metadata) for span in extract(doc)])
+            self.assertTrue(all(len(span.metadata['attributes']) > 0 for span in shared_spans))
+
 
 if __name__ == '__main__':
     unittest.main()
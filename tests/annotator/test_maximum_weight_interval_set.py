@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""Tests for the maximum weight interval set implementation"""
+from __future__ import absolute_import
+import unittest
+import random
+from epitator.maximum_weight_interval_set import Interval, find_maximum_weight_interval_set
+from epitator.annospan import AnnoSpan
+from epitator.annotier import AnnoTier
+from epitator.annodoc import AnnoDoc
+
+
+class ReferenceEndpoint():
+    """
+    The endpoint objects used by the original implementation.
+    """
+    def __init__(self, interval, is_start):
+        self.interval = interval
+        self.is_start = is_start
+
+    def get_idx(self):
+        if self.is_start:
+            return self.interval.start
+        else:
+            return self.interval.end
+
+    def __lt__(self, other):
+        if self.get_idx() == other.get_idx():
+            if len(self.interval) == 0:
+                if len(other.interval) == 0:
+                    return self.is_start and not other.is_start
+                else:
+                    return self.is_start and other.is_start
+            else:
+                if len(other.interval) == 0:
+                    return not self.is_start or not other.is_start
+                else:
+                    return not self.is_start and other.is_start
+        else:
+            return self.get_idx() < other.get_idx()
+
+
+def reference_mwis(intervals):
+    """
+    The original implementation. Unlike the original, intervals are compared
+    to None rather than tested for truthiness, since zero length intervals
+    are falsy.
+    """
+    endpoints = []
+    for interval in intervals:
+        endpoints.append(ReferenceEndpoint(interval, True))
+        endpoints.append(ReferenceEndpoint(interval, False))
+    values = {}
+    previous = {}
+    max_interval_sofar = None
+    for endpoint in sorted(endpoints):
+        interval = endpoint.interval
+        if endpoint.is_start:
+            values[id(interval)] = interval.weight
+            if max_interval_sofar is not None:
+                max_value = values[id(max_interval_sofar)]
+                if isinstance(max_value, tuple):
+                    values[id(interval)] = tuple(map(sum, zip(max_value, interval.weight)))
+                else:
+                    values[id(interval)] += max_value
+                previous[id(interval)] = max_interval_sofar
+        else:
+            if max_interval_sofar is None:
+                max_interval_sofar = interval
+            elif values[id(interval)] >= values[id(max_interval_sofar)]:
+                max_interval_sofar = interval
+    mwis = []
+    while max_interval_sofar is not None:
+        mwis.insert(0, max_interval_sofar)
+        max_interval_sofar = previous.get(id(max_interval_sofar))
+    return mwis
+
+
+def random_intervals(rng, num_intervals, weight_f):
+    intervals = []
+    for idx in range(num_intervals):
+        start = rng.randint(0, 30)
+        end = start + rng.choice([0, 0, 1, 2, 3, 5, 8, 13])
+        intervals.append(Interval(start, end, weight_f(start, end), idx))
+    return intervals
+
+
+class MaximumWeightIntervalSetTest(unittest.TestCase):
+
+    def assertMatchesReference(self, intervals):
+        self.assertEqual(
+            [interval.corresponding_object for interval in find_maximum_weight_interval_set(intervals)],
+            [interval.corresponding_object for interval in reference_mwis(intervals)])
+
+    def test_random_numeric_weights(self):
+        rng = random.Random(1)
+        for _ in range(2000):
+            self.assertMatchesReference(random_intervals(
+                rng, rng.randint(0, 15), lambda start, end: rng.randint(0, 4)))
+
+    def test_random_length_weights(self):
+        rng = random.Random(2)
+        for _ in range(2000):
+            self.assertMatchesReference(random_intervals(
+                rng, rng.randint(0, 15), lambda start, end: end - start))
+
+    def test_random_tuple_weights(self):
+        rng = random.Random(3)
+        for _ in range(2000):
+            self.assertMatchesReference(random_intervals(
+                rng, rng.randint(0, 15), lambda start, end: (
+                    rng.randint(0, 2), rng.randint(-1, 1), start - end)))
+
+    def test_zero_length_intervals(self):
+        intervals = [
+            Interval(0, 3, 1, 'a'),
+            Interval(3, 3, 1, 'b'),
+            Interval(4, 5, 1, 'c')]
+        self.assertEqual(
+            [interval.corresponding_object for interval in find_maximum_weight_interval_set(intervals)],
+            ['a', 'b', 'c'])
+        # Zero length intervals at the same offset overlap.
+        intervals = [
+            Interval(3, 3, 1, 'a'),
+            Interval(3, 3, 1, 'b')]
+        self.assertEqual(len(find_maximum_weight_interval_set(intervals)), 1)
+
+    def test_optimal_span_set_first(self):
+        doc = AnnoDoc('one two three')
+        spans = [
+            AnnoSpan(4, 13, doc),
+            AnnoSpan(0, 3, doc),
+            AnnoSpan(0, 7, doc),
+            AnnoSpan(8, 13, doc)]
+        tier = AnnoTier(spans, presorted=True)
+        self.assertEqual(
+            tier.optimal_span_set(prefer='first').spans,
+            [spans[1], spans[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
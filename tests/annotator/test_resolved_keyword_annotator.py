@@ -75,6 +75,13 @@ class ResolvedKeywordAnnotatorTest(unittest.TestCase):
             resolved_keyword['resolutions'][0]['entity'],
             {'id': 'http://purl.obolibrary.org/obo/DOID_635'})
 
+    def test_synonyms_matching(self):
+        results = list(self.annotator.synonyms_matching(['mumps', 'not a synonym']))
+        self.assertTrue(len(results) > 0)
+        self.assertTrue(all(result['synonym'] == 'mumps' for result in results))
+        self.assertTrue('http://purl.obolibrary.org/obo/DOID_10264' in [
+            result['entity_id'] for result in results])
+
     def test_very_long_article(self):
         path = os.path.dirname(__file__) + "/resources/WhereToItaly.txt"
         with io.open(path, encoding='utf-8') as file:
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""Tests for the AnnoDoc serialization format"""
+from __future__ import absolute_import
+import datetime
+import json
+import unittest
+from epitator.annotator import AnnoDoc, AnnoTier, AnnoSpan
+from epitator.annospan import SpanGroup
+from epitator.array_annotier import ArrayAnnoTier
+from epitator.geoname_annotator import GeoSpan, GeonameRow
+from epitator.date_annotator import DateSpan
+from epitator.count_annotator import CountSpan
+from epitator.resolved_keyword_annotator import ResolvedKeywordSpan
+from epitator.serialization import doc_to_dict, doc_from_dict
+from epitator.spacy_annotator import TokenTier
+
+
+def create_geoname(geonameid, name):
+    return GeonameRow(dict(
+        geonameid=geonameid, name=name, feature_code='PPL', country_code='NG',
+        admin1_code='48', admin2_code='', admin3_code='', admin4_code='',
+        longitude=4.8, latitude=7.1, population=1000, asciiname=name,
+        names_used=name, lemmas_used=name.lower(), name_count=1))
+
+
+class SerializationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = AnnoDoc(u'12 cases in Akure, Ondo since 5 March 2018',
+                           date=datetime.datetime(2018, 3, 20))
+        doc = self.doc
+        akure = create_geoname('2350841', 'Akure')
+        ondo = create_geoname('2326168', 'Ondo')
+        akure.parents = set([ondo])
+        akure.score = 0.9
+        akure_span = AnnoSpan(12, 17, doc)
+        akure.spans = set([akure_span])
+        doc.tiers['geonames'] = AnnoTier([
+            GeoSpan(akure_span, akure),
+            GeoSpan(AnnoSpan(19, 23, doc), ondo)])
+        doc.tiers['dates'] = AnnoTier([DateSpan(AnnoSpan(30, 42, doc), [
+            datetime.datetime(2018, 3, 5), datetime.datetime(2018, 3, 6)])])
+        count_span = CountSpan(AnnoSpan(0, 2, doc), {'count': 12, 'attributes': ['case']})
+        doc.tiers['counts'] = AnnoTier([count_span])
+        doc.tiers['groups'] = ArrayAnnoTier([
+            SpanGroup([count_span, doc.tiers['geonames'].spans[0]], 'count_location')])
+        doc.tiers['resolved_keywords'] = AnnoTier([ResolvedKeywordSpan(AnnoSpan(3, 8, doc), [
+            {'entity_id': 'http://purl.obolibrary.org/obo/DOID_0050001', 'weight': 1}])])
+
+    def test_round_trip(self):
+        serialized = self.doc.dumps()
+        # The format is json.
+        json.loads(serialized)
+        doc = AnnoDoc.loads(serialized)
+        self.assertEqual(doc.text, self.doc.text)
+        self.assertEqual(doc.date, self.doc.date)
+        self.assertEqual(sorted(doc.tiers.keys()), sorted(self.doc.tiers.keys()))
+        for name, tier in self.doc.tiers.items():
+            self.assertEqual(type(doc.tiers[name]), type(tier))
+            self.assertEqual(
+                [(type(span), span.start, span.end, span.label) for span in doc.tiers[name]],
+                [(type(span), span.start, span.end, span.label) for span in tier])
+            self.assertEqual(
+                [span.to_dict() for span in doc.tiers[name]],
+                [span.to_dict() for span in tier])
+            self.assertTrue(all(span.doc is doc for span in doc.tiers[name]))
+
+    def test_shared_objects(self):
+        doc = AnnoDoc.loads(self.doc.dumps())
+        geospan = doc.tiers['geonames'].spans[0]
+        self.assertIs(geospan.metadata['geoname'], geospan.geoname)
+        self.assertIs(doc.tiers['groups'].spans[0].base_spans[1], geospan)
+        self.assertIs(doc.tiers['groups'].spans[0].base_spans[0], doc.tiers['counts'].spans[0])
+        self.assertIs(list(geospan.geoname.parents)[0], doc.tiers['geonames'].spans[1].geoname)
+        self.assertIs(list(geospan.geoname.spans)[0], geospan.metadata['original_span'])
+        self.assertEqual(geospan.geoname.lat_long, (7.1, 4.8))
+
+    def test_selected_tiers(self):
+        doc = AnnoDoc.loads(self.doc.dumps(['counts']))
+        self.assertEqual(list(doc.tiers.keys()), ['counts'])
+        self.assertEqual(doc.tiers['counts'].spans[0].metadata['count'], 12)
+
+    def test_unknown_tier_type(self):
+        serialized = doc_to_dict(self.doc)
+        self.assertEqual(serialized['tier_types'], {'groups': 'ArrayAnnoTier'})
+        # Tier types are only loaded from the registered classes.
+        serialized['tier_types']['groups'] = 'os.system'
+        with self.assertRaises(ValueError):
+            doc_from_dict(serialized)
+
+    def test_token_tier(self):
+        # The spans of token tiers are loaded without their tokens,
+        # so the tiers are loaded as AnnoTiers.
+        self.doc.tiers['spacy.tokens'] = TokenTier([AnnoSpan(0, 2, self.doc)])
+        doc = AnnoDoc.loads(self.doc.dumps(['spacy.tokens']))
+        self.assertIs(type(doc.tiers['spacy.tokens']), AnnoTier)
+        self.assertEqual(len(doc.tiers['spacy.tokens']), 1)
+
+    def test_from_to_dict(self):
+        doc = AnnoDoc.from_dict(self.doc.to_dict())
+        self.assertEqual(doc.date, self.doc.date)
+        self.assertEqual(
+            [(span.start, span.end) for span in doc.tiers['groups']],
+            [(span.start, span.end) for span in self.doc.tiers['groups']])
+
+
+if __name__ == '__main__':
+    unittest.main()
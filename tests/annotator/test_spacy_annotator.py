@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""Tests for the SpacyAnnotator"""
+from __future__ import absolute_import
+import unittest
+from epitator.annotator import AnnoDoc
+from epitator.spacy_annotator import SpacyAnnotator
+
+
+class SpacyAnnotatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.annotator = SpacyAnnotator()
+
+    def test_annotate_many(self):
+        texts = [
+            "The patient was admitted to a hospital in Lagos on 5 March 2018.",
+            " ".join("Sentence number %d mentions Ebola in Guinea." % i for i in range(25)),
+            "",
+            "Two new cases were reported.\n\n\n\n\nThree more cases were reported."]
+        docs = self.annotator.annotate_many(AnnoDoc(text) for text in texts)
+        self.assertEqual(len(docs), len(texts))
+        for doc, text in zip(docs, texts):
+            expected_doc = AnnoDoc(text)
+            expected_doc.add_tiers(self.annotator)
+            for tier_name in ['spacy.tokens', 'spacy.nes', 'spacy.noun_chunks', 'spacy.sentences']:
+                self.assertEqual(
+                    [(span.start, span.end, span.label) for span in doc.tiers[tier_name]],
+                    [(span.start, span.end, span.label) for span in expected_doc.tiers[tier_name]])
+            for span in doc.tiers['spacy.tokens']:
+                self.assertEqual(span.text, span.token.text)
+
+    def test_token_index(self):
+        doc = AnnoDoc("The cases were reported to the ministry and confirmed. Two more cases are suspected.")
+        doc.add_tiers(self.annotator)
+        tokens = doc.tiers['spacy.tokens']
+        self.assertEqual(
+            [span.text for span in tokens.with_lemmas(['case', 'confirm'], 'case')],
+            [span.text for span in tokens if span.token.lemma_ in ['case', 'confirm']])
+        self.assertEqual(
+            [span.label for span in tokens.with_lemmas(['case'], 'case')],
+            ['case', 'case'])
+        self.assertEqual(
+            [span.start for span in tokens.with_texts(['THE', 'and'])],
+            [span.start for span in tokens if span.text.lower() in ['the', 'and']])
+        self.assertEqual(
+            [span.text for span in tokens.with_tags(['NNS'])],
+            [span.text for span in tokens if span.token.tag_ == 'NNS'])
+        self.assertEqual(len(tokens.with_lemmas(['outbreak'])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
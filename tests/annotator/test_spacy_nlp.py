@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""Tests for loading the shared spaCy models"""
+from __future__ import absolute_import
+import threading
+import time
+import unittest
+from epitator.spacy_nlp import LazyModel
+
+
+class Model(object):
+    vocab = 'vocab'
+
+    def __call__(self, text):
+        return text.split()
+
+
+class LazyModelTest(unittest.TestCase):
+
+    def test_loaded_once(self):
+        loads = []
+
+        def load():
+            # The loader does not lock, and loads the model slowly
+            # so the threads try to load it at once.
+            if not loads:
+                time.sleep(0.05)
+                loads.append(Model())
+            return loads[0]
+
+        model = LazyModel(load)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(model.vocab))
+            for _ in range(4)]
+        threads.append(threading.Thread(target=lambda: results.append(model('a b'))))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(sorted(results, key=str), [['a', 'b']] + ['vocab'] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""Tests for the geoname spatial index"""
+from __future__ import absolute_import
+import unittest
+import random
+import sqlite3
+from geopy.distance import great_circle
+from epitator.get_database_connection import create_geoname_locations_table
+from epitator.spatial_index import SpatialIndex
+
+
+class SpatialIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(1)
+        self.locations = []
+        for geonameid in range(1, 2001):
+            if geonameid % 2:
+                # Include locations near the antimeridian and poles.
+                latitude = rng.choice([-89, 0, 60, 89]) + rng.uniform(-1, 1)
+                longitude = rng.choice([-179.5, 0, 179.5]) + rng.uniform(-0.5, 0.5)
+            else:
+                latitude = rng.uniform(-90, 90)
+                longitude = rng.uniform(-180, 180)
+            self.locations.append((str(geonameid), latitude, longitude))
+        connection = sqlite3.connect(':memory:')
+        connection.row_factory = sqlite3.Row
+        connection.execute("""
+        CREATE TABLE geonames (geonameid TEXT PRIMARY KEY, latitude REAL, longitude REAL)
+        """)
+        connection.executemany("INSERT INTO geonames VALUES (?, ?, ?)", self.locations)
+        create_geoname_locations_table(connection.cursor())
+        self.index = SpatialIndex(connection)
+
+    def test_geonames_within(self):
+        for latitude, longitude, radius in [
+                (0, 0, 200),
+                (60, 179.9, 300),
+                (0, -179.8, 150),
+                (89.5, 10, 250),
+                (-89.2, -100, 100),
+                (60.5, 0.3, 1000)]:
+            result = self.index.geonames_within(latitude, longitude, radius)
+            expected = set(
+                geonameid for geonameid, geoname_latitude, geoname_longitude in self.locations
+                if great_circle((latitude, longitude), (geoname_latitude, geoname_longitude)).kilometers <= radius)
+            self.assertTrue(len(expected) > 0)
+            self.assertEqual(set(geoname['geonameid'] for geoname, distance in result), expected)
+            distances = [distance for geoname, distance in result]
+            self.assertEqual(distances, sorted(distances))
+
+    def test_geonames_in_box(self):
+        result = self.index.geonames_in_box(-1, 1, -1, 1)
+        self.assertEqual(
+            set(geoname['geonameid'] for geoname in result),
+            set(geonameid for geonameid, latitude, longitude in self.locations
+                if -1 <= latitude <= 1 and -1 <= longitude <= 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""Tests for the TierCache"""
+from __future__ import absolute_import
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from epitator.annotator import Annotator, AnnoDoc, AnnoTier, AnnoSpan
+from epitator.annospan import SpanGroup
+from epitator.tier_cache import TierCache, SQLiteTierStore, DirectoryTierStore, set_tier_cache
+from epitator.get_database_connection import get_database_connection
+from epitator.connection_manager import ConnectionManager
+from epitator.resolved_keyword_annotator import ResolvedKeywordAnnotator
+
+
+class WordAnnotator(Annotator):
+    calls = 0
+
+    def __init__(self, label='word'):
+        self.label = label
+
+    def annotate(self, doc):
+        WordAnnotator.calls += 1
+        words = doc.create_regex_tier(r'\w+', label=self.label)
+        return {
+            'words': words,
+            'word_pairs': words.with_following_spans_from(words)}
+
+
+class UnpicklableAnnotator(Annotator):
+    def annotate(self, doc):
+        return {'unpicklable': AnnoTier([AnnoSpan(0, 1, doc, metadata=lambda x: x)])}
+
+
+class Classifier(object):
+    pass
+
+
+class ClassifierAnnotator(Annotator):
+    def __init__(self, classifier):
+        self.classifier = classifier
+
+    def annotate(self, doc):
+        return {}
+
+
+class TierCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        set_tier_cache(None)
+        shutil.rmtree(self.directory)
+
+    def check_store(self, store):
+        cache = TierCache(store)
+        set_tier_cache(cache)
+        annotator = WordAnnotator()
+        WordAnnotator.calls = 0
+        for _ in range(2):
+            doc = AnnoDoc('one two three', date=datetime.datetime(2018, 1, 1))
+            doc.add_tiers(annotator)
+        self.assertEqual(WordAnnotator.calls, 1)
+        self.assertEqual(cache.stats.hits, 1)
+        self.assertEqual(cache.stats.misses, 1)
+        self.assertEqual(cache.stats.stores, 1)
+        self.assertEqual(
+            [(span.start, span.end, span.label) for span in doc.tiers['words']],
+            [(0, 3, 'word'), (4, 7, 'word'), (8, 13, 'word')])
+        self.assertTrue(all(span.doc is doc for span in doc.tiers['words']))
+        pair = doc.tiers['word_pairs'].spans[0]
+        self.assertIsInstance(pair, SpanGroup)
+        self.assertEqual(pair.text, 'one two')
+        # Different dates and parameters are stored separately.
+        doc = AnnoDoc('one two three')
+        doc.add_tiers(annotator)
+        doc.add_tiers(WordAnnotator('other'))
+        self.assertEqual(doc.tiers['words'].spans[0].label, 'other')
+        self.assertEqual(cache.stats.misses, 3)
+
+    def test_sqlite_store(self):
+        self.check_store(SQLiteTierStore(os.path.join(self.directory, 'cache.sqlitedb')))
+
+    def test_directory_store(self):
+        self.check_store(DirectoryTierStore(os.path.join(self.directory, 'cache')))
+
+    def test_eviction(self):
+        for store in [SQLiteTierStore(os.path.join(self.directory, 'cache.sqlitedb'), max_size=1000),
+                      DirectoryTierStore(os.path.join(self.directory, 'cache'), max_size=1000)]:
+            cache = TierCache(store)
+            set_tier_cache(cache)
+            for idx in range(20):
+                AnnoDoc('document number %d' % idx).add_tiers(WordAnnotator())
+            self.assertTrue(cache.stats.evictions > 0)
+            self.assertTrue(store.size() <= 1000)
+            # The most recent document is still cached.
+            AnnoDoc('document number 19').add_tiers(WordAnnotator())
+            self.assertEqual(cache.stats.hits, 1)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "requires os.fork")
+    def test_forked_process(self):
+        store = SQLiteTierStore(os.path.join(self.directory, 'cache.sqlitedb'))
+        store.set('parent', b'parent value')
+        parent_connection = store.connection
+        pid = os.fork()
+        if pid == 0:
+            # The forked process opens its own connection.
+            try:
+                status = 0 if store.connection is not parent_connection else 1
+                store.set('child', b'child value')
+                if store.get('parent') != b'parent value':
+                    status = 1
+            except Exception:
+                status = 2
+            os._exit(status)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(status, 0)
+        self.assertIs(store.connection, parent_connection)
+        self.assertEqual(store.get('child'), b'child value')
+        self.assertEqual(store.size(), len(b'parent value') + len(b'child value'))
+
+    def test_uncacheable(self):
+        cache = TierCache(SQLiteTierStore(os.path.join(self.directory, 'cache.sqlitedb')))
+        set_tier_cache(cache)
+        doc = AnnoDoc('one two three')
+        doc.add_tiers(UnpicklableAnnotator())
+        self.assertEqual(cache.stats.uncacheable, 1)
+        self.assertEqual(len(doc.tiers['unpicklable']), 1)
+
+    def test_database_parameters(self):
+        managers = []
+        for idx in range(2):
+            db_path = os.path.join(self.directory, 'db%d.sqlitedb' % idx)
+            connection = get_database_connection(create_database=True, db_path=db_path)
+            connection.execute("INSERT INTO metadata VALUES ('synonyms', ?)", ('version %d' % idx,))
+            connection.commit()
+            connection.close()
+            managers.append(ConnectionManager(db_path))
+        cache = TierCache(SQLiteTierStore(os.path.join(self.directory, 'cache.sqlitedb')))
+        doc = AnnoDoc('one two three')
+        # The database versions are read from the annotator's database.
+        self.assertIn(['synonyms', 'version 1'], cache.database_versions(managers[1]))
+        keys = [cache.key(doc, ResolvedKeywordAnnotator(manager), {}) for manager in managers]
+        self.assertNotEqual(keys[0], keys[1])
+        self.assertEqual(keys[0], cache.key(doc, ResolvedKeywordAnnotator(managers[0]), {}))
+        for manager in managers:
+            manager.close()
+
+    def test_parameters_represented_by_type(self):
+        # Annotators with parameters that cannot be told apart are not cached.
+        cache = TierCache(SQLiteTierStore(os.path.join(self.directory, 'cache.sqlitedb')))
+        doc = AnnoDoc('one two three')
+        self.assertIsNone(cache.key(doc, ClassifierAnnotator(Classifier()), {}))
+        self.assertIsNotNone(cache.key(doc, ClassifierAnnotator('classifier'), {}))
+
+    def test_threads(self):
+        # The annotator, cache and store are shared by the threads.
+        for store in [SQLiteTierStore(os.path.join(self.directory, 'cache.sqlitedb'), max_size=5000),
+                      DirectoryTierStore(os.path.join(self.directory, 'cache'), max_size=5000)]:
+            cache = TierCache(store)
+            set_tier_cache(cache)
+            annotator = WordAnnotator()
+            errors = []
+
+            def annotate(thread_idx):
+                try:
+                    for idx in range(20):
+                        doc = AnnoDoc('document %d word %d' % (idx % 10, thread_idx))
+                        doc.add_tiers(annotator)
+                        self.assertEqual(doc.tiers['words'].spans[3].text, str(thread_idx))
+                except Exception as e:
+                    errors.append(e)
+            threads = [threading.Thread(target=annotate, args=(idx,)) for idx in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            self.assertEqual(cache.stats.hits + cache.stats.misses, 160)
+            self.assertEqual(cache.stats.misses, cache.stats.stores)
+            self.assertTrue(store.size() <= 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()